@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark: envío del resumen diario a muchos usuarios contra un bot simulado.
+
+El bot falso tarda `--latencia` ms por mensaje, rechaza a un porcentaje de
+usuarios (bot bloqueado) y responde RetryAfter si se superan 30 mensajes en
+un segundo, como hace Telegram. Compara el bucle en serie anterior con
+src.difusion.difundir.
+
+Ejecutar desde la raíz del proyecto:
+    python scripts/bench_difusion.py [--usuarios 400] [--latencia 80]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from telegram.error import Forbidden, RetryAfter  # noqa: E402
+
+from src.difusion import difundir  # noqa: E402
+
+
+class BotSimulado:
+    def __init__(self, latencia_s: float, bloqueados: set[int]):
+        self.latencia_s = latencia_s
+        self.bloqueados = bloqueados
+        self.ventana: deque[float] = deque()
+        self.flood = 0
+        self.entregados = 0
+
+    async def send_message(self, chat_id: int, text: str) -> None:
+        ahora = time.monotonic()
+        while self.ventana and ahora - self.ventana[0] > 1:
+            self.ventana.popleft()
+        if len(self.ventana) >= 30:
+            self.flood += 1
+            raise RetryAfter(1)
+        self.ventana.append(ahora)
+        await asyncio.sleep(self.latencia_s)
+        if chat_id in self.bloqueados:
+            raise Forbidden("bot was blocked by the user")
+        self.entregados += 1
+
+
+def _texto(user_id: int) -> str | None:
+    return None if user_id % 50 == 0 else f"resumen de {user_id}"
+
+
+async def _preparar(user_id: int) -> str | None:
+    await asyncio.sleep(0.002)  # antes: una lectura del resumen por usuario
+    return _texto(user_id)
+
+
+async def _serie(bot: BotSimulado, user_ids: list[int]) -> float:
+    inicio = time.monotonic()
+    for user_id in user_ids:
+        texto = await _preparar(user_id)
+        if texto:
+            try:
+                await bot.send_message(chat_id=user_id, text=texto)
+            except Exception:
+                pass
+    return time.monotonic() - inicio
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--usuarios", type=int, default=400)
+    parser.add_argument("--latencia", type=float, default=80, help="ms por mensaje")
+    args = parser.parse_args()
+
+    user_ids = list(range(1, args.usuarios + 1))
+    bloqueados = set(random.Random(1).sample(user_ids, args.usuarios // 20))
+    esperados = sum(1 for u in user_ids if u % 50 and u not in bloqueados)
+
+    bot = BotSimulado(args.latencia / 1000, bloqueados)
+    duracion = await _serie(bot, user_ids)
+    print(f"en serie:  {bot.entregados}/{esperados} entregados en {duracion:.1f}s, flood {bot.flood}")
+
+    bot = BotSimulado(args.latencia / 1000, bloqueados)
+    resultado = await difundir(bot, [(u, _texto(u)) for u in user_ids])
+    print(f"difundir:  {bot.entregados}/{esperados} entregados; {resultado}; flood {bot.flood}")
+    if bot.entregados != esperados:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
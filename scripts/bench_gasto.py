@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: coste de registrar un gasto elegido con botones (cuenta y categoría por id).
+
+Compara el flujo anterior de los handlers (leer la categoría por id, comprobar
+que vale para gastos y luego registrar_gasto por nombre, que volvía a buscar
+cuenta y categoría) con registrar_movimiento, que lo resuelve todo en un
+INSERT ... SELECT dentro de una sola transacción. Cuenta accesos al pool
+(cada uno es un salto al executor de base de datos en el bot) y sentencias SQL.
+
+Ejecutar desde la raíz del proyecto:
+    python scripts/bench_gasto.py [--operaciones 5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+USER_ID = 1
+
+
+def _flujo_anterior(db, cuenta_id: int, categoria_id: int, monto: float) -> None:
+    """Réplica del camino previo: 2 lecturas + escritura con búsquedas por nombre."""
+    cat = db.obtener_categoria_usuario_por_id(USER_ID, categoria_id)
+    if not cat or not db.categoria_permitida_para_movimiento(USER_ID, cat["nombre"], "gasto"):
+        raise RuntimeError("categoría no válida")
+    centavos = db._a_centavos(monto)
+    with db.get_connection() as conn:
+        cuenta = conn.execute(
+            "SELECT id, nombre, tipo, saldo FROM cuentas WHERE user_id = ? AND id = ?",
+            (USER_ID, cuenta_id),
+        ).fetchone()
+        cuenta = db._cuenta_por_nombre(conn, USER_ID, cuenta["nombre"])
+        if not db._categoria_permitida(conn, USER_ID, cat["nombre"], "gasto"):
+            raise RuntimeError("categoría no válida")
+        cur = conn.execute(
+            "INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, categoria) VALUES (?, ?, 'gasto', ?, ?)",
+            (USER_ID, cuenta["id"], centavos, cat["nombre"]),
+        )
+        db._resumen_mensual_aplicar(conn, cur.lastrowid, +1)
+        conn.execute("UPDATE cuentas SET saldo = saldo - ? WHERE id = ?", (centavos, cuenta["id"]))
+
+
+def _flujo_nuevo(db, cuenta_id: int, categoria_id: int, monto: float) -> None:
+    ok, mensaje = db.registrar_movimiento(
+        USER_ID, "gasto", monto, cuenta_id=cuenta_id, categoria_id=categoria_id
+    )
+    if not ok:
+        raise RuntimeError(mensaje)
+
+
+def _instrumentar(db) -> dict[str, int]:
+    """Cuenta accesos al pool y sentencias ejecutadas en cualquier conexión."""
+    contadores = {"accesos": 0, "sentencias": 0}
+    pool = db._obtener_pool()
+
+    def traza(_sql: str) -> None:
+        contadores["sentencias"] += 1
+
+    for conn in pool._todas:
+        conn.set_trace_callback(traza)
+    for nombre in ("escritura", "lectura"):
+        original = getattr(pool, nombre)
+
+        @contextmanager
+        def contado(_original=original):
+            contadores["accesos"] += 1
+            with _original() as conn:
+                yield conn
+
+        setattr(pool, nombre, contado)
+    return contadores
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--operaciones", type=int, default=5000)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DB_PATH"] = str(Path(tmp.name) / "bench.db")
+    from src.database import db
+
+    db.init_db()
+    db.crear_cuenta(USER_ID, "banco", "debito")
+    for i in range(30):
+        db.agregar_categoria_usuario(USER_ID, f"categoria {i:02d}", "gasto")
+    cuenta_id = db.obtener_cuenta_por_nombre(USER_ID, "banco")["id"]
+    categoria_id = db.listar_categorias_para_movimiento(USER_ID, "gasto")[-1]["id"]
+    contadores = _instrumentar(db)
+
+    print(f"{'flujo':>10} | {'ms/gasto':>9} | {'accesos':>8} | {'sentencias':>10}")
+    print("-" * 48)
+    for nombre, flujo in (("anterior", _flujo_anterior), ("nuevo", _flujo_nuevo)):
+        flujo(db, cuenta_id, categoria_id, 1.0)
+        contadores.update(accesos=0, sentencias=0)
+        inicio = time.perf_counter()
+        for i in range(args.operaciones):
+            flujo(db, cuenta_id, categoria_id, 1 + i % 500 / 100)
+        ms = (time.perf_counter() - inicio) / args.operaciones * 1000
+        print(
+            f"{nombre:>10} | {ms:>7.3f}ms | {contadores['accesos'] / args.operaciones:>8.1f} | "
+            f"{contadores['sentencias'] / args.operaciones:>10.1f}"
+        )
+
+    if db.verificar_resumen_mensual(USER_ID):
+        print("✗ resumen_mensual no cuadra")
+        sys.exit(1)
+    db.cerrar_conexiones()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: updates en serie frente a ProcesadorPorUsuario con un usuario lento.
+
+Un usuario envía una ráfaga de updates que tardan `--lenta` ms cada una (una
+importación, un resumen grande) mientras otros usuarios envían updates de
+`--rapida` ms. Mide cuánto espera cada update de los demás usuarios y
+comprueba que las de cada usuario se procesan en el orden de llegada.
+
+Ejecutar desde la raíz del proyecto:
+    python scripts/bench_procesador.py [--usuarios 200] [--lenta 300] [--rapida 20]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from telegram import Chat, Message, Update, User  # noqa: E402
+from telegram.ext import SimpleUpdateProcessor  # noqa: E402
+
+from src.procesador import ProcesadorPorUsuario  # noqa: E402
+
+USUARIO_LENTO = 1
+
+
+def _update(n: int, user_id: int) -> Update:
+    usuario = User(id=user_id, first_name="Bench", is_bot=False)
+    chat = Chat(id=user_id, type=Chat.PRIVATE)
+    return Update(update_id=n, message=Message(message_id=n, date=None, chat=chat, from_user=usuario))
+
+
+async def _medir(procesador, llegadas: list[tuple[Update, float]]) -> tuple[list[float], bool, float]:
+    """Entrega las updates como Application (una tarea por update) y devuelve esperas y orden."""
+    esperas: list[float] = []
+    orden: dict[int, list[int]] = {}
+
+    async def atender(update: Update, duracion: float, llegada: float) -> None:
+        if update.effective_user.id != USUARIO_LENTO:
+            esperas.append(time.perf_counter() - llegada)
+        orden.setdefault(update.effective_user.id, []).append(update.update_id)
+        await asyncio.sleep(duracion)
+
+    inicio = time.perf_counter()
+    async with procesador:
+        if procesador.max_concurrent_updates > 1:
+            tareas = []
+            for update, duracion in llegadas:
+                coro = atender(update, duracion, time.perf_counter())
+                tareas.append(asyncio.create_task(procesador.process_update(update, coro)))
+                await asyncio.sleep(0)
+            await asyncio.gather(*tareas)
+        else:
+            # Sin concurrent_updates, PTB espera a cada update antes de la siguiente
+            llegada = time.perf_counter()
+            for update, duracion in llegadas:
+                await procesador.process_update(update, atender(update, duracion, llegada))
+    en_orden = all(ids == sorted(ids) for ids in orden.values())
+    return esperas, en_orden, time.perf_counter() - inicio
+
+
+def _informe(nombre: str, esperas: list[float], en_orden: bool, total: float) -> str:
+    ms = sorted(x * 1000 for x in esperas)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return (
+        f"{nombre:22s} espera de los demás: p50 {statistics.median(ms):7.1f} ms | p95 {p95:7.1f} ms | "
+        f"total {total:5.2f} s | orden por usuario {'ok' if en_orden else 'ROTO'}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--usuarios", type=int, default=200, help="usuarios rápidos (1 update cada uno x 3)")
+    parser.add_argument("--rafaga", type=int, default=10, help="updates seguidas del usuario lento")
+    parser.add_argument("--lenta", type=float, default=300, help="ms por update del usuario lento")
+    parser.add_argument("--rapida", type=float, default=20, help="ms por update de los demás")
+    parser.add_argument("--trabajadores", type=int, default=8)
+    args = parser.parse_args()
+
+    # La ráfaga del usuario lento llega primero; después, tres updates de cada usuario
+    llegadas = [(_update(n, USUARIO_LENTO), args.lenta / 1000) for n in range(args.rafaga)]
+    for ronda in range(3):
+        for u in range(args.usuarios):
+            n = len(llegadas)
+            llegadas.append((_update(n, 100 + u), args.rapida / 1000))
+
+    print(_informe("en serie", *await _medir(SimpleUpdateProcessor(1), llegadas)))
+    procesador = ProcesadorPorUsuario(trabajadores=args.trabajadores)
+    esperas, en_orden, total = await _medir(procesador, llegadas)
+    print(_informe(f"por usuario ({args.trabajadores} trab.)", esperas, en_orden, total))
+    print(f"carga máxima: {procesador.estado()}")
+    if not en_orden:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
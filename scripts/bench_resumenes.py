@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: coste de /resumen_categorias y /resumen_mes según crece el historial.
+
+Crea una base temporal con un usuario que acumula ~2.500 movimientos por mes
+y mide, para historiales de distinto tamaño, el resumen del último mes y del
+último año con las consultas actuales (tabla resumen_mensual) y con el filtro
+anterior basado en strftime(), que recorría todo el historial.
+
+Ejecutar desde la raíz del proyecto:
+    python scripts/bench_resumenes.py [--tamanos 10000,100000,300000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+USER_ID = 1
+POR_MES = 2500
+CATEGORIAS = ["comida", "transporte", "casa", "ocio", "salud", "sueldo", "regalos"]
+
+_LEGADO_CATEGORIA = """
+    SELECT COALESCE(categoria, 'sin_categoria') AS categoria, SUM(monto) AS total
+    FROM transacciones WHERE tipo = ? AND user_id = ?
+      AND CAST(strftime('%Y', creada_en) AS INTEGER) = ?
+      AND CAST(strftime('%m', creada_en) AS INTEGER) = ?
+    GROUP BY COALESCE(categoria, 'sin_categoria')
+"""
+_LEGADO_MES = """
+    SELECT CAST(strftime('%Y', creada_en) AS INTEGER) AS ano,
+           CAST(strftime('%m', creada_en) AS INTEGER) AS mes,
+           SUM(CASE WHEN tipo = 'gasto' THEN monto ELSE 0 END) AS gastos,
+           SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END) AS ingresos
+    FROM transacciones
+    WHERE user_id = ? AND tipo IN ('gasto', 'ingreso')
+      AND CAST(strftime('%Y', creada_en) AS INTEGER) = ?
+    GROUP BY ano, mes
+"""
+
+
+def _mes_anterior(ano: int, mes: int, n: int) -> tuple[int, int]:
+    total = ano * 12 + (mes - 1) - n
+    return total // 12, total % 12 + 1
+
+
+def _generar(conn: sqlite3.Connection, desde: int, hasta: int, ano: int, mes: int) -> None:
+    """Inserta las filas [desde, hasta) repartidas hacia atrás desde (ano, mes)."""
+    rnd = random.Random(desde)
+    filas = []
+    for i in range(desde, hasta):
+        a, m = _mes_anterior(ano, mes, i // POR_MES)
+        dia = rnd.randint(1, 28)
+        fecha = f"{a:04d}-{m:02d}-{dia:02d} {rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:00"
+        cat = rnd.choice(CATEGORIAS)
+        tipo = "ingreso" if cat in ("sueldo", "regalos") else "gasto"
+        filas.append((USER_ID, 1, tipo, rnd.randint(100, 50000), cat, fecha))  # centavos
+    conn.executemany(
+        """INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, categoria, creada_en)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        filas,
+    )
+    conn.commit()
+
+
+def _medir(func, repeticiones: int) -> float:
+    func()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        func()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tamanos", default="10000,50000,100000,300000")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+    tamanos = sorted(int(t) for t in args.tamanos.split(","))
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DB_PATH"] = str(Path(tmp.name) / "bench.db")
+    from src.database import db
+
+    db.init_db()
+    db.crear_cuenta(USER_ID, "banco", "debito")
+    ano, mes = 2026, 6
+    carga = sqlite3.connect(os.environ["DB_PATH"])
+
+    print(f"{'filas':>8} | {'cat. mes':>9} {'(antes)':>9} | {'mes año':>9} {'(antes)':>9} | {'12 meses':>9}")
+    print("-" * 68)
+    generadas = 0
+    for tamano in tamanos:
+        _generar(carga, generadas, tamano, ano, mes)
+        generadas = tamano
+        carga.execute("ANALYZE")
+        carga.commit()
+        # Las filas se cargan por fuera de db.py: el resumen mensual se regenera aquí
+        db.reconstruir_resumen_mensual(USER_ID)
+
+        cat_mes = _medir(lambda: db.obtener_resumen_por_categoria(USER_ID, ano=ano, mes=mes), args.repeticiones)
+        cat_mes_legado = _medir(
+            lambda: [carga.execute(_LEGADO_CATEGORIA, (t, USER_ID, ano, mes)).fetchall() for t in ("gasto", "ingreso")],
+            args.repeticiones,
+        )
+        mes_ano = _medir(lambda: db.obtener_resumen_por_mes(USER_ID, ano=ano), args.repeticiones)
+        mes_ano_legado = _medir(lambda: carga.execute(_LEGADO_MES, (USER_ID, ano)).fetchall(), args.repeticiones)
+        ultimos = _medir(lambda: db.obtener_resumen_por_mes(USER_ID), args.repeticiones)
+        print(
+            f"{tamano:>8} | {cat_mes:>7.2f}ms {cat_mes_legado:>7.2f}ms | "
+            f"{mes_ano:>7.2f}ms {mes_ano_legado:>7.2f}ms | {ultimos:>7.2f}ms"
+        )
+
+    carga.close()
+    db.cerrar_conexiones()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latencia de extremo a extremo en modo webhook frente a polling.
+
+Levanta una Bot API simulada en local (getMe, setWebhook, getUpdates,
+sendMessage...) y el bot real (src.main.crear_aplicacion) apuntando a ella.
+Genera updates /start de usuarios distintos y mide el tiempo desde que la
+update existe hasta que la respuesta del bot llega a la API:
+
+- webhook: el script hace el POST al servidor del bot, como haría Telegram;
+- polling: la update se deja en la cola de getUpdates de la API simulada.
+
+`--latencia-red` añade ese retraso (ms) a cada respuesta de la API y a cada
+POST del webhook, para simular la distancia hasta Telegram. Con un `--ritmo`
+mayor del que el bot procesa, la cola de updates crece y la latencia mide
+sobre todo la espera en cola.
+
+Ejecutar desde la raíz del proyecto:
+    python scripts/bench_webhook.py [--updates 300] [--ritmo 20] [--latencia-red 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("DB_PATH", str(Path(tempfile.mkdtemp()) / "bench_webhook.db"))
+
+import httpx  # noqa: E402
+
+from src.database import init_db  # noqa: E402
+from src.main import crear_aplicacion  # noqa: E402
+
+TOKEN = "123456:BENCH"
+SECRETO = "bench-secreto"
+
+
+class ApiSimulada:
+    """Bot API mínima en un hilo aparte. Registra cuándo llega cada sendMessage."""
+
+    def __init__(self, latencia_s: float):
+        self.latencia_s = latencia_s
+        self.pendientes: queue.Queue[dict] = queue.Queue()
+        self.respuestas: dict[int, float] = {}
+        self._lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                cuerpo = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+                params = {k: v[0] for k, v in parse_qs(cuerpo).items()}
+                resultado = api.responder(self.path.rsplit("/", 1)[-1], params)
+                time.sleep(api.latencia_s)
+                datos = json.dumps({"ok": True, "result": resultado}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+        class Servidor(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address) -> None:
+                # El bot corta el getUpdates en curso al pararse: no es un error
+                if not isinstance(sys.exc_info()[1], ConnectionError):
+                    super().handle_error(request, client_address)
+
+        self._httpd = Servidor(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_port}/bot"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def responder(self, metodo: str, params: dict):
+        if metodo == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        if metodo == "sendMessage":
+            chat_id = int(params["chat_id"])
+            with self._lock:
+                self.respuestas[chat_id] = time.perf_counter()
+            return {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+        if metodo == "getUpdates":
+            offset = int(params.get("offset") or 0)
+            espera = min(float(params.get("timeout") or 0), 1.0)
+            updates = []
+            try:
+                updates.append(self.pendientes.get(timeout=espera) if espera else self.pendientes.get_nowait())
+                while True:
+                    updates.append(self.pendientes.get_nowait())
+            except queue.Empty:
+                pass
+            return [u for u in updates if u["update_id"] >= offset]
+        # setWebhook, deleteWebhook, setMyCommands...
+        return True
+
+    def cerrar(self) -> None:
+        self._httpd.shutdown()
+
+
+def _update(n: int) -> dict:
+    return {
+        "update_id": n,
+        "message": {
+            "message_id": n,
+            "date": int(time.time()),
+            "chat": {"id": n, "type": "private"},
+            "from": {"id": n, "is_bot": False, "first_name": "Bench"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+async def _medir(modo: str, api: ApiSimulada, n_updates: int, ritmo: float, puerto: int) -> list[float]:
+    app = crear_aplicacion(TOKEN, base_url=api.base_url)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    if modo == "webhook":
+        await app.updater.start_webhook(
+            listen="127.0.0.1",
+            port=puerto,
+            url_path="telegram",
+            webhook_url=f"http://127.0.0.1:{puerto}/telegram",
+            secret_token=SECRETO,
+        )
+    else:
+        await app.updater.start_polling(poll_interval=0.0, timeout=1)
+    await app.start()
+
+    inicio_por_chat: dict[int, float] = {}
+    base = 1_000_000 if modo == "webhook" else 2_000_000
+    async with httpx.AsyncClient(timeout=30) as cliente:
+
+        async def enviar(n: int) -> None:
+            update = _update(n)
+            inicio_por_chat[n] = time.perf_counter()
+            if modo == "webhook":
+                await asyncio.sleep(api.latencia_s)  # Telegram → bot
+                r = await cliente.post(
+                    f"http://127.0.0.1:{puerto}/telegram",
+                    json=update,
+                    headers={"X-Telegram-Bot-Api-Secret-Token": SECRETO},
+                )
+                r.raise_for_status()
+            else:
+                api.pendientes.put(update)
+
+        tareas = []
+        for i in range(n_updates):
+            tareas.append(asyncio.create_task(enviar(base + i)))
+            await asyncio.sleep(1 / ritmo)
+        await asyncio.gather(*tareas)
+
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite and not all(n in api.respuestas for n in inicio_por_chat):
+            await asyncio.sleep(0.01)
+
+    await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    if app.post_shutdown:
+        await app.post_shutdown(app)
+    return [api.respuestas[n] - t for n, t in inicio_por_chat.items() if n in api.respuestas]
+
+
+def _informe(modo: str, latencias: list[float], esperadas: int) -> str:
+    if not latencias:
+        return f"{modo:8s} sin respuestas"
+    ms = sorted(x * 1000 for x in latencias)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return (
+        f"{modo:8s} {len(ms)}/{esperadas} respuestas | p50 {statistics.median(ms):7.1f} ms | "
+        f"p95 {p95:7.1f} ms | máx {ms[-1]:7.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=300)
+    parser.add_argument("--ritmo", type=float, default=20, help="updates por segundo")
+    parser.add_argument("--latencia-red", type=float, default=20, help="ms por salto de red")
+    parser.add_argument("--puerto", type=int, default=8787)
+    args = parser.parse_args()
+
+    init_db()
+    api = ApiSimulada(args.latencia_red / 1000)
+    try:
+        for modo in ("polling", "webhook"):
+            latencias = await _medir(modo, api, args.updates, args.ritmo, args.puerto)
+            print(_informe(modo, latencias, args.updates))
+    finally:
+        api.cerrar()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
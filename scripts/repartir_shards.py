@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Reparte una base de un solo archivo en K archivos por usuario (DB_SHARDS=K).
+
+Ejecutar desde la raíz del proyecto, con el bot detenido:
+    python scripts/repartir_shards.py K [--forzar]
+
+Lee DB_PATH (relativo a la raíz del proyecto; por defecto finanzas.db) y
+crea finanzas.0.db ... finanzas.{K-1}.db: cada uno es una copia en la que
+solo quedan las filas de los usuarios con user_id % K igual a su número. El
+archivo original no se modifica. Después, DB_SHARDS=K en .env. Los ids (cuentas, transacciones...) siguen siendo
+únicos entre archivos: cada copia conserva el contador de la original.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from src.database import init_db  # noqa: E402
+from src.database.db import ruta_db  # noqa: E402
+from src.database.shards import ruta_shard  # noqa: E402
+
+
+def _tablas_con_usuario(conn: sqlite3.Connection) -> list[str]:
+    tablas = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    return [
+        t for t in tablas
+        if any(col[1] == "user_id" for col in conn.execute(f"PRAGMA table_info({t})"))
+    ]
+
+
+def repartir(origen: Path, total: int, forzar: bool) -> None:
+    destinos = [ruta_shard(origen, i, total) for i in range(total)]
+    existentes = [d for d in destinos if d.exists()]
+    if existentes and not forzar:
+        print(f"Error: ya existen {', '.join(map(str, existentes))} (usa --forzar para reemplazarlos)")
+        sys.exit(1)
+
+    fuente = sqlite3.connect(origen)
+    try:
+        tablas = _tablas_con_usuario(fuente)
+        for indice, destino in enumerate(destinos):
+            for sufijo in ("", "-wal", "-shm"):
+                Path(f"{destino}{sufijo}").unlink(missing_ok=True)
+            copia = sqlite3.connect(destino)
+            fuente.backup(copia)
+            with copia:
+                for tabla in tablas:
+                    copia.execute(f"DELETE FROM {tabla} WHERE user_id % ? != ?", (total, indice))
+                # La clave de una conversación es [chat_id, user_id]
+                copia.execute(
+                    "DELETE FROM persistencia_conversaciones WHERE json_extract(clave, '$[#-1]') % ? != ?",
+                    (total, indice),
+                )
+            copia.execute("VACUUM")
+            usuarios = copia.execute("SELECT COUNT(DISTINCT user_id) FROM cuentas").fetchone()[0]
+            copia.close()
+            print(f"✓ {destino}: {usuarios} usuarios con cuentas")
+    finally:
+        fuente.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reparte la base en K archivos por user_id")
+    parser.add_argument("shards", type=int, help="número de archivos (K >= 2)")
+    parser.add_argument("--forzar", action="store_true", help="reemplazar archivos existentes")
+    args = parser.parse_args()
+    if args.shards < 2:
+        parser.error("K debe ser al menos 2")
+
+    load_dotenv()
+    # Con DB_SHARDS=1, init_db deja el archivo único con el esquema al día
+    os.environ["DB_SHARDS"] = "1"
+    origen = ruta_db()
+    if not origen.exists():
+        print(f"Error: No se encontró la base de datos en {origen}")
+        sys.exit(1)
+    init_db()
+    repartir(origen, args.shards, args.forzar)
+    print(f"Listo. Añade DB_SHARDS={args.shards} a .env y arranca el bot.")
+
+
+if __name__ == "__main__":
+    main()
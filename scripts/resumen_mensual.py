@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento de la tabla resumen_mensual (totales por usuario, mes, tipo y categoría).
+
+Ejecutar desde la raíz del proyecto:
+    python scripts/resumen_mensual.py verificar [--user ID]
+    python scripts/resumen_mensual.py reconstruir [--user ID]
+
+`verificar` compara la tabla con un recálculo completo desde transacciones y
+sale con código 1 si hay diferencias. `reconstruir` la regenera desde cero.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from src.database import (  # noqa: E402
+    cerrar_conexiones,
+    init_db,
+    reconstruir_resumen_mensual,
+    verificar_resumen_mensual,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mantenimiento de resumen_mensual")
+    parser.add_argument("accion", choices=("verificar", "reconstruir"))
+    parser.add_argument("--user", type=int, default=None, help="limitar a un user_id")
+    args = parser.parse_args()
+
+    load_dotenv()
+    init_db()
+    try:
+        if args.accion == "reconstruir":
+            filas = reconstruir_resumen_mensual(args.user)
+            print(f"✓ resumen_mensual reconstruido: {filas} filas")
+            return
+        diferencias = verificar_resumen_mensual(args.user)
+        if not diferencias:
+            print("✓ resumen_mensual coincide con transacciones")
+            return
+        for d in diferencias:
+            print(
+                f"  user={d['user_id']} {d['ano']}-{d['mes']:02d} {d['tipo']} [{d['categoria']}]: "
+                f"esperado {d['esperado']} ({d['n_esperado']}), actual {d['actual']} ({d['n_actual']})"
+            )
+        print(f"✗ {len(diferencias)} diferencia(s). Usa 'reconstruir' para corregirlas.")
+        sys.exit(1)
+    finally:
+        cerrar_conexiones()
+
+
+if __name__ == "__main__":
+    main()
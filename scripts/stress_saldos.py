@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Prueba de estrés: los saldos siguen siendo exactos con escritores en paralelo.
+
+Lanza varios procesos, cada uno con varios hilos, que registran gastos,
+ingresos y transferencias al mismo tiempo sobre las mismas cuentas de una base
+temporal. Al final comprueba que el saldo de cada cuenta coincide con la suma
+de sus movimientos y con lo que cada worker dice haber escrito.
+
+Ejecutar desde la raíz del proyecto:
+    python scripts/stress_saldos.py [--procesos 4] [--hilos 4] [--operaciones 300]
+
+Sale con código 1 si algún saldo no cuadra.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+USER_ID = 1
+CUENTAS = ("banco", "efectivo", "tarjeta")
+
+
+def _worker(db_path: str, semilla: int, hilos: int, operaciones: int) -> dict[str, float]:
+    """Ejecuta operaciones aleatorias; retorna el delta esperado por cuenta."""
+    os.environ["DB_PATH"] = db_path
+    from src.database import db
+
+    def hilo(n: int) -> dict[str, float]:
+        rnd = random.Random(semilla * 1000 + n)
+        delta = dict.fromkeys(CUENTAS, 0.0)
+        for _ in range(operaciones):
+            op = rnd.random()
+            monto = rnd.randint(1, 5000) / 100
+            if op < 0.4:
+                cuenta = rnd.choice(CUENTAS)
+                ok, _ = db.registrar_gasto(USER_ID, cuenta, monto, "comida")
+                if ok:
+                    delta[cuenta] -= monto
+            elif op < 0.8:
+                cuenta = rnd.choice(CUENTAS)
+                ok, _ = db.registrar_ingreso(USER_ID, cuenta, monto, "sueldo")
+                if ok:
+                    delta[cuenta] += monto
+            else:
+                origen, destino = rnd.sample(CUENTAS, 2)
+                ok, _ = db.transferir(USER_ID, origen, destino, monto)
+                if ok:
+                    delta[origen] -= monto
+                    delta[destino] += monto
+        return delta
+
+    total = dict.fromkeys(CUENTAS, 0.0)
+    with ThreadPoolExecutor(max_workers=hilos) as ex:
+        for delta in ex.map(hilo, range(hilos)):
+            for cuenta, valor in delta.items():
+                total[cuenta] += valor
+    db.cerrar_conexiones()
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Estrés de saldos con escritores concurrentes")
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--hilos", type=int, default=4)
+    parser.add_argument("--operaciones", type=int, default=300, help="por hilo")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    db_path = str(Path(tmp.name) / "stress.db")
+    os.environ["DB_PATH"] = db_path
+    os.environ.setdefault("DB_BUSY_TIMEOUT_MS", "30000")
+    # Los saldos se leen aquí después de que escriban otros procesos: sin caché
+    os.environ["DB_CACHE_USUARIOS"] = "0"
+    from src.database import db
+    from src.database.shards import en_shard, shard_de_usuario
+
+    db.init_db()
+    db.crear_cuenta(USER_ID, "banco", "debito")
+    db.crear_cuenta(USER_ID, "efectivo", "debito")
+    db.crear_cuenta(USER_ID, "tarjeta", "credito")
+    db.agregar_categoria_usuario(USER_ID, "comida", "gasto")
+    db.agregar_categoria_usuario(USER_ID, "sueldo", "ingreso")
+    db.registrar_ingreso(USER_ID, "banco", 1000, "sueldo")
+    db.registrar_ingreso(USER_ID, "efectivo", 1000, "sueldo")
+    inicial = {c["nombre"]: c["saldo"] for c in db.listar_cuentas(USER_ID)}
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(args.procesos) as pool:
+        deltas = pool.starmap(
+            _worker,
+            [(db_path, p, args.hilos, args.operaciones) for p in range(args.procesos)],
+        )
+
+    esperado = dict(inicial)
+    for delta in deltas:
+        for cuenta, valor in delta.items():
+            esperado[cuenta] += valor
+
+    # Con DB_SHARDS la consulta va al archivo del usuario
+    with en_shard(shard_de_usuario(USER_ID)), db.get_read_connection() as conn:
+        movimientos = {
+            r["nombre"]: r["neto"] / 100  # importes en centavos
+            for r in conn.execute("""
+                SELECT c.nombre,
+                       COALESCE(SUM(CASE WHEN t.tipo IN ('ingreso', 'transferencia_entrada')
+                                         THEN t.monto ELSE -t.monto END), 0) AS neto
+                FROM cuentas c LEFT JOIN transacciones t ON t.cuenta_id = c.id
+                WHERE c.user_id = ? GROUP BY c.id
+            """, (USER_ID,))
+        }
+        n_mov = conn.execute("SELECT COUNT(*) FROM transacciones").fetchone()[0]
+
+    ok = True
+    print(f"{args.procesos} procesos × {args.hilos} hilos × {args.operaciones} operaciones; {n_mov} movimientos")
+    for c in db.listar_cuentas(USER_ID):
+        nombre, saldo = c["nombre"], c["saldo"]
+        cuadra = abs(saldo - esperado[nombre]) < 0.005 and abs(saldo - movimientos[nombre]) < 0.005
+        ok = ok and cuadra
+        print(
+            f"  {'✓' if cuadra else '✗'} {nombre}: saldo {saldo:,.2f} | "
+            f"esperado {esperado[nombre]:,.2f} | suma de movimientos {movimientos[nombre]:,.2f}"
+        )
+    diferencias = db.verificar_resumen_mensual(USER_ID)
+    if diferencias:
+        ok = False
+        print(f"  ✗ resumen_mensual: {len(diferencias)} diferencia(s)")
+    db.cerrar_conexiones()
+    tmp.cleanup()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -43,7 +43,23 @@ from telegram.ext import ConversationHandler, filters
     PRES_ELIMINAR_ID,
     CLONAR_PRES_ORIGEN,
     CLONAR_PRES_NUEVO_NOMBRE,
-) = range(40)
+    IMPORTAR_CUENTA,
+    IMPORTAR_CATEGORIA,
+    IMPORTAR_ARCHIVO,
+    EXPORTAR_CONTENIDO,
+    EXPORTAR_CUENTA,
+    EXPORTAR_DESDE,
+    EXPORTAR_HASTA,
+    EXPORTAR_FORMATO,
+    PREF_ZONA,
+    PREF_HORA,
+    ESCALAR_PRES_NOMBRE,
+    ESCALAR_PRES_PORCENTAJE,
+    FUSIONAR_PRES_ORIGEN,
+    FUSIONAR_PRES_DESTINO,
+    COMPARAR_PRES_NOMBRE,
+    COMPARAR_PRES_MES,
+) = range(56)
 
 END = ConversationHandler.END
 
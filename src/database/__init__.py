@@ -1,19 +1,44 @@
 """Módulo de base de datos."""
 from .db import (
     init_db,
+    cerrar_conexiones,
+    estadisticas_cache,
+    en_cache,
+    derivado_de_cuentas,
+    derivado_de_categorias,
     crear_cuenta,
     listar_cuentas,
     obtener_ids_usuarios_con_cuentas,
+    sincronizar_preferencias,
+    obtener_preferencias_resumen,
+    guardar_preferencias_resumen,
+    reclamar_resumenes_pendientes,
+    registrar_fallos_entrega,
+    pausados_cargados,
+    usuario_pausado,
+    reanudar_usuario,
+    obtener_fallos_entrega,
+    cargar_datos_usuarios,
+    cargar_conversaciones,
+    guardar_persistencia,
     listar_registros,
+    listar_registros_pagina,
+    iterar_transacciones,
+    iterar_presupuesto_movimientos,
+    iterar_resumenes,
     eliminar_registro,
     editar_registro,
+    registrar_movimiento,
     registrar_gasto,
     registrar_ingreso,
     registrar_ajuste_saldo,
     transferir,
+    importar_movimientos,
     obtener_resumen,
     obtener_resumen_por_categoria,
     obtener_resumen_por_mes,
+    reconstruir_resumen_mensual,
+    verificar_resumen_mensual,
     obtener_cuenta_por_nombre,
     obtener_cuenta_por_id,
     obtener_transaccion,
@@ -21,13 +46,18 @@ from .db import (
     obtener_presupuesto_registro,
     editar_presupuesto_registro,
     eliminar_presupuesto_registro,
+    eliminar_presupuesto_registros,
     listar_presupuesto,
     listar_presupuestos,
+    listar_presupuestos_con_detalle,
+    comparar_presupuesto,
     obtener_presupuesto_por_nombre,
     obtener_presupuesto_por_id,
     resolver_presupuesto_por_nombre,
     totales_presupuesto,
     clonar_presupuesto,
+    escalar_presupuesto,
+    fusionar_presupuestos,
     listar_categorias_usuario,
     listar_categorias_para_movimiento,
     categoria_permitida_para_movimiento,
@@ -38,19 +68,44 @@ from .db import (
 
 __all__ = [
     "init_db",
+    "cerrar_conexiones",
+    "estadisticas_cache",
+    "en_cache",
+    "derivado_de_cuentas",
+    "derivado_de_categorias",
     "crear_cuenta",
     "listar_cuentas",
     "obtener_ids_usuarios_con_cuentas",
+    "sincronizar_preferencias",
+    "obtener_preferencias_resumen",
+    "guardar_preferencias_resumen",
+    "reclamar_resumenes_pendientes",
+    "registrar_fallos_entrega",
+    "pausados_cargados",
+    "usuario_pausado",
+    "reanudar_usuario",
+    "obtener_fallos_entrega",
+    "cargar_datos_usuarios",
+    "cargar_conversaciones",
+    "guardar_persistencia",
     "listar_registros",
+    "listar_registros_pagina",
+    "iterar_transacciones",
+    "iterar_presupuesto_movimientos",
+    "iterar_resumenes",
     "eliminar_registro",
     "editar_registro",
+    "registrar_movimiento",
     "registrar_gasto",
     "registrar_ingreso",
     "registrar_ajuste_saldo",
     "transferir",
+    "importar_movimientos",
     "obtener_resumen",
     "obtener_resumen_por_categoria",
     "obtener_resumen_por_mes",
+    "reconstruir_resumen_mensual",
+    "verificar_resumen_mensual",
     "obtener_cuenta_por_nombre",
     "obtener_cuenta_por_id",
     "obtener_transaccion",
@@ -58,13 +113,18 @@ __all__ = [
     "obtener_presupuesto_registro",
     "editar_presupuesto_registro",
     "eliminar_presupuesto_registro",
+    "eliminar_presupuesto_registros",
     "listar_presupuesto",
     "listar_presupuestos",
+    "listar_presupuestos_con_detalle",
+    "comparar_presupuesto",
     "obtener_presupuesto_por_nombre",
     "obtener_presupuesto_por_id",
     "resolver_presupuesto_por_nombre",
     "totales_presupuesto",
     "clonar_presupuesto",
+    "escalar_presupuesto",
+    "fusionar_presupuestos",
     "listar_categorias_usuario",
     "listar_categorias_para_movimiento",
     "categoria_permitida_para_movimiento",
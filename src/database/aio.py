@@ -0,0 +1,178 @@
+"""
+Fachada asíncrona de src.database para usar desde los handlers.
+
+Cada función tiene la misma firma que su versión síncrona pero se usa con
+`await`. Las lecturas corren en un pool de hilos acotado (tantos hilos como
+conexiones de lectura) y las escrituras en un único hilo escritor, así una
+consulta lenta no bloquea el event loop. Con DB_SHARDS hay un hilo escritor
+por archivo: las escrituras de usuarios de archivos distintos no se esperan.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import db
+from .pool import ConfigPool
+from .shards import total_shards
+
+_lectores: ThreadPoolExecutor | None = None
+_escritores: list[ThreadPoolExecutor] = []
+_lock = threading.Lock()
+
+
+def _executors() -> tuple[ThreadPoolExecutor, list[ThreadPoolExecutor]]:
+    global _lectores, _escritores
+    if _lectores is None or not _escritores:
+        with _lock:
+            if _lectores is None or not _escritores:
+                _lectores = ThreadPoolExecutor(
+                    max_workers=ConfigPool.desde_entorno().lectores,
+                    thread_name_prefix="db-lectura",
+                )
+                _escritores = [
+                    ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"db-escritura-{i}")
+                    for i in range(total_shards())
+                ]
+    return _lectores, _escritores
+
+
+def cerrar() -> None:
+    """Espera a que terminen las tareas pendientes y libera los hilos."""
+    global _lectores, _escritores
+    with _lock:
+        for executor in (_lectores, *_escritores):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        _lectores, _escritores = None, []
+
+
+async def ejecutar(func, *args, escritura: bool = False, **kwargs):
+    """Ejecuta una función síncrona de base de datos fuera del event loop."""
+    lectores, escritores = _executors()
+    if escritura:
+        # Las escrituras de un usuario (primer argumento entero) van al hilo de su
+        # archivo; las que tocan varios archivos (init_db, reclamar...), al primero
+        user_id = args[0] if args and type(args[0]) is int else 0
+        executor = escritores[user_id % len(escritores)]
+    else:
+        executor = lectores
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor,
+        functools.partial(func, *args, **kwargs),
+    )
+
+
+def _lectura(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await ejecutar(func, *args, **kwargs)
+
+    return wrapper
+
+
+def _lectura_en_cache(grupo: str):
+    """Como _lectura, pero si el grupo del usuario está en caché responde sin salir del loop.
+
+    Un acierto solo toca memoria; ir al executor costaría más que la propia
+    lectura. Si la entrada se invalida justo entre la comprobación y la llamada,
+    esa única lectura se hace en el loop (es una consulta corta por índice).
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        async def wrapper(user_id, *args, **kwargs):
+            if db.en_cache(user_id, grupo):
+                return func(user_id, *args, **kwargs)
+            return await ejecutar(func, user_id, *args, **kwargs)
+
+        return wrapper
+
+    return decorador
+
+
+def _escritura(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await ejecutar(func, *args, escritura=True, **kwargs)
+
+    return wrapper
+
+
+# Escrituras (hilo escritor único)
+init_db = _escritura(db.init_db)
+crear_cuenta = _escritura(db.crear_cuenta)
+registrar_movimiento = _escritura(db.registrar_movimiento)
+registrar_gasto = _escritura(db.registrar_gasto)
+registrar_ingreso = _escritura(db.registrar_ingreso)
+registrar_ajuste_saldo = _escritura(db.registrar_ajuste_saldo)
+transferir = _escritura(db.transferir)
+importar_movimientos = _escritura(db.importar_movimientos)
+editar_registro = _escritura(db.editar_registro)
+eliminar_registro = _escritura(db.eliminar_registro)
+agregar_presupuesto_registro = _escritura(db.agregar_presupuesto_registro)
+editar_presupuesto_registro = _escritura(db.editar_presupuesto_registro)
+eliminar_presupuesto_registro = _escritura(db.eliminar_presupuesto_registro)
+resolver_presupuesto_por_nombre = _escritura(db.resolver_presupuesto_por_nombre)
+clonar_presupuesto = _escritura(db.clonar_presupuesto)
+eliminar_presupuesto_registros = _escritura(db.eliminar_presupuesto_registros)
+escalar_presupuesto = _escritura(db.escalar_presupuesto)
+fusionar_presupuestos = _escritura(db.fusionar_presupuestos)
+agregar_categoria_usuario = _escritura(db.agregar_categoria_usuario)
+renombrar_categoria_usuario = _escritura(db.renombrar_categoria_usuario)
+reconstruir_resumen_mensual = _escritura(db.reconstruir_resumen_mensual)
+sincronizar_preferencias = _escritura(db.sincronizar_preferencias)
+guardar_preferencias_resumen = _escritura(db.guardar_preferencias_resumen)
+reclamar_resumenes_pendientes = _escritura(db.reclamar_resumenes_pendientes)
+registrar_fallos_entrega = _escritura(db.registrar_fallos_entrega)
+reanudar_usuario = _escritura(db.reanudar_usuario)
+guardar_persistencia = _escritura(db.guardar_persistencia)
+
+# Lecturas (pool de hilos acotado)
+listar_cuentas = _lectura_en_cache("cuentas")(db.listar_cuentas)
+obtener_ids_usuarios_con_cuentas = _lectura(db.obtener_ids_usuarios_con_cuentas)
+obtener_preferencias_resumen = _lectura(db.obtener_preferencias_resumen)
+obtener_fallos_entrega = _lectura(db.obtener_fallos_entrega)
+cargar_datos_usuarios = _lectura(db.cargar_datos_usuarios)
+cargar_conversaciones = _lectura(db.cargar_conversaciones)
+listar_registros = _lectura(db.listar_registros)
+listar_registros_pagina = _lectura(db.listar_registros_pagina)
+obtener_resumen = _lectura(db.obtener_resumen)
+obtener_resumen_por_categoria = _lectura(db.obtener_resumen_por_categoria)
+obtener_resumen_por_mes = _lectura(db.obtener_resumen_por_mes)
+verificar_resumen_mensual = _lectura(db.verificar_resumen_mensual)
+obtener_cuenta_por_nombre = _lectura_en_cache("cuentas")(db.obtener_cuenta_por_nombre)
+obtener_cuenta_por_id = _lectura_en_cache("cuentas")(db.obtener_cuenta_por_id)
+obtener_transaccion = _lectura(db.obtener_transaccion)
+obtener_presupuesto_registro = _lectura(db.obtener_presupuesto_registro)
+listar_presupuesto = _lectura(db.listar_presupuesto)
+listar_presupuestos = _lectura(db.listar_presupuestos)
+listar_presupuestos_con_detalle = _lectura(db.listar_presupuestos_con_detalle)
+comparar_presupuesto = _lectura(db.comparar_presupuesto)
+obtener_presupuesto_por_nombre = _lectura(db.obtener_presupuesto_por_nombre)
+obtener_presupuesto_por_id = _lectura(db.obtener_presupuesto_por_id)
+totales_presupuesto = _lectura(db.totales_presupuesto)
+listar_categorias_usuario = _lectura_en_cache("categorias")(db.listar_categorias_usuario)
+listar_categorias_para_movimiento = _lectura_en_cache("categorias")(db.listar_categorias_para_movimiento)
+categoria_permitida_para_movimiento = _lectura_en_cache("categorias")(db.categoria_permitida_para_movimiento)
+obtener_categoria_usuario_por_id = _lectura_en_cache("categorias")(db.obtener_categoria_usuario_por_id)
+estadisticas_cache = _lectura(db.estadisticas_cache)
+derivado_de_cuentas = _lectura_en_cache("nombres_cuentas")(db.derivado_de_cuentas)
+derivado_de_categorias = _lectura_en_cache("categorias")(db.derivado_de_categorias)
+
+
+async def usuario_pausado(user_id: int) -> bool:
+    """db.usuario_pausado sin bloquear el loop.
+
+    Se llama en cada update: una vez cargado el conjunto responde desde memoria
+    en el loop; la primera carga lee todos los archivos y va al executor.
+    """
+    if db.pausados_cargados():
+        return db.usuario_pausado(user_id)
+    return await ejecutar(db.usuario_pausado, user_id)
+
+
+# iterar_transacciones, iterar_presupuesto_movimientos e iterar_resumenes son
+# generadores que tienen una conexión de lectura mientras se recorren: no se
+# envuelven aquí, se consumen enteros dentro del executor con `ejecutar` (ver
+# src.exportacion y commands.resumenes_diarios).
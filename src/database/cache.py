@@ -0,0 +1,152 @@
+"""Caché en memoria, por usuario, de datos que cambian poco (cuentas y categorías)."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from ..utils import numero_env
+
+
+class _Entrada:
+    """Valor de un grupo y lo que se ha calculado a partir de él (teclados, textos)."""
+
+    __slots__ = ("expira", "valor", "derivados")
+
+    def __init__(self, expira: float, valor: Any):
+        self.expira = expira
+        self.valor = valor
+        self.derivados: dict[Hashable, Any] = {}
+
+
+class CacheUsuarios:
+    """LRU acotada por número de usuarios, con caducidad (TTL) por entrada.
+
+    Cada usuario tiene varios grupos ("cuentas", "categorias"...); se invalida por
+    usuario y grupo después de cada escritura que los cambia. Es segura entre
+    hilos: la usan a la vez los lectores del pool y el hilo escritor.
+
+    Una carga que empezó antes de una invalidación no se guarda: así una lectura
+    lenta no deja en la caché datos anteriores al último commit.
+
+    Junto a cada grupo se pueden memorizar valores derivados (ver `derivado`),
+    que caducan y se invalidan con él.
+    """
+
+    def __init__(
+        self,
+        max_usuarios: int = 1000,
+        ttl_s: float = 300.0,
+        reloj: Callable[[], float] = time.monotonic,
+    ):
+        self.max_usuarios = max_usuarios
+        self.ttl_s = ttl_s
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._datos: OrderedDict[int, dict[str, _Entrada]] = OrderedDict()
+        self._version = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+
+    @classmethod
+    def desde_entorno(cls) -> "CacheUsuarios":
+        """Lee DB_CACHE_USUARIOS y DB_CACHE_TTL_S (ver README); 0 desactiva la caché."""
+        return cls(
+            max_usuarios=max(0, int(numero_env("DB_CACHE_USUARIOS", 1000))),
+            ttl_s=max(0.0, numero_env("DB_CACHE_TTL_S", 300.0)),
+        )
+
+    @property
+    def activa(self) -> bool:
+        return self.max_usuarios > 0 and self.ttl_s > 0
+
+    def _vigente(self, user_id: int, grupo: str, ahora: float) -> _Entrada | None:
+        entrada = self._datos.get(user_id, {}).get(grupo)
+        return entrada if entrada is not None and entrada.expira > ahora else None
+
+    def _entrada(self, user_id: int, grupo: str, cargar: Callable[[], Any]) -> _Entrada:
+        ahora = self._reloj()
+        with self._lock:
+            entrada = self._vigente(user_id, grupo, ahora)
+            if entrada is not None:
+                self._datos.move_to_end(user_id)
+                self.aciertos += 1
+                return entrada
+            self.fallos += 1
+            version = self._version
+
+        entrada = _Entrada(ahora + self.ttl_s, cargar())
+
+        with self._lock:
+            if version == self._version:
+                self._datos.setdefault(user_id, {})[grupo] = entrada
+                self._datos.move_to_end(user_id)
+                while len(self._datos) > self.max_usuarios:
+                    self._datos.popitem(last=False)
+        return entrada
+
+    def vigente(self, user_id: int, grupo: str) -> bool:
+        """True si el grupo está en caché y sin caducar (no cuenta como acierto)."""
+        if not self.activa:
+            return False
+        ahora = self._reloj()
+        with self._lock:
+            return self._vigente(user_id, grupo, ahora) is not None
+
+    def obtener(self, user_id: int, grupo: str, cargar: Callable[[], Any]) -> Any:
+        """Valor en caché del grupo, o el resultado de `cargar()` (que se guarda)."""
+        if not self.activa:
+            return cargar()
+        return self._entrada(user_id, grupo, cargar).valor
+
+    def derivado(
+        self,
+        user_id: int,
+        grupo: str,
+        clave: Hashable,
+        cargar: Callable[[], Any],
+        construir: Callable[[Any], Any],
+    ) -> Any:
+        """`construir(valor del grupo)`, memorizado por `clave` junto al grupo.
+
+        Lo derivado se calcula siempre desde el mismo valor al que acompaña, así
+        nunca queda un resultado de datos anteriores tras una invalidación.
+        """
+        if not self.activa:
+            return construir(cargar())
+        entrada = self._entrada(user_id, grupo, cargar)
+        with self._lock:
+            if clave in entrada.derivados:
+                return entrada.derivados[clave]
+        resultado = construir(entrada.valor)
+        with self._lock:
+            return entrada.derivados.setdefault(clave, resultado)
+
+    def invalidar(self, user_id: int, *grupos: str) -> None:
+        """Descarta los grupos indicados del usuario (todos si no se indica ninguno)."""
+        with self._lock:
+            self._version += 1
+            self.invalidaciones += 1
+            grupos_usuario = self._datos.get(user_id)
+            if grupos_usuario is None:
+                return
+            for grupo in grupos or tuple(grupos_usuario):
+                grupos_usuario.pop(grupo, None)
+            if not grupos_usuario:
+                del self._datos[user_id]
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._datos.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "invalidaciones": self.invalidaciones,
+                "usuarios": len(self._datos),
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            }
@@ -1,92 +1,173 @@
 """
 Módulo de base de datos SQLite para el bot de finanzas personales.
 """
+import functools
+import itertools
+import json
+import math
+import os
 import sqlite3
+import threading
 import uuid
-from pathlib import Path
 from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Iterable, Iterator
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+from .cache import CacheUsuarios
+from .migraciones import aplicar_migraciones
+from .pool import ConfigPool, PoolConexiones
+from .shards import (
+    concatenar,
+    en_shard,
+    en_todos,
+    iterar_en_shard,
+    ninguno,
+    por_usuario,
+    repartir,
+    ruta_shard,
+    shard_actual,
+    sumar,
+    total_shards,
+    unir_conjuntos,
+    unir_dicts,
+    unir_ordenados,
+)
 
 # Ruta al DB: desde src/database/db.py subimos 2 niveles a la raíz del proyecto
 DB_PATH = Path(__file__).resolve().parent.parent.parent / "finanzas.db"
 
+def ruta_db() -> Path:
+    """DB_PATH, o finanzas.db en la raíz del proyecto.
+
+    Una ruta relativa se toma desde la raíz del proyecto, no desde el
+    directorio de trabajo: arrancar desde otra carpeta no crea otra base vacía.
+    """
+    valor = os.getenv("DB_PATH")
+    if not valor or not valor.strip():
+        return DB_PATH
+    ruta = Path(valor.strip()).expanduser()
+    return ruta if ruta.is_absolute() else DB_PATH.parent / ruta
+
+
+# Un pool por archivo; con DB_SHARDS=1 solo existe el 0 (ver shards.py)
+_pools: dict[int, PoolConexiones] = {}
+_pool_lock = threading.Lock()
+_cache: CacheUsuarios | None = None
+
+
+def _obtener_pool() -> PoolConexiones:
+    """Pool del archivo activo, creado la primera vez que se usa (después de cargar .env)."""
+    indice = shard_actual()
+    pool = _pools.get(indice)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(indice)
+            if pool is None:
+                path = ruta_shard(ruta_db(), indice, total_shards())
+                pool = _pools[indice] = PoolConexiones(path, ConfigPool.desde_entorno())
+    return pool
+
+
+def _obtener_cache() -> CacheUsuarios:
+    """Caché de cuentas y categorías por usuario, creada al primer uso (como el pool)."""
+    global _cache
+    if _cache is None:
+        with _pool_lock:
+            if _cache is None:
+                _cache = CacheUsuarios.desde_entorno()
+    return _cache
+
+
+def en_cache(user_id: int, grupo: str) -> bool:
+    """True si "cuentas" o "categorias" del usuario se pueden leer sin ir a SQLite."""
+    return _obtener_cache().vigente(user_id, grupo)
+
+
+def estadisticas_cache() -> dict:
+    """Aciertos, fallos e invalidaciones de la caché de cuentas y categorías."""
+    return _obtener_cache().estadisticas()
+
+
+def cerrar_conexiones() -> None:
+    """Cierra los pools y vacía las cachés; la siguiente llamada los vuelve a abrir."""
+    global _pausados
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.cerrar()
+        _pools.clear()
+        if _cache is not None:
+            _cache.limpiar()
+    with _pausados_lock:
+        _pausados = None
+
 
 @contextmanager
 def get_connection():
-    """Context manager para conexiones a la base de datos."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
+    """Context manager para la conexión de escritura (única y serializada)."""
+    with _obtener_pool().escritura() as conn:
         yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
+
+
+@contextmanager
+def _escritura_usuario(user_id: int, *grupos: str):
+    """get_connection que, al terminar, invalida esos grupos de la caché del usuario.
+
+    La invalidación va después del commit: una lectura que llegue antes todavía
+    ve (y cachea) el estado anterior, pero esa carga se descarta (ver CacheUsuarios).
+    """
+    try:
+        with get_connection() as conn:
+            yield conn
     finally:
-        conn.close()
+        _obtener_cache().invalidar(user_id, *grupos)
+
 
+@contextmanager
+def get_read_connection():
+    """Context manager para una conexión de solo lectura del pool."""
+    with _obtener_pool().lectura() as conn:
+        yield conn
 
+
+@en_todos(ninguno)
 def init_db():
-    """Inicializa las tablas de la base de datos."""
-    with get_connection() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS cuentas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                nombre TEXT NOT NULL,
-                tipo TEXT NOT NULL CHECK(tipo IN ('credito', 'debito')),
-                saldo REAL NOT NULL DEFAULT 0,
-                creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, nombre)
-            )
-        """)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS transacciones (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                cuenta_id INTEGER NOT NULL,
-                tipo TEXT NOT NULL CHECK(tipo IN ('gasto', 'ingreso', 'transferencia_entrada', 'transferencia_salida')),
-                monto REAL NOT NULL,
-                cuenta_relacionada_id INTEGER,
-                transfer_id TEXT,
-                creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (cuenta_id) REFERENCES cuentas(id),
-                FOREIGN KEY (cuenta_relacionada_id) REFERENCES cuentas(id)
-            )
-        """)
-        try:
-            conn.execute("ALTER TABLE transacciones ADD COLUMN transfer_id TEXT")
-        except sqlite3.OperationalError:
-            pass
-        try:
-            conn.execute("ALTER TABLE transacciones ADD COLUMN categoria TEXT DEFAULT 'sin_categoria'")
-        except sqlite3.OperationalError:
-            pass
-        _ensure_presupuesto_tabla(conn)
-        _ensure_presupuesto_es_anual(conn)
-        _ensure_presupuestos_y_relacion(conn)
-        _ensure_categorias_usuario_tabla(conn)
-
-
-def _ensure_categorias_usuario_tabla(conn: sqlite3.Connection) -> None:
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS categorias_usuario (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            nombre TEXT NOT NULL,
-            ambito TEXT NOT NULL CHECK(ambito IN ('gasto', 'ingreso', 'ambos')),
-            creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id, nombre)
-        )
-    """)
+    """Crea o actualiza el esquema aplicando las migraciones pendientes."""
+    # Cada migración va en su propia transacción: sin BEGIN de get_connection
+    with _obtener_pool().escritor() as conn:
+        aplicar_migraciones(conn)
+
+
+def _a_centavos(monto: float) -> int:
+    """Importe en unidades (como lo escribe el usuario) → centavos enteros.
+
+    Saldos, montos y totales se guardan en centavos; Decimal evita que 0.29
+    se convierta en 28 por la representación binaria del float.
+    """
+    return int((Decimal(str(monto)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def _de_centavos(centavos: int | None) -> float:
+    """Centavos guardados → importe en unidades para mostrar."""
+    return (centavos or 0) / 100
+
+
+def _con_importes(row: sqlite3.Row, *campos: str) -> dict:
+    """Fila como dict con los campos de importe ya convertidos a unidades."""
+    d = dict(row)
+    for campo in campos:
+        d[campo] = _de_centavos(d[campo])
+    return d
 
 
 def _normalizar_nombre_categoria(nombre: str) -> str:
     return (nombre or "").strip().lower()
 
 
-def listar_categorias_usuario(user_id: int) -> list[dict]:
-    """Todas las categorías definidas por el usuario (id, nombre, ambito)."""
-    with get_connection() as conn:
+def _cargar_categorias(user_id: int) -> list[dict]:
+    with get_read_connection() as conn:
         rows = conn.execute(
             """SELECT id, nombre, ambito FROM categorias_usuario
                WHERE user_id = ? ORDER BY nombre COLLATE NOCASE ASC""",
@@ -95,48 +176,76 @@ def listar_categorias_usuario(user_id: int) -> list[dict]:
     return [dict(r) for r in rows]
 
 
+def _categorias_en_cache(user_id: int) -> list[dict]:
+    """Categorías del usuario desde la caché (no modificar: usar copias)."""
+    return _obtener_cache().obtener(user_id, "categorias", lambda: _cargar_categorias(user_id))
+
+
+@por_usuario
+def derivado_de_categorias(user_id: int, clave, construir):
+    """`construir(categorias)` memorizado por `clave` junto a las categorías en caché.
+
+    Se recalcula solo cuando cambian las categorías del usuario (o caduca la
+    caché). `construir` recibe la lista compartida y no debe modificarla.
+    """
+    return _obtener_cache().derivado(
+        user_id, "categorias", clave, lambda: _cargar_categorias(user_id), construir
+    )
+
+
+@por_usuario
+def listar_categorias_usuario(user_id: int) -> list[dict]:
+    """Todas las categorías definidas por el usuario (id, nombre, ambito)."""
+    return [dict(c) for c in _categorias_en_cache(user_id)]
+
+
+@por_usuario
 def listar_categorias_para_movimiento(user_id: int, movimiento_tipo: str) -> list[dict]:
     """Categorías aplicables a un gasto o ingreso (incluye ambito 'ambos')."""
     movimiento_tipo = movimiento_tipo.lower().strip()
     if movimiento_tipo not in ("gasto", "ingreso"):
         return []
-    with get_connection() as conn:
-        rows = conn.execute(
-            """SELECT id, nombre, ambito FROM categorias_usuario
-               WHERE user_id = ? AND (ambito = ? OR ambito = 'ambos')
-               ORDER BY nombre COLLATE NOCASE ASC""",
-            (user_id, movimiento_tipo),
-        ).fetchall()
-    return [dict(r) for r in rows]
+    return [
+        dict(c) for c in _categorias_en_cache(user_id)
+        if c["ambito"] in (movimiento_tipo, "ambos")
+    ]
 
 
-def categoria_permitida_para_movimiento(user_id: int, nombre: str, movimiento_tipo: str) -> bool:
+def _categoria_permitida(
+    conn: sqlite3.Connection, user_id: int, nombre: str, movimiento_tipo: str
+) -> bool:
     n = _normalizar_nombre_categoria(nombre)
     if not n:
         return False
     movimiento_tipo = movimiento_tipo.lower().strip()
     if movimiento_tipo not in ("gasto", "ingreso"):
         return False
-    with get_connection() as conn:
-        row = conn.execute(
-            """SELECT 1 FROM categorias_usuario
-               WHERE user_id = ? AND nombre = ?
-                 AND (ambito = 'ambos' OR ambito = ?)""",
-            (user_id, n, movimiento_tipo),
-        ).fetchone()
+    row = conn.execute(
+        """SELECT 1 FROM categorias_usuario
+           WHERE user_id = ? AND nombre = ?
+             AND (ambito = 'ambos' OR ambito = ?)""",
+        (user_id, n, movimiento_tipo),
+    ).fetchone()
     return row is not None
 
 
+@por_usuario
+def categoria_permitida_para_movimiento(user_id: int, nombre: str, movimiento_tipo: str) -> bool:
+    n = _normalizar_nombre_categoria(nombre)
+    return bool(n) and any(
+        c["nombre"] == n for c in listar_categorias_para_movimiento(user_id, movimiento_tipo)
+    )
+
+
+@por_usuario
 def obtener_categoria_usuario_por_id(user_id: int, categoria_id: int) -> dict | None:
-    with get_connection() as conn:
-        row = conn.execute(
-            """SELECT id, nombre, ambito FROM categorias_usuario
-               WHERE id = ? AND user_id = ?""",
-            (categoria_id, user_id),
-        ).fetchone()
-    return dict(row) if row else None
+    for c in _categorias_en_cache(user_id):
+        if c["id"] == categoria_id:
+            return dict(c)
+    return None
 
 
+@por_usuario
 def agregar_categoria_usuario(user_id: int, nombre: str, ambito: str) -> tuple[bool, str]:
     n = _normalizar_nombre_categoria(nombre)
     if not n:
@@ -145,7 +254,7 @@ def agregar_categoria_usuario(user_id: int, nombre: str, ambito: str) -> tuple[b
     if ambito not in ("gasto", "ingreso", "ambos"):
         return False, "El ámbito debe ser: gasto, ingreso o ambos."
     try:
-        with get_connection() as conn:
+        with _escritura_usuario(user_id, "categorias") as conn:
             conn.execute(
                 """INSERT INTO categorias_usuario (user_id, nombre, ambito)
                    VALUES (?, ?, ?)""",
@@ -157,6 +266,7 @@ def agregar_categoria_usuario(user_id: int, nombre: str, ambito: str) -> tuple[b
         return False, f"Ya tienes una categoría con el nombre '{n}'."
 
 
+@por_usuario
 def renombrar_categoria_usuario(user_id: int, categoria_id: int, nuevo_nombre: str) -> tuple[bool, str]:
     nuevo = _normalizar_nombre_categoria(nuevo_nombre)
     if not nuevo:
@@ -169,7 +279,7 @@ def renombrar_categoria_usuario(user_id: int, categoria_id: int, nuevo_nombre: s
         return False, "El nombre es el mismo que ya tenías."
 
     try:
-        with get_connection() as conn:
+        with _escritura_usuario(user_id, "categorias") as conn:
             conn.execute(
                 """UPDATE categorias_usuario SET nombre = ?
                    WHERE id = ? AND user_id = ?""",
@@ -186,133 +296,22 @@ def renombrar_categoria_usuario(user_id: int, categoria_id: int, nuevo_nombre: s
                    WHERE user_id = ? AND categoria = ?""",
                 (nuevo, user_id, viejo),
             )
+            _resumen_mensual_recalcular(conn, user_id, (viejo, nuevo))
         return True, f"Categoría #{categoria_id} renombrada: '{viejo}' → '{nuevo}' (movimientos vinculados actualizados)."
     except sqlite3.IntegrityError:
         return False, f"Ya existe otra categoría con el nombre '{nuevo}'."
 
 
-def _ensure_presupuesto_es_anual(conn: sqlite3.Connection) -> None:
-    """Añade es_anual (gasto anual → se usa monto/12 en totales) si la tabla ya existía sin la columna."""
-    row = conn.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='presupuesto_movimientos'"
-    ).fetchone()
-    if not row:
-        return
-    cols = {r[1] for r in conn.execute("PRAGMA table_info(presupuesto_movimientos)")}
-    if "es_anual" in cols:
-        return
-    try:
-        conn.execute(
-            "ALTER TABLE presupuesto_movimientos ADD COLUMN es_anual INTEGER NOT NULL DEFAULT 0"
-        )
-    except sqlite3.OperationalError:
-        pass
-
-
-def _ensure_presupuesto_tabla(conn: sqlite3.Connection) -> None:
-    """Crea la tabla de presupuesto (única por usuario, sin periodo) o migra la versión con año/mes."""
-    row = conn.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='presupuesto_movimientos'"
-    ).fetchone()
-    if not row:
-        conn.execute("""
-            CREATE TABLE presupuesto_movimientos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                tipo TEXT NOT NULL CHECK(tipo IN ('gasto', 'ingreso')),
-                monto REAL NOT NULL,
-                categoria TEXT NOT NULL DEFAULT 'sin_categoria',
-                es_anual INTEGER NOT NULL DEFAULT 0 CHECK(es_anual IN (0, 1)),
-                creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        return
-
-    cols = {r[1] for r in conn.execute("PRAGMA table_info(presupuesto_movimientos)")}
-    if "ano" not in cols:
-        return
-
-    conn.execute("""
-        CREATE TABLE presupuesto_movimientos_new (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            tipo TEXT NOT NULL CHECK(tipo IN ('gasto', 'ingreso')),
-            monto REAL NOT NULL,
-            categoria TEXT NOT NULL DEFAULT 'sin_categoria',
-            es_anual INTEGER NOT NULL DEFAULT 0 CHECK(es_anual IN (0, 1)),
-            creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.execute("""
-        INSERT INTO presupuesto_movimientos_new (id, user_id, tipo, monto, categoria, es_anual, creada_en)
-        SELECT id, user_id, tipo, monto, categoria, 0, creada_en FROM presupuesto_movimientos
-    """)
-    conn.execute("DROP TABLE presupuesto_movimientos")
-    conn.execute("ALTER TABLE presupuesto_movimientos_new RENAME TO presupuesto_movimientos")
-    mx = conn.execute(
-        "SELECT COALESCE(MAX(id), 0) FROM presupuesto_movimientos"
-    ).fetchone()[0]
-    cur = conn.execute(
-        "UPDATE sqlite_sequence SET seq = ? WHERE name = 'presupuesto_movimientos'",
-        (mx,),
-    )
-    if cur.rowcount == 0:
-        conn.execute(
-            "INSERT INTO sqlite_sequence (name, seq) VALUES ('presupuesto_movimientos', ?)",
-            (mx,),
-        )
-
-
-def _ensure_presupuestos_y_relacion(conn: sqlite3.Connection) -> None:
-    """Varios presupuestos por usuario; movimientos enlazados con presupuesto_id."""
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS presupuestos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            nombre TEXT NOT NULL,
-            creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id, nombre)
-        )
-    """)
-    row = conn.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='presupuesto_movimientos'"
-    ).fetchone()
-    if not row:
-        return
-    cols = {r[1] for r in conn.execute("PRAGMA table_info(presupuesto_movimientos)")}
-    if "presupuesto_id" in cols:
-        return
-    for (uid,) in conn.execute(
-        "SELECT DISTINCT user_id FROM presupuesto_movimientos"
-    ).fetchall():
-        conn.execute(
-            "INSERT OR IGNORE INTO presupuestos (user_id, nombre) VALUES (?, ?)",
-            (uid, "principal"),
-        )
-    conn.execute("ALTER TABLE presupuesto_movimientos ADD COLUMN presupuesto_id INTEGER")
-    for mid, uid in conn.execute(
-        "SELECT id, user_id FROM presupuesto_movimientos"
-    ).fetchall():
-        pr = conn.execute(
-            "SELECT id FROM presupuestos WHERE user_id = ? AND nombre = ?",
-            (uid, "principal"),
-        ).fetchone()
-        if pr:
-            conn.execute(
-                "UPDATE presupuesto_movimientos SET presupuesto_id = ? WHERE id = ?",
-                (pr[0], mid),
-            )
-
-
 def _normalizar_nombre_presupuesto(nombre: str) -> str:
     return (nombre or "").strip().lower()
 
 
+@por_usuario
 def obtener_presupuesto_por_nombre(user_id: int, nombre: str) -> dict | None:
     n = _normalizar_nombre_presupuesto(nombre)
     if not n:
         return None
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         row = conn.execute(
             "SELECT id, user_id, nombre FROM presupuestos WHERE user_id = ? AND nombre = ?",
             (user_id, n),
@@ -320,8 +319,9 @@ def obtener_presupuesto_por_nombre(user_id: int, nombre: str) -> dict | None:
     return dict(row) if row else None
 
 
+@por_usuario
 def obtener_presupuesto_por_id(user_id: int, presupuesto_id: int) -> dict | None:
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         row = conn.execute(
             "SELECT id, user_id, nombre FROM presupuestos WHERE id = ? AND user_id = ?",
             (presupuesto_id, user_id),
@@ -329,6 +329,7 @@ def obtener_presupuesto_por_id(user_id: int, presupuesto_id: int) -> dict | None
     return dict(row) if row else None
 
 
+@por_usuario
 def resolver_presupuesto_por_nombre(user_id: int, nombre: str) -> tuple[int | None, str | None]:
     """Devuelve (presupuesto_id, None) o (None, error). Crea el presupuesto si no existe."""
     n = _normalizar_nombre_presupuesto(nombre)
@@ -352,12 +353,13 @@ def resolver_presupuesto_por_nombre(user_id: int, nombre: str) -> tuple[int | No
         return None, "No se pudo crear el presupuesto."
 
 
+@por_usuario
 def listar_presupuestos(user_id: int) -> list[dict]:
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         rows = conn.execute(
             """SELECT p.id, p.nombre,
                (SELECT COUNT(*) FROM presupuesto_movimientos m
-                WHERE m.presupuesto_id = p.id) AS n_movimientos
+                WHERE m.user_id = p.user_id AND m.presupuesto_id = p.id) AS n_movimientos
                FROM presupuestos p WHERE p.user_id = ?
                ORDER BY p.nombre COLLATE NOCASE ASC""",
             (user_id,),
@@ -365,6 +367,7 @@ def listar_presupuestos(user_id: int) -> list[dict]:
     return [dict(r) for r in rows]
 
 
+@por_usuario
 def clonar_presupuesto(
     user_id: int, presupuesto_origen_id: int, nuevo_nombre: str
 ) -> tuple[bool, str]:
@@ -381,32 +384,21 @@ def clonar_presupuesto(
         return False, f"Ya tienes un presupuesto llamado «{n}»."
 
     with get_connection() as conn:
-        movs = conn.execute(
-            """SELECT tipo, monto, categoria, COALESCE(es_anual, 0) AS es_anual
-               FROM presupuesto_movimientos
-               WHERE user_id = ? AND presupuesto_id = ?""",
-            (user_id, presupuesto_origen_id),
-        ).fetchall()
         conn.execute(
             "INSERT INTO presupuestos (user_id, nombre) VALUES (?, ?)",
             (user_id, n),
         )
         nuevo_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-        for r in movs:
-            conn.execute(
-                """INSERT INTO presupuesto_movimientos
-                   (user_id, presupuesto_id, tipo, monto, categoria, es_anual)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                (
-                    user_id,
-                    nuevo_id,
-                    r["tipo"],
-                    r["monto"],
-                    r["categoria"],
-                    int(r["es_anual"]),
-                ),
-            )
-        n_copias = len(movs)
+        # Copia en una sola sentencia: el número de consultas no depende de las líneas
+        n_copias = conn.execute(
+            """INSERT INTO presupuesto_movimientos
+               (user_id, presupuesto_id, tipo, monto, categoria, es_anual)
+               SELECT user_id, ?, tipo, monto, categoria, COALESCE(es_anual, 0)
+               FROM presupuesto_movimientos
+               WHERE user_id = ? AND presupuesto_id = ?
+               ORDER BY id""",
+            (nuevo_id, user_id, presupuesto_origen_id),
+        ).rowcount
 
     return True, (
         f"Presupuesto «{orig['nombre']}» clonado como «{n}» (#{nuevo_id}): "
@@ -414,6 +406,78 @@ def clonar_presupuesto(
     )
 
 
+# Mayor subida de /escalar_presupuesto, en %
+ESCALA_MAXIMA = 1000
+
+
+@por_usuario
+def escalar_presupuesto(
+    user_id: int, presupuesto_id: int, porcentaje: float
+) -> tuple[bool, str]:
+    """Sube (porcentaje > 0) o baja (< 0) todas las líneas de un presupuesto.
+
+    Una sola sentencia UPDATE. El cálculo se hace en enteros sobre centavos
+    (redondeo a la mitad hacia arriba, con el porcentaje a dos decimales) y
+    ninguna línea baja de 0.01.
+    """
+    if not math.isfinite(porcentaje):
+        return False, "Porcentaje inválido."
+    if porcentaje > ESCALA_MAXIMA:
+        # monto * factor debe seguir cabiendo en un INTEGER de SQLite
+        return False, f"El porcentaje no puede ser mayor que {ESCALA_MAXIMA:g}."
+    centesimas = int(Decimal(str(porcentaje)).quantize(Decimal("0.01"), ROUND_HALF_UP) * 100)
+    factor = 10000 + centesimas
+    if centesimas == 0:
+        return False, "El porcentaje no puede ser 0."
+    if factor <= 0:
+        return False, "El porcentaje debe ser mayor que -100."
+    pres = obtener_presupuesto_por_id(user_id, presupuesto_id)
+    if not pres:
+        return False, "El presupuesto no existe o no te pertenece."
+    with get_connection() as conn:
+        n = conn.execute(
+            """UPDATE presupuesto_movimientos
+               SET monto = MAX(1, (monto * ? + 5000) / 10000)
+               WHERE user_id = ? AND presupuesto_id = ?""",
+            (factor, user_id, presupuesto_id),
+        ).rowcount
+    signo = "+" if centesimas > 0 else ""
+    return True, (
+        f"Presupuesto «{pres['nombre']}»: {n} línea(s) ajustada(s) un {signo}{centesimas / 100:g}%."
+    )
+
+
+@por_usuario
+def fusionar_presupuestos(
+    user_id: int, presupuesto_origen_id: int, presupuesto_destino_id: int
+) -> tuple[bool, str]:
+    """Pasa todas las líneas del presupuesto origen al destino y borra el origen.
+
+    Las líneas conservan su #id; se mueven con un solo UPDATE.
+    """
+    if presupuesto_origen_id == presupuesto_destino_id:
+        return False, "El origen y el destino deben ser presupuestos distintos."
+    origen = obtener_presupuesto_por_id(user_id, presupuesto_origen_id)
+    destino = obtener_presupuesto_por_id(user_id, presupuesto_destino_id)
+    if not origen or not destino:
+        return False, "Alguno de los presupuestos no existe o no te pertenece."
+    with get_connection() as conn:
+        n = conn.execute(
+            """UPDATE presupuesto_movimientos SET presupuesto_id = ?
+               WHERE user_id = ? AND presupuesto_id = ?""",
+            (presupuesto_destino_id, user_id, presupuesto_origen_id),
+        ).rowcount
+        conn.execute(
+            "DELETE FROM presupuestos WHERE id = ? AND user_id = ?",
+            (presupuesto_origen_id, user_id),
+        )
+    return True, (
+        f"Presupuesto «{origen['nombre']}» fusionado en «{destino['nombre']}»: "
+        f"{n} línea(s) movida(s). «{origen['nombre']}» ya no existe."
+    )
+
+
+@por_usuario
 def crear_cuenta(user_id: int, nombre: str, tipo: str) -> tuple[bool, str]:
     """Crea una nueva cuenta para el usuario. Retorna (éxito, mensaje)."""
     tipo = tipo.lower().strip()
@@ -425,305 +489,995 @@ def crear_cuenta(user_id: int, nombre: str, tipo: str) -> tuple[bool, str]:
         return False, "El nombre de la cuenta no puede estar vacío."
 
     try:
-        with get_connection() as conn:
+        with _escritura_usuario(user_id, "cuentas", "nombres_cuentas") as conn:
             conn.execute(
                 "INSERT INTO cuentas (user_id, nombre, tipo) VALUES (?, ?, ?)",
                 (user_id, nombre, tipo)
             )
+            _asegurar_preferencias(conn, user_id)
         return True, f"Cuenta '{nombre}' ({tipo}) creada correctamente."
     except sqlite3.IntegrityError:
         return False, f"Ya existe una cuenta con el nombre '{nombre}'."
 
 
-def obtener_ids_usuarios_con_cuentas() -> list[int]:
-    """Obtiene los user_id de todos los usuarios que tienen al menos una cuenta."""
+_FORMATO_UTC = "%Y-%m-%d %H:%M:%S"
+
+
+def _preferencias_por_defecto() -> tuple[str, str]:
+    """(zona, hora) del resumen diario para usuarios que no los han elegido."""
+    zona = os.getenv("RESUMEN_DIARIO_TZ", "Europe/Madrid")
+    hora = _parse_hora(os.getenv("RESUMEN_DIARIO_HORA", "10:00"))
+    if _zona(zona) is None:
+        zona = "Europe/Madrid"
+    return zona, hora or "10:00"
+
+
+@functools.lru_cache(maxsize=1)
+def _zonas_por_minusculas() -> dict[str, str]:
+    return {z.lower(): z for z in available_timezones()}
+
+
+def _zona(nombre: str) -> ZoneInfo | None:
+    """ZoneInfo de `nombre` sin distinguir mayúsculas ('america/mexico_city'); None si no existe."""
+    clave = _zonas_por_minusculas().get(nombre.strip().lower())
+    if clave is None:
+        return None
+    try:
+        return ZoneInfo(clave)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def _parse_hora(texto: str) -> str | None:
+    """'9', '09:30' o '21.15' → 'HH:MM'; None si no es una hora válida."""
+    partes = texto.strip().replace(".", ":").split(":")
+    try:
+        h, m = int(partes[0]), int(partes[1]) if len(partes) > 1 else 0
+    except ValueError:
+        return None
+    if len(partes) > 2 or not (0 <= h <= 23 and 0 <= m <= 59):
+        return None
+    return f"{h:02d}:{m:02d}"
+
+
+def _proximo_envio(zona: str, hora: str, despues: datetime) -> str:
+    """Primer instante (UTC) posterior a `despues` en que son las `hora` en `zona`."""
+    tz = ZoneInfo(zona)
+    h, m = (int(x) for x in hora.split(":"))
+    hoy = despues.astimezone(tz).date()
+    for dia in (hoy, hoy + timedelta(days=1)):
+        candidato = datetime.combine(dia, time(h, m), tzinfo=tz).astimezone(timezone.utc)
+        if candidato > despues:
+            return candidato.strftime(_FORMATO_UTC)
+    # Solo con un salto de horario que se coma esa hora en los dos días
+    return (despues + timedelta(days=1)).strftime(_FORMATO_UTC)
+
+
+def _asegurar_preferencias(conn: sqlite3.Connection, user_id: int) -> None:
+    """Crea las preferencias por defecto del usuario si aún no tiene."""
+    zona, hora = _preferencias_por_defecto()
+    conn.execute(
+        """INSERT OR IGNORE INTO preferencias_usuario (user_id, zona_horaria, hora_envio, proximo_envio)
+           VALUES (?, ?, ?, ?)""",
+        (user_id, zona, hora, _proximo_envio(zona, hora, datetime.now(timezone.utc))),
+    )
+
+
+@en_todos(sumar)
+def sincronizar_preferencias() -> int:
+    """Da preferencias por defecto a los usuarios con cuentas que no tienen. Retorna cuántos.
+
+    Cubre las bases anteriores a la migración 6; se llama al arrancar el bot.
+    """
+    zona, hora = _preferencias_por_defecto()
+    with get_connection() as conn:
+        cur = conn.execute(
+            """INSERT OR IGNORE INTO preferencias_usuario (user_id, zona_horaria, hora_envio, proximo_envio)
+               SELECT DISTINCT user_id, ?, ?, ? FROM cuentas""",
+            (zona, hora, _proximo_envio(zona, hora, datetime.now(timezone.utc))),
+        )
+        return cur.rowcount
+
+
+@por_usuario
+def obtener_preferencias_resumen(user_id: int) -> dict:
+    """Zona, hora y estado del resumen diario del usuario (los valores por defecto si no eligió)."""
+    with get_read_connection() as conn:
+        row = conn.execute(
+            """SELECT zona_horaria, hora_envio, resumen_activo, proximo_envio
+               FROM preferencias_usuario WHERE user_id = ?""",
+            (user_id,),
+        ).fetchone()
+    if row is None:
+        zona, hora = _preferencias_por_defecto()
+        return {"zona_horaria": zona, "hora_envio": hora, "resumen_activo": True, "proximo_envio": None}
+    d = dict(row)
+    d["resumen_activo"] = bool(d["resumen_activo"])
+    return d
+
+
+@por_usuario
+def guardar_preferencias_resumen(
+    user_id: int,
+    zona_horaria: str | None = None,
+    hora_envio: str | None = None,
+    activo: bool | None = None,
+) -> tuple[bool, str]:
+    """Cambia zona, hora o activación del resumen diario; None deja el valor actual."""
+    if zona_horaria is not None:
+        tz = _zona(zona_horaria)
+        if tz is None:
+            return False, f"Zona horaria desconocida: '{zona_horaria}'. Usa el formato Región/Ciudad (ej: America/Mexico_City)."
+        zona_horaria = tz.key
+    if hora_envio is not None:
+        hora_envio = _parse_hora(hora_envio)
+        if hora_envio is None:
+            return False, "Hora inválida. Usa HH:MM en formato 24 h (ej: 08:30)."
+
+    with get_connection() as conn:
+        _asegurar_preferencias(conn, user_id)
+        actual = conn.execute(
+            "SELECT zona_horaria, hora_envio, resumen_activo FROM preferencias_usuario WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+        zona = zona_horaria or actual["zona_horaria"]
+        hora = hora_envio or actual["hora_envio"]
+        activo = bool(actual["resumen_activo"]) if activo is None else activo
+        proximo = _proximo_envio(zona, hora, datetime.now(timezone.utc)) if activo else None
+        conn.execute(
+            """UPDATE preferencias_usuario
+               SET zona_horaria = ?, hora_envio = ?, resumen_activo = ?, proximo_envio = ?
+               WHERE user_id = ?""",
+            (zona, hora, int(activo), proximo, user_id),
+        )
+    if not activo:
+        return True, "Resumen diario desactivado."
+    return True, f"Resumen diario a las {hora} ({zona})."
+
+
+@en_todos(concatenar)
+def reclamar_resumenes_pendientes(
+    ahora: datetime | None = None,
+    tolerancia: timedelta = timedelta(hours=1),
+    shard: tuple[int, int] | None = None,
+) -> list[int]:
+    """Usuarios a los que toca enviar el resumen; su siguiente envío queda ya programado.
+
+    Busca proximo_envio <= ahora en el índice parcial, así cada minuto solo lee
+    las filas que vencen. Reprogramar en la misma transacción evita enviar dos
+    veces si el envío falla a mitad o un tick se solapa con otro. Los envíos
+    vencidos hace más de `tolerancia` (el bot estuvo parado) se reprograman sin
+    enviarse.
+
+    Con `shard=(indice, total)` solo reclama los usuarios con
+    user_id % total == indice (ver src/shards.py).
+    """
+    ahora = ahora or datetime.now(timezone.utc)
+    sql = """SELECT user_id, zona_horaria, hora_envio, proximo_envio
+             FROM preferencias_usuario WHERE proximo_envio <= ?"""
+    params: tuple = (ahora.strftime(_FORMATO_UTC),)
+    if shard is not None:
+        indice, total = shard
+        sql += " AND user_id % ? = ?"
+        params += (total, indice)
+    with get_connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+        conn.executemany(
+            "UPDATE preferencias_usuario SET proximo_envio = ? WHERE user_id = ?",
+            [(_proximo_envio(r["zona_horaria"], r["hora_envio"], ahora), r["user_id"]) for r in rows],
+        )
+    vigente = (ahora - tolerancia).strftime(_FORMATO_UTC)
+    return [r["user_id"] for r in rows if r["proximo_envio"] >= vigente]
+
+
+def registrar_fallos_entrega(fallos: Iterable[tuple[int, str, str, bool]]) -> int:
+    """Guarda los fallos de un envío masivo: (user_id, tipo, detalle, permanente).
+
+    Suma uno al contador del usuario para ese tipo. Los fallos permanentes
+    (bloqueó el bot, el chat no existe) pausan al usuario: deja de recibir el
+    resumen diario y no aparece en obtener_ids_usuarios_con_cuentas hasta que
+    vuelva a escribir al bot (ver reanudar_usuario). Retorna cuántos se pausaron.
+    """
+    fallos = list(fallos)
+    if not fallos:
+        return 0
+    if total_shards() > 1:
+        pausados = 0
+        for indice, grupo in repartir(fallos, lambda f: f[0]).items():
+            with en_shard(indice):
+                pausados += _registrar_fallos_entrega(grupo)
+        return pausados
+    return _registrar_fallos_entrega(fallos)
+
+
+def _registrar_fallos_entrega(fallos: list[tuple[int, str, str, bool]]) -> int:
+    ahora = datetime.now(timezone.utc).strftime(_FORMATO_UTC)
+    permanentes = {user_id: tipo for user_id, tipo, _, permanente in fallos if permanente}
     with get_connection() as conn:
+        conn.executemany(
+            """INSERT INTO fallos_entrega (user_id, tipo, veces, ultimo_detalle, ultimo_en)
+               VALUES (?, ?, 1, ?, ?)
+               ON CONFLICT (user_id, tipo) DO UPDATE SET
+                   veces = veces + 1,
+                   ultimo_detalle = excluded.ultimo_detalle,
+                   ultimo_en = excluded.ultimo_en""",
+            [(user_id, tipo, detalle[:500], ahora) for user_id, tipo, detalle, _ in fallos],
+        )
+        pausados = 0
+        for user_id, tipo in permanentes.items():
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO usuarios_pausados (user_id, motivo, pausado_en) VALUES (?, ?, ?)",
+                (user_id, tipo, ahora),
+            )
+            pausados += cur.rowcount
+        # Sin proximo_envio el usuario sale del índice que revisa el tick del resumen
+        conn.executemany(
+            "UPDATE preferencias_usuario SET proximo_envio = NULL WHERE user_id = ?",
+            [(user_id,) for user_id in permanentes],
+        )
+    with _pausados_lock:
+        if _pausados is not None:
+            _pausados.update(permanentes)
+    return pausados
+
+
+_pausados: set[int] | None = None
+_pausados_lock = threading.Lock()
+
+
+def usuario_pausado(user_id: int) -> bool:
+    """True si el usuario está en pausa por un fallo de entrega.
+
+    Se consulta en cada update: responde desde un conjunto en memoria que se
+    carga de la base la primera vez y se mantiene al pausar y reanudar.
+    """
+    global _pausados
+    if _pausados is None:
+        ids = _cargar_pausados()
+        with _pausados_lock:
+            if _pausados is None:
+                _pausados = ids
+    return user_id in _pausados
+
+
+def pausados_cargados() -> bool:
+    """True si usuario_pausado ya responde desde memoria, sin leer la base."""
+    return _pausados is not None
+
+
+@en_todos(unir_conjuntos)
+def _cargar_pausados() -> set[int]:
+    with get_read_connection() as conn:
+        return {row[0] for row in conn.execute("SELECT user_id FROM usuarios_pausados")}
+
+
+@por_usuario
+def reanudar_usuario(user_id: int) -> bool:
+    """Quita la pausa del usuario y reprograma su resumen diario. False si no estaba en pausa."""
+    with get_connection() as conn:
+        cur = conn.execute("DELETE FROM usuarios_pausados WHERE user_id = ?", (user_id,))
+        if cur.rowcount == 0:
+            reanudado = False
+        else:
+            reanudado = True
+            row = conn.execute(
+                """SELECT zona_horaria, hora_envio FROM preferencias_usuario
+                   WHERE user_id = ? AND resumen_activo = 1""",
+                (user_id,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE preferencias_usuario SET proximo_envio = ? WHERE user_id = ?",
+                    (_proximo_envio(row[0], row[1], datetime.now(timezone.utc)), user_id),
+                )
+    with _pausados_lock:
+        if _pausados is not None:
+            _pausados.discard(user_id)
+    return reanudado
+
+
+@por_usuario
+def obtener_fallos_entrega(user_id: int) -> list[dict]:
+    """Fallos de entrega registrados del usuario, por tipo."""
+    with get_read_connection() as conn:
         rows = conn.execute(
-            "SELECT DISTINCT user_id FROM cuentas ORDER BY user_id"
+            """SELECT tipo, veces, ultimo_detalle, ultimo_en FROM fallos_entrega
+               WHERE user_id = ? ORDER BY ultimo_en DESC""",
+            (user_id,),
         ).fetchall()
-    return [row[0] for row in rows]
+    return [dict(r) for r in rows]
 
 
-def listar_cuentas(user_id: int) -> list[dict]:
-    """Lista todas las cuentas del usuario."""
+@en_todos(unir_dicts)
+def cargar_datos_usuarios() -> dict[int, str]:
+    """user_data persistido de cada usuario, como JSON (ver src.persistencia)."""
+    with get_read_connection() as conn:
+        rows = conn.execute("SELECT user_id, datos FROM persistencia_usuarios").fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+@en_todos(unir_dicts)
+def cargar_conversaciones(nombre: str) -> dict[str, str]:
+    """Estados persistidos del ConversationHandler `nombre`: {clave JSON: estado JSON}."""
+    with get_read_connection() as conn:
+        rows = conn.execute(
+            "SELECT clave, estado FROM persistencia_conversaciones WHERE nombre = ?",
+            (nombre,),
+        ).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def guardar_persistencia(
+    datos_usuarios: dict[int, str | None],
+    conversaciones: dict[tuple[str, str], str | None],
+) -> None:
+    """Escribe en una sola transacción los cambios acumulados; None borra la entrada.
+
+    Con DB_SHARDS, una transacción por archivo con los usuarios de ese archivo
+    (la clave de una conversación es [chat_id, user_id]).
+    """
+    if not datos_usuarios and not conversaciones:
+        return
+    if total_shards() > 1:
+        usuarios = repartir(datos_usuarios.items(), lambda item: item[0])
+        convs = repartir(conversaciones.items(), lambda item: json.loads(item[0][1])[-1])
+        for indice in usuarios.keys() | convs.keys():
+            with en_shard(indice):
+                _guardar_persistencia(dict(usuarios.get(indice, [])), dict(convs.get(indice, [])))
+        return
+    _guardar_persistencia(datos_usuarios, conversaciones)
+
+
+def _guardar_persistencia(
+    datos_usuarios: dict[int, str | None],
+    conversaciones: dict[tuple[str, str], str | None],
+) -> None:
     with get_connection() as conn:
+        conn.executemany(
+            """INSERT INTO persistencia_usuarios (user_id, datos) VALUES (?, ?)
+               ON CONFLICT (user_id) DO UPDATE SET datos = excluded.datos""",
+            [(uid, datos) for uid, datos in datos_usuarios.items() if datos is not None],
+        )
+        conn.executemany(
+            "DELETE FROM persistencia_usuarios WHERE user_id = ?",
+            [(uid,) for uid, datos in datos_usuarios.items() if datos is None],
+        )
+        conn.executemany(
+            """INSERT INTO persistencia_conversaciones (nombre, clave, estado) VALUES (?, ?, ?)
+               ON CONFLICT (nombre, clave) DO UPDATE SET estado = excluded.estado""",
+            [(n, c, e) for (n, c), e in conversaciones.items() if e is not None],
+        )
+        conn.executemany(
+            "DELETE FROM persistencia_conversaciones WHERE nombre = ? AND clave = ?",
+            [(n, c) for (n, c), e in conversaciones.items() if e is None],
+        )
+
+
+@en_todos(unir_ordenados)
+def obtener_ids_usuarios_con_cuentas() -> list[int]:
+    """Obtiene los user_id de todos los usuarios que tienen al menos una cuenta (sin los pausados)."""
+    with get_read_connection() as conn:
+        rows = conn.execute(
+            """SELECT DISTINCT user_id FROM cuentas AS c
+               WHERE NOT EXISTS (SELECT 1 FROM usuarios_pausados AS p WHERE p.user_id = c.user_id)
+               ORDER BY user_id"""
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _cargar_cuentas(user_id: int) -> list[dict]:
+    with get_read_connection() as conn:
         rows = conn.execute(
             "SELECT id, nombre, tipo, saldo FROM cuentas WHERE user_id = ? ORDER BY nombre COLLATE NOCASE",
             (user_id,)
         ).fetchall()
+    return [_con_importes(row, "saldo") for row in rows]
+
+
+def _cuentas_en_cache(user_id: int) -> list[dict]:
+    """Cuentas del usuario desde la caché (no modificar: usar copias)."""
+    return _obtener_cache().obtener(user_id, "cuentas", lambda: _cargar_cuentas(user_id))
+
+
+def _cargar_nombres_cuentas(user_id: int) -> list[dict]:
+    with get_read_connection() as conn:
+        rows = conn.execute(
+            "SELECT id, nombre, tipo FROM cuentas WHERE user_id = ? ORDER BY nombre COLLATE NOCASE",
+            (user_id,)
+        ).fetchall()
     return [dict(row) for row in rows]
 
 
+@por_usuario
+def derivado_de_cuentas(user_id: int, clave, construir):
+    """`construir(cuentas)` memorizado por `clave`, con las cuentas sin saldo.
+
+    Va en su propio grupo de la caché ("nombres_cuentas"), que solo invalidan
+    las escrituras que cambian qué cuentas hay o cómo se llaman (crear_cuenta):
+    un gasto o una transferencia cambian saldos pero no los teclados de cuentas.
+    """
+    return _obtener_cache().derivado(
+        user_id, "nombres_cuentas", clave, lambda: _cargar_nombres_cuentas(user_id), construir
+    )
+
+
+@por_usuario
+def listar_cuentas(user_id: int) -> list[dict]:
+    """Lista todas las cuentas del usuario."""
+    return [dict(c) for c in _cuentas_en_cache(user_id)]
+
+
+def _cuenta_por_nombre(conn: sqlite3.Connection, user_id: int, nombre: str) -> dict | None:
+    """Cuenta por nombre con el saldo en centavos (uso interno)."""
+    row = conn.execute(
+        "SELECT id, nombre, tipo, saldo FROM cuentas WHERE user_id = ? AND LOWER(nombre) = LOWER(?)",
+        (user_id, nombre.strip().lower())
+    ).fetchone()
+    return dict(row) if row else None
+
+
+@por_usuario
 def obtener_cuenta_por_nombre(user_id: int, nombre: str) -> dict | None:
     """Obtiene una cuenta por nombre (case-insensitive)."""
     nombre = nombre.strip().lower()
-    with get_connection() as conn:
-        row = conn.execute(
-            "SELECT id, nombre, tipo, saldo FROM cuentas WHERE user_id = ? AND LOWER(nombre) = LOWER(?)",
-            (user_id, nombre)
-        ).fetchone()
-    return dict(row) if row else None
+    for c in _cuentas_en_cache(user_id):
+        if c["nombre"].lower() == nombre:
+            return dict(c)
+    return None
 
 
+@por_usuario
 def obtener_cuenta_por_id(user_id: int, cuenta_id: int) -> dict | None:
     """Obtiene una cuenta por id si pertenece al usuario."""
-    with get_connection() as conn:
-        row = conn.execute(
-            "SELECT id, nombre, tipo, saldo FROM cuentas WHERE user_id = ? AND id = ?",
-            (user_id, cuenta_id),
-        ).fetchone()
-    return dict(row) if row else None
+    for c in _cuentas_en_cache(user_id):
+        if c["id"] == cuenta_id:
+            return dict(c)
+    return None
 
 
-def registrar_gasto(user_id: int, nombre_cuenta: str, monto: float, categoria: str) -> tuple[bool, str]:
-    """Registra un gasto en la cuenta especificada."""
-    cuenta = obtener_cuenta_por_nombre(user_id, nombre_cuenta)
-    if not cuenta:
-        return False, f"No se encontró la cuenta '{nombre_cuenta}'."
+@por_usuario
+def registrar_movimiento(
+    user_id: int,
+    tipo: str,
+    monto: float,
+    *,
+    cuenta_id: int | None = None,
+    nombre_cuenta: str | None = None,
+    categoria_id: int | None = None,
+    categoria: str | None = None,
+) -> tuple[bool, str]:
+    """Registra un gasto o ingreso resolviendo cuenta y categoría en la misma escritura.
 
-    if monto <= 0:
+    La cuenta se indica por id o por nombre, y la categoría igual. Un único
+    INSERT ... SELECT comprueba que ambas sean del usuario y que la categoría
+    valga para `tipo`; si no inserta nada, se averigua el motivo solo entonces.
+    Todo (registro, resumen mensual y saldo) va en una transacción.
+    """
+    tipo = tipo.lower().strip()
+    if tipo not in ("gasto", "ingreso"):
+        return False, "Tipo interno inválido."
+    centavos = _a_centavos(monto)
+    if centavos <= 0:
         return False, "El monto debe ser mayor a 0."
-
-    cat = _normalizar_nombre_categoria(categoria)
-    if not cat:
+    if cuenta_id is None and not (nombre_cuenta or "").strip():
+        return False, "Debes indicar la cuenta."
+    cat = _normalizar_nombre_categoria(categoria) if categoria_id is None else None
+    if categoria_id is None and not cat:
         return False, "Debes elegir una categoría de tu lista (/mis_categorias)."
-    if not categoria_permitida_para_movimiento(user_id, cat, "gasto"):
-        return False, (
-            "Esa categoría no es válida para gastos. Revisa /mis_categorias o usa /agregar_categoria."
-        )
+    nombre = (nombre_cuenta or "").strip().lower()
+
+    with _escritura_usuario(user_id, "cuentas") as conn:
+        fila = conn.execute(
+            """INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, categoria)
+               SELECT c.user_id, c.id, :tipo, :monto, cu.nombre
+               FROM cuentas c
+               JOIN categorias_usuario cu ON cu.user_id = c.user_id
+               WHERE c.user_id = :user_id
+                 AND (c.id = :cuenta_id OR (:cuenta_id IS NULL AND LOWER(c.nombre) = :nombre))
+                 AND (cu.id = :categoria_id OR (:categoria_id IS NULL AND cu.nombre = :categoria))
+                 AND cu.ambito IN (:tipo, 'ambos')
+               RETURNING id, cuenta_id, categoria""",
+            {
+                "user_id": user_id,
+                "tipo": tipo,
+                "monto": centavos,
+                "cuenta_id": cuenta_id,
+                "nombre": nombre,
+                "categoria_id": categoria_id,
+                "categoria": cat,
+            },
+        ).fetchone()
+        if fila is None:
+            cuenta = conn.execute(
+                """SELECT 1 FROM cuentas WHERE user_id = ?
+                   AND (id = ? OR (? IS NULL AND LOWER(nombre) = ?))""",
+                (user_id, cuenta_id, cuenta_id, nombre),
+            ).fetchone()
+            if not cuenta:
+                if cuenta_id is not None:
+                    return False, "Esa cuenta ya no existe."
+                return False, f"No se encontró la cuenta '{nombre_cuenta}'."
+            return False, (
+                f"Esa categoría no es válida para {tipo}s. Revisa /mis_categorias o usa /agregar_categoria."
+            )
+        _resumen_mensual_aplicar(conn, fila["id"], +1)
+        cuenta_nombre = conn.execute(
+            f"UPDATE cuentas SET saldo = saldo {'-' if tipo == 'gasto' else '+'} ? WHERE id = ? RETURNING nombre",
+            (centavos, fila["cuenta_id"]),
+        ).fetchone()[0]
 
-    with get_connection() as conn:
-        if cuenta["tipo"] == "debito":
-            nuevo_saldo = cuenta["saldo"] - monto
-        else:
-            nuevo_saldo = cuenta["saldo"] - monto
+    etiqueta = "Gasto" if tipo == "gasto" else "Ingreso"
+    return True, (
+        f"{etiqueta} de ${_de_centavos(centavos):,.2f} registrado en '{cuenta_nombre}' [{fila['categoria']}]."
+    )
 
-        conn.execute(
-            "INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, categoria) VALUES (?, ?, 'gasto', ?, ?)",
-            (user_id, cuenta["id"], monto, cat)
-        )
-        conn.execute("UPDATE cuentas SET saldo = ? WHERE id = ?", (nuevo_saldo, cuenta["id"]))
 
-    return True, f"Gasto de ${monto:,.2f} registrado en '{cuenta['nombre']}' [{cat}]."
+@por_usuario
+def registrar_gasto(user_id: int, nombre_cuenta: str, monto: float, categoria: str) -> tuple[bool, str]:
+    """Registra un gasto en la cuenta especificada (ver registrar_movimiento)."""
+    return registrar_movimiento(user_id, "gasto", monto, nombre_cuenta=nombre_cuenta, categoria=categoria)
 
 
+@por_usuario
 def registrar_ingreso(user_id: int, nombre_cuenta: str, monto: float, categoria: str) -> tuple[bool, str]:
-    """Registra un ingreso en la cuenta especificada."""
-    cuenta = obtener_cuenta_por_nombre(user_id, nombre_cuenta)
-    if not cuenta:
-        return False, f"No se encontró la cuenta '{nombre_cuenta}'."
-
-    if monto <= 0:
-        return False, "El monto debe ser mayor a 0."
-
-    cat = _normalizar_nombre_categoria(categoria)
-    if not cat:
-        return False, "Debes elegir una categoría de tu lista (/mis_categorias)."
-    if not categoria_permitida_para_movimiento(user_id, cat, "ingreso"):
-        return False, (
-            "Esa categoría no es válida para ingresos. Revisa /mis_categorias o usa /agregar_categoria."
-        )
-    nuevo_saldo = cuenta["saldo"] + monto
-
-    with get_connection() as conn:
-        conn.execute(
-            "INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, categoria) VALUES (?, ?, 'ingreso', ?, ?)",
-            (user_id, cuenta["id"], monto, cat)
-        )
-        conn.execute("UPDATE cuentas SET saldo = ? WHERE id = ?", (nuevo_saldo, cuenta["id"]))
-
-    return True, f"Ingreso de ${monto:,.2f} registrado en '{cuenta['nombre']}' [{cat}]."
+    """Registra un ingreso en la cuenta especificada (ver registrar_movimiento)."""
+    return registrar_movimiento(user_id, "ingreso", monto, nombre_cuenta=nombre_cuenta, categoria=categoria)
 
 
+@por_usuario
 def registrar_ajuste_saldo(user_id: int, nombre_cuenta: str, saldo_objetivo: float) -> tuple[bool, str]:
     """Deja el saldo de la cuenta igual a saldo_objetivo mediante un ingreso o gasto con categoría 'ajuste'."""
-    cuenta = obtener_cuenta_por_nombre(user_id, nombre_cuenta)
-    if not cuenta:
-        return False, f"No se encontró la cuenta '{nombre_cuenta}'."
+    cat = "ajuste"
+    objetivo = _a_centavos(saldo_objetivo)
+    with _escritura_usuario(user_id, "cuentas") as conn:
+        cuenta = _cuenta_por_nombre(conn, user_id, nombre_cuenta)
+        if not cuenta:
+            return False, f"No se encontró la cuenta '{nombre_cuenta}'."
 
-    delta = saldo_objetivo - cuenta["saldo"]
-    if abs(delta) < 1e-9:
-        return True, f"El saldo de '{cuenta['nombre']}' ya es ${saldo_objetivo:,.2f}. No se registró ningún movimiento."
+        delta = objetivo - cuenta["saldo"]
+        if delta == 0:
+            return True, f"El saldo de '{cuenta['nombre']}' ya es ${_de_centavos(objetivo):,.2f}. No se registró ningún movimiento."
 
-    cat = "ajuste"
-    with get_connection() as conn:
-        if delta > 0:
-            nuevo_saldo = cuenta["saldo"] + delta
-            conn.execute(
-                "INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, categoria) VALUES (?, ?, 'ingreso', ?, ?)",
-                (user_id, cuenta["id"], delta, cat),
-            )
-        else:
-            monto_gasto = -delta
-            nuevo_saldo = cuenta["saldo"] - monto_gasto
-            conn.execute(
-                "INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, categoria) VALUES (?, ?, 'gasto', ?, ?)",
-                (user_id, cuenta["id"], monto_gasto, cat),
-            )
-        conn.execute("UPDATE cuentas SET saldo = ? WHERE id = ?", (nuevo_saldo, cuenta["id"]))
+        tipo = "ingreso" if delta > 0 else "gasto"
+        cur = conn.execute(
+            "INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, categoria) VALUES (?, ?, ?, ?, ?)",
+            (user_id, cuenta["id"], tipo, abs(delta), cat),
+        )
+        _resumen_mensual_aplicar(conn, cur.lastrowid, +1)
+        conn.execute("UPDATE cuentas SET saldo = saldo + ? WHERE id = ?", (delta, cuenta["id"]))
 
     return True, (
-        f"Saldo de '{cuenta['nombre']}' ajustado a ${saldo_objetivo:,.2f} "
-        f"(registro [ajuste]: {'+' if delta > 0 else '-'}${abs(delta):,.2f})."
+        f"Saldo de '{cuenta['nombre']}' ajustado a ${_de_centavos(objetivo):,.2f} "
+        f"(registro [ajuste]: {'+' if delta > 0 else '-'}${_de_centavos(abs(delta)):,.2f})."
     )
 
 
+@por_usuario
 def transferir(user_id: int, cuenta_origen: str, cuenta_destino: str, monto: float) -> tuple[bool, str]:
-    """Transfiere dinero de una cuenta a otra."""
+    """Transfiere dinero de una cuenta a otra (el saldo se valida dentro de la transacción)."""
     if cuenta_origen.lower() == cuenta_destino.lower():
         return False, "La cuenta origen y destino no pueden ser la misma."
 
-    origen = obtener_cuenta_por_nombre(user_id, cuenta_origen)
-    destino = obtener_cuenta_por_nombre(user_id, cuenta_destino)
+    with _escritura_usuario(user_id, "cuentas") as conn:
+        origen = _cuenta_por_nombre(conn, user_id, cuenta_origen)
+        destino = _cuenta_por_nombre(conn, user_id, cuenta_destino)
 
-    if not origen:
-        return False, f"No se encontró la cuenta origen '{cuenta_origen}'."
-    if not destino:
-        return False, f"No se encontró la cuenta destino '{cuenta_destino}'."
+        if not origen:
+            return False, f"No se encontró la cuenta origen '{cuenta_origen}'."
+        if not destino:
+            return False, f"No se encontró la cuenta destino '{cuenta_destino}'."
 
-    if monto <= 0:
-        return False, "El monto debe ser mayor a 0."
+        centavos = _a_centavos(monto)
+        if centavos <= 0:
+            return False, "El monto debe ser mayor a 0."
 
-    if origen["tipo"] == "debito" and origen["saldo"] < monto:
-        return False, f"Saldo insuficiente en '{origen['nombre']}'. Saldo actual: ${origen['saldo']:,.2f}"
-
-    transfer_id = str(uuid.uuid4())
-    with get_connection() as conn:
-        saldo_origen = origen["saldo"] - monto
-        saldo_destino = destino["saldo"] + monto
+        if origen["tipo"] == "debito" and origen["saldo"] < centavos:
+            return False, (
+                f"Saldo insuficiente en '{origen['nombre']}'. "
+                f"Saldo actual: ${_de_centavos(origen['saldo']):,.2f}"
+            )
 
+        transfer_id = str(uuid.uuid4())
         conn.execute(
             """INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, cuenta_relacionada_id, transfer_id)
                VALUES (?, ?, 'transferencia_salida', ?, ?, ?)""",
-            (user_id, origen["id"], monto, destino["id"], transfer_id)
+            (user_id, origen["id"], centavos, destino["id"], transfer_id)
         )
         conn.execute(
             """INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, cuenta_relacionada_id, transfer_id)
                VALUES (?, ?, 'transferencia_entrada', ?, ?, ?)""",
-            (user_id, destino["id"], monto, origen["id"], transfer_id)
+            (user_id, destino["id"], centavos, origen["id"], transfer_id)
         )
-        conn.execute("UPDATE cuentas SET saldo = ? WHERE id = ?", (saldo_origen, origen["id"]))
-        conn.execute("UPDATE cuentas SET saldo = ? WHERE id = ?", (saldo_destino, destino["id"]))
+        conn.execute("UPDATE cuentas SET saldo = saldo - ? WHERE id = ?", (centavos, origen["id"]))
+        conn.execute("UPDATE cuentas SET saldo = saldo + ? WHERE id = ?", (centavos, destino["id"]))
 
-    return True, f"Transferencia de ${monto:,.2f} de '{origen['nombre']}' a '{destino['nombre']}' completada."
+    return True, f"Transferencia de ${_de_centavos(centavos):,.2f} de '{origen['nombre']}' a '{destino['nombre']}' completada."
 
 
+@por_usuario
+def importar_movimientos(
+    user_id: int,
+    cuenta_id: int,
+    movimientos: Iterable[dict],
+    categoria_defecto: str | None = None,
+    lote: int = 1000,
+) -> tuple[bool, str]:
+    """Inserta gastos e ingresos en bloque en una cuenta (para /importar).
+
+    `movimientos` es un iterable de dicts {"fecha", "tipo", "monto", "categoria"}
+    que se consume por lotes: cada lote es un executemany de INSERT, un único
+    UPDATE del saldo y un UPSERT agregado en resumen_mensual, todo dentro de una
+    sola transacción (si algo falla no queda nada a medias). Las categorías se
+    comparan con las del usuario leídas una vez; las que no existen o no valen
+    para el tipo se sustituyen por `categoria_defecto` o 'sin_categoria'.
+
+    El iterable se consume con el lock de escritura del archivo del usuario
+    tomado: si es un lector de archivo (src/importacion.py), la lectura y el
+    parseo también ocurren con el lock. Se acepta a cambio de no tener el
+    archivo entero en memoria; las escrituras de ese archivo esperan lo que
+    dure la importación (unos segundos para los 20 MB que permite Telegram).
+    """
+    defecto = _normalizar_nombre_categoria(categoria_defecto) or None
+    insertados = {"gasto": 0, "ingreso": 0}
+    reasignados = 0
+
+    with _escritura_usuario(user_id, "cuentas") as conn:
+        cuenta = conn.execute(
+            "SELECT id, nombre FROM cuentas WHERE user_id = ? AND id = ?",
+            (user_id, cuenta_id),
+        ).fetchone()
+        if not cuenta:
+            return False, "No se encontró la cuenta o no te pertenece."
+        ambitos = dict(conn.execute(
+            "SELECT nombre, ambito FROM categorias_usuario WHERE user_id = ?", (user_id,)
+        ).fetchall())
+
+        def categoria_para(tipo: str, nombre: str | None) -> str | None:
+            if nombre is not None and ambitos.get(nombre) in (tipo, "ambos"):
+                return nombre
+            if defecto is not None and ambitos.get(defecto) in (tipo, "ambos"):
+                return defecto
+            return None
+
+        iterador = iter(movimientos)
+        while True:
+            leidos = 0
+            filas = []
+            delta = 0
+            resumen: dict[tuple, list[int]] = {}
+            for mov in itertools.islice(iterador, lote):
+                leidos += 1
+                tipo = mov["tipo"]
+                centavos = _a_centavos(mov["monto"])
+                if tipo not in ("gasto", "ingreso") or centavos <= 0:
+                    continue
+                cat = categoria_para(tipo, mov.get("categoria"))
+                if cat is None or cat != mov.get("categoria"):
+                    reasignados += 1
+                cat = cat or "sin_categoria"
+                fecha = mov["fecha"]
+                filas.append((user_id, cuenta_id, tipo, centavos, cat, fecha))
+                delta += centavos if tipo == "ingreso" else -centavos
+                insertados[tipo] += 1
+                acumulado = resumen.setdefault((int(fecha[:4]), int(fecha[5:7]), tipo, cat), [0, 0])
+                acumulado[0] += centavos
+                acumulado[1] += 1
+            if not leidos:
+                break
+            if not filas:
+                # Lote sin filas válidas: puede haber más después
+                continue
+            conn.executemany(
+                """INSERT INTO transacciones (user_id, cuenta_id, tipo, monto, categoria, creada_en)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                filas,
+            )
+            conn.executemany(
+                """INSERT INTO resumen_mensual (user_id, ano, mes, tipo, categoria, total, n)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (user_id, ano, mes, tipo, categoria) DO UPDATE SET
+                       total = total + excluded.total,
+                       n = n + excluded.n""",
+                [(user_id, *clave, total, n) for clave, (total, n) in resumen.items()],
+            )
+            conn.execute("UPDATE cuentas SET saldo = saldo + ? WHERE id = ?", (delta, cuenta_id))
+
+        total = insertados["gasto"] + insertados["ingreso"]
+        if total == 0:
+            return False, "El archivo no tiene movimientos válidos para importar."
+        saldo = conn.execute("SELECT saldo FROM cuentas WHERE id = ?", (cuenta_id,)).fetchone()[0]
+
+    mensaje = (
+        f"{total:,} movimiento(s) importado(s) en '{cuenta['nombre']}' "
+        f"({insertados['gasto']:,} gastos, {insertados['ingreso']:,} ingresos). "
+        f"Saldo actual: ${_de_centavos(saldo):,.2f}."
+    )
+    if reasignados:
+        destino = "[sin_categoria]"
+        if defecto in ambitos:
+            destino = f"[{defecto}] (o [sin_categoria] si no aplica a ese tipo)"
+        mensaje += f"\n{reasignados:,} con categoría vacía o que no está en /mis_categorias → {destino}."
+    return True, mensaje
+
+
+@por_usuario
 def obtener_resumen(user_id: int) -> dict:
     """Obtiene el resumen total de las cuentas del usuario."""
-    cuentas = listar_cuentas(user_id)
-    total_debito = sum(c["saldo"] for c in cuentas if c["tipo"] == "debito")
-    total_credito = sum(c["saldo"] for c in cuentas if c["tipo"] == "credito")
+    with get_read_connection() as conn:
+        rows = conn.execute(
+            "SELECT id, nombre, tipo, saldo FROM cuentas WHERE user_id = ? ORDER BY nombre COLLATE NOCASE",
+            (user_id,)
+        ).fetchall()
+    # Los totales se suman en centavos y se convierten una sola vez
+    total_debito = sum(r["saldo"] for r in rows if r["tipo"] == "debito")
+    total_credito = sum(r["saldo"] for r in rows if r["tipo"] == "credito")
     return {
-        "cuentas": cuentas,
-        "total_debito": total_debito,
-        "total_credito": total_credito,
-        "patrimonio_neto": total_debito + total_credito,
+        "cuentas": [_con_importes(r, "saldo") for r in rows],
+        "total_debito": _de_centavos(total_debito),
+        "total_credito": _de_centavos(total_credito),
+        "patrimonio_neto": _de_centavos(total_debito + total_credito),
     }
 
 
+def iterar_resumenes(
+    lote: int = 500, user_ids: list[int] | None = None
+) -> Iterator[tuple[int, dict]]:
+    """(user_id, resumen) de cada usuario con cuentas, con el formato de obtener_resumen.
+
+    Una sola consulta recorre todas las cuentas en el orden del índice
+    (user_id, nombre COLLATE NOCASE) y se lee por lotes con fetchmany; las
+    cuentas de un usuario llegan seguidas, así se agrupan sin guardar más que
+    las del usuario actual. Omite a los usuarios en pausa. `user_ids` limita el recorrido a esos usuarios
+    (van en un solo parámetro JSON, sin límite de variables de SQLite).
+
+    Con DB_SHARDS recorre los archivos uno tras otro: el orden por user_id es
+    solo dentro de cada archivo.
+    """
+    total = total_shards()
+    if total == 1:
+        yield from _iterar_resumenes(lote, user_ids)
+        return
+    if user_ids is None:
+        partes: dict[int, list[int] | None] = dict.fromkeys(range(total))
+    else:
+        partes = repartir(user_ids, lambda user_id: user_id)
+    for indice in sorted(partes):
+        yield from iterar_en_shard(indice, _iterar_resumenes(lote, partes[indice]))
+
+
+def _iterar_resumenes(lote: int, user_ids: list[int] | None) -> Iterator[tuple[int, dict]]:
+    # Los usuarios en pausa (fallo de entrega permanente) no reciben resúmenes
+    filtro, params = "WHERE user_id NOT IN (SELECT user_id FROM usuarios_pausados) ", ()
+    if user_ids is not None:
+        filtro += "AND user_id IN (SELECT value FROM json_each(?)) "
+        params = (json.dumps(user_ids),)
+
+    def filas() -> Iterator[sqlite3.Row]:
+        with get_read_connection() as conn:
+            cur = conn.execute(
+                "SELECT user_id, id, nombre, tipo, saldo FROM cuentas "
+                f"{filtro}ORDER BY user_id, nombre COLLATE NOCASE",
+                params,
+            )
+            try:
+                while lote_filas := cur.fetchmany(lote):
+                    yield from lote_filas
+            finally:
+                cur.close()
+
+    for user_id, grupo in itertools.groupby(filas(), key=lambda r: r["user_id"]):
+        rows = list(grupo)
+        total_debito = sum(r["saldo"] for r in rows if r["tipo"] == "debito")
+        total_credito = sum(r["saldo"] for r in rows if r["tipo"] == "credito")
+        yield user_id, {
+            "cuentas": [
+                {"id": r["id"], "nombre": r["nombre"], "tipo": r["tipo"], "saldo": _de_centavos(r["saldo"])}
+                for r in rows
+            ],
+            "total_debito": _de_centavos(total_debito),
+            "total_credito": _de_centavos(total_credito),
+            "patrimonio_neto": _de_centavos(total_debito + total_credito),
+        }
+
+
+_RESUMEN_MENSUAL_RECALCULO = """
+    SELECT user_id,
+           CAST(strftime('%Y', creada_en) AS INTEGER) AS ano,
+           CAST(strftime('%m', creada_en) AS INTEGER) AS mes,
+           tipo,
+           COALESCE(categoria, 'sin_categoria') AS categoria,
+           SUM(monto) AS total,
+           COUNT(*) AS n
+    FROM transacciones
+    WHERE tipo IN ('gasto', 'ingreso') {filtro}
+    GROUP BY user_id, ano, mes, tipo, COALESCE(categoria, 'sin_categoria')
+"""
+
+
+def _resumen_mensual_aplicar(conn: sqlite3.Connection, transaccion_id: int, signo: int) -> None:
+    """Suma (+1) o resta (-1) una transacción en resumen_mensual, en la transacción de `conn`.
+
+    Para editar: restar antes de modificar la fila y sumar después. Las
+    transferencias no forman parte del resumen y se ignoran.
+    """
+    cur = conn.execute(
+        """INSERT INTO resumen_mensual (user_id, ano, mes, tipo, categoria, total, n)
+           SELECT user_id,
+                  CAST(strftime('%Y', creada_en) AS INTEGER),
+                  CAST(strftime('%m', creada_en) AS INTEGER),
+                  tipo,
+                  COALESCE(categoria, 'sin_categoria'),
+                  ? * monto,
+                  ?
+           FROM transacciones WHERE id = ? AND tipo IN ('gasto', 'ingreso')
+           ON CONFLICT (user_id, ano, mes, tipo, categoria) DO UPDATE SET
+               total = total + excluded.total,
+               n = n + excluded.n""",
+        (signo, signo, transaccion_id),
+    )
+    if signo < 0 and cur.rowcount:
+        conn.execute(
+            """DELETE FROM resumen_mensual WHERE n <= 0 AND (user_id, ano, mes, tipo, categoria) IN (
+                   SELECT user_id,
+                          CAST(strftime('%Y', creada_en) AS INTEGER),
+                          CAST(strftime('%m', creada_en) AS INTEGER),
+                          tipo,
+                          COALESCE(categoria, 'sin_categoria')
+                   FROM transacciones WHERE id = ?)""",
+            (transaccion_id,),
+        )
+
+
+def _resumen_mensual_recalcular(
+    conn: sqlite3.Connection, user_id: int, categorias: tuple[str, ...]
+) -> None:
+    """Vuelve a calcular desde transacciones las filas de unas categorías del usuario."""
+    marcas = ", ".join("?" for _ in categorias)
+    conn.execute(
+        f"DELETE FROM resumen_mensual WHERE user_id = ? AND categoria IN ({marcas})",
+        (user_id, *categorias),
+    )
+    conn.execute(
+        "INSERT INTO resumen_mensual (user_id, ano, mes, tipo, categoria, total, n) "
+        + _RESUMEN_MENSUAL_RECALCULO.format(
+            filtro=f"AND user_id = ? AND COALESCE(categoria, 'sin_categoria') IN ({marcas})"
+        ),
+        (user_id, *categorias),
+    )
+
+
+@por_usuario(todos=sumar)
+def reconstruir_resumen_mensual(user_id: int | None = None) -> int:
+    """Regenera resumen_mensual desde transacciones (todo o un usuario). Retorna filas escritas."""
+    filtro = "" if user_id is None else "AND user_id = ?"
+    params = () if user_id is None else (user_id,)
+    with get_connection() as conn:
+        conn.execute(f"DELETE FROM resumen_mensual WHERE 1 = 1 {filtro}", params)
+        cur = conn.execute(
+            "INSERT INTO resumen_mensual (user_id, ano, mes, tipo, categoria, total, n) "
+            + _RESUMEN_MENSUAL_RECALCULO.format(filtro=filtro),
+            params,
+        )
+        return cur.rowcount
+
+
+@por_usuario(todos=concatenar)
+def verificar_resumen_mensual(user_id: int | None = None) -> list[dict]:
+    """Compara resumen_mensual con un recálculo completo. Retorna las filas que difieren."""
+    filtro = "" if user_id is None else "AND user_id = ?"
+    params = () if user_id is None else (user_id,)
+    with get_read_connection() as conn:
+        esperado = {
+            tuple(r[:5]): (r["total"], r["n"])
+            for r in conn.execute(_RESUMEN_MENSUAL_RECALCULO.format(filtro=filtro), params)
+        }
+        actual = {
+            tuple(r[:5]): (r["total"], r["n"])
+            for r in conn.execute(
+                f"""SELECT user_id, ano, mes, tipo, categoria, total, n
+                    FROM resumen_mensual WHERE 1 = 1 {filtro}""",
+                params,
+            )
+        }
+    diferencias = []
+    for clave in sorted(esperado.keys() | actual.keys()):
+        total_e, n_e = esperado.get(clave, (0, 0))
+        total_a, n_a = actual.get(clave, (0, 0))
+        if n_e != n_a or total_e != total_a:
+            user, ano, mes, tipo, categoria = clave
+            diferencias.append({
+                "user_id": user,
+                "ano": ano,
+                "mes": mes,
+                "tipo": tipo,
+                "categoria": categoria,
+                "esperado": _de_centavos(total_e),
+                "actual": _de_centavos(total_a),
+                "n_esperado": n_e,
+                "n_actual": n_a,
+            })
+    return diferencias
+
+
+@por_usuario
 def obtener_resumen_por_categoria(
     user_id: int, ano: int | None = None, mes: int | None = None
 ) -> dict:
-    """Resumen de gastos e ingresos agrupados por categoría."""
-    with get_connection() as conn:
-        filtro = "AND user_id = ?"
-        params: list = [user_id]
-        if ano is not None:
-            filtro += " AND CAST(strftime('%Y', creada_en) AS INTEGER) = ?"
-            params.append(ano)
-        if mes is not None:
-            filtro += " AND CAST(strftime('%m', creada_en) AS INTEGER) = ?"
-            params.append(mes)
-
-        gastos = conn.execute(f"""
-            SELECT COALESCE(categoria, 'sin_categoria') AS categoria, SUM(monto) AS total
-            FROM transacciones WHERE tipo = 'gasto' {filtro}
-            GROUP BY COALESCE(categoria, 'sin_categoria')
+    """Resumen de gastos e ingresos agrupados por categoría (lee resumen_mensual)."""
+    filtro = ""
+    params: list = [user_id]
+    if ano is not None:
+        filtro += " AND ano = ?"
+        params.append(ano)
+    if mes is not None:
+        filtro += " AND mes = ?"
+        params.append(mes)
+
+    with get_read_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT tipo, categoria, SUM(total) AS total
+            FROM resumen_mensual
+            WHERE user_id = ?{filtro}
+            GROUP BY tipo, categoria
             ORDER BY categoria COLLATE NOCASE ASC
         """, params).fetchall()
 
-        ingresos = conn.execute(f"""
-            SELECT COALESCE(categoria, 'sin_categoria') AS categoria, SUM(monto) AS total
-            FROM transacciones WHERE tipo = 'ingreso' {filtro}
-            GROUP BY COALESCE(categoria, 'sin_categoria')
-            ORDER BY categoria COLLATE NOCASE ASC
-        """, params).fetchall()
-
-        total_g = conn.execute(f"""
-            SELECT COALESCE(SUM(monto), 0) FROM transacciones WHERE tipo = 'gasto' {filtro}
-        """, params).fetchone()[0]
-
-        total_i = conn.execute(f"""
-            SELECT COALESCE(SUM(monto), 0) FROM transacciones WHERE tipo = 'ingreso' {filtro}
-        """, params).fetchone()[0]
-
+    gastos = [{"categoria": r["categoria"], "total": _de_centavos(r["total"])} for r in rows if r["tipo"] == "gasto"]
+    ingresos = [{"categoria": r["categoria"], "total": _de_centavos(r["total"])} for r in rows if r["tipo"] == "ingreso"]
     return {
-        "gastos": [dict(r) for r in gastos],
-        "ingresos": [dict(r) for r in ingresos],
-        "total_gastos": total_g,
-        "total_ingresos": total_i,
+        "gastos": gastos,
+        "ingresos": ingresos,
+        "total_gastos": _de_centavos(sum(r["total"] for r in rows if r["tipo"] == "gasto")),
+        "total_ingresos": _de_centavos(sum(r["total"] for r in rows if r["tipo"] == "ingreso")),
         "ano": ano,
         "mes": mes,
     }
 
 
+@por_usuario
 def obtener_resumen_por_mes(
     user_id: int, ano: int | None = None, mes: int | None = None, limite: int = 12
 ) -> list[dict]:
-    """Resumen mensual: gastos, ingresos y balance por mes."""
-    with get_connection() as conn:
-        if ano is not None and mes is not None:
-            rows = conn.execute("""
-                SELECT CAST(strftime('%Y', creada_en) AS INTEGER) AS ano,
-                       CAST(strftime('%m', creada_en) AS INTEGER) AS mes,
-                       SUM(CASE WHEN tipo = 'gasto' THEN monto ELSE 0 END) AS gastos,
-                       SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END) AS ingresos
-                FROM transacciones
-                WHERE user_id = ? AND tipo IN ('gasto', 'ingreso')
-                  AND CAST(strftime('%Y', creada_en) AS INTEGER) = ?
-                  AND CAST(strftime('%m', creada_en) AS INTEGER) = ?
-                GROUP BY ano, mes
-            """, (user_id, ano, mes)).fetchall()
-        elif ano is not None:
-            rows = conn.execute("""
-                SELECT CAST(strftime('%Y', creada_en) AS INTEGER) AS ano,
-                       CAST(strftime('%m', creada_en) AS INTEGER) AS mes,
-                       SUM(CASE WHEN tipo = 'gasto' THEN monto ELSE 0 END) AS gastos,
-                       SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END) AS ingresos
-                FROM transacciones
-                WHERE user_id = ? AND tipo IN ('gasto', 'ingreso')
-                  AND CAST(strftime('%Y', creada_en) AS INTEGER) = ?
-                GROUP BY ano, mes
-            """, (user_id, ano)).fetchall()
-        else:
-            rows = conn.execute("""
-                SELECT CAST(strftime('%Y', creada_en) AS INTEGER) AS ano,
-                       CAST(strftime('%m', creada_en) AS INTEGER) AS mes,
-                       SUM(CASE WHEN tipo = 'gasto' THEN monto ELSE 0 END) AS gastos,
-                       SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END) AS ingresos
-                FROM transacciones
-                WHERE user_id = ? AND tipo IN ('gasto', 'ingreso')
-                GROUP BY ano, mes
-                ORDER BY ano DESC, mes DESC LIMIT ?
-            """, (user_id, limite)).fetchall()
+    """Resumen mensual: gastos, ingresos y balance por mes (lee resumen_mensual)."""
+    filtro = ""
+    params: list = [user_id]
+    if ano is not None:
+        filtro += " AND ano = ?"
+        params.append(ano)
+        if mes is not None:
+            filtro += " AND mes = ?"
+            params.append(mes)
+    params.append(limite if ano is None else -1)
+
+    with get_read_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT ano, mes,
+                   SUM(CASE WHEN tipo = 'gasto' THEN total ELSE 0 END) AS gastos,
+                   SUM(CASE WHEN tipo = 'ingreso' THEN total ELSE 0 END) AS ingresos
+            FROM resumen_mensual
+            WHERE user_id = ?{filtro}
+            GROUP BY ano, mes
+            ORDER BY ano DESC, mes DESC LIMIT ?
+        """, params).fetchall()
 
     result = []
     for r in rows:
-        d = dict(r)
-        d["balance"] = (d["ingresos"] or 0) - (d["gastos"] or 0)
+        d = _con_importes(r, "gastos", "ingresos")
+        d["balance"] = _de_centavos((r["ingresos"] or 0) - (r["gastos"] or 0))
         result.append(d)
     # Orden alfabético por período Año-Mes (p. ej. 2024-01 antes que 2025-03)
     result.sort(key=lambda d: (d["ano"], d["mes"]))
     return result
 
 
+@por_usuario
 def listar_registros(user_id: int, nombre_cuenta: str) -> tuple[list[dict] | None, str]:
     """Lista las transacciones de una cuenta. Retorna (lista, mensaje) o (None, mensaje_error)."""
     cuenta = obtener_cuenta_por_nombre(user_id, nombre_cuenta)
     if not cuenta:
         return None, f"No se encontró la cuenta '{nombre_cuenta}'."
 
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         rows = conn.execute("""
             SELECT t.id, t.tipo, t.monto, t.creada_en, t.transfer_id, t.categoria,
                    c_rel.nombre AS cuenta_relacionada
@@ -735,23 +1489,177 @@ def listar_registros(user_id: int, nombre_cuenta: str) -> tuple[list[dict] | Non
 
     registros = []
     for row in rows:
-        r = dict(row)
+        r = _con_importes(row, "monto")
         r["cuenta_relacionada"] = r.get("cuenta_relacionada") or ""
         r["categoria"] = r.get("categoria") or "sin_categoria"
         registros.append(r)
     return registros, cuenta["nombre"]
 
 
-def obtener_transaccion(user_id: int, transaccion_id: int) -> dict | None:
-    """Obtiene una transacción por ID si pertenece al usuario."""
-    with get_connection() as conn:
-        row = conn.execute(
-            "SELECT * FROM transacciones WHERE id = ? AND user_id = ?",
-            (transaccion_id, user_id)
+@por_usuario
+def listar_registros_pagina(
+    user_id: int,
+    cuenta_id: int,
+    limite: int = 25,
+    cursor: tuple[str, int] | None = None,
+    hacia_atras: bool = False,
+    tipo: str | None = None,
+    categoria: str | None = None,
+) -> dict | None:
+    """Una página de movimientos de la cuenta, del más reciente al más antiguo.
+
+    Paginación por clave (creada_en, id): `cursor` es la clave del último
+    registro mostrado (o del primero si `hacia_atras`), así cada página lee solo
+    `limite + 1` filas del índice sin importar cuántas haya antes. `tipo` puede
+    ser 'gasto', 'ingreso' o 'transferencia'; `categoria` filtra gastos e
+    ingresos por nombre. Retorna None si la cuenta no existe o no es del usuario.
+    """
+    filtro = ""
+    params: list = [user_id, cuenta_id]
+    if tipo == "transferencia":
+        filtro += " AND t.tipo IN ('transferencia_salida', 'transferencia_entrada')"
+    elif tipo is not None:
+        filtro += " AND t.tipo = ?"
+        params.append(tipo)
+    if categoria is not None:
+        filtro += " AND t.tipo IN ('gasto', 'ingreso') AND t.categoria = ?"
+        params.append(_normalizar_nombre_categoria(categoria))
+    if cursor is not None:
+        filtro += f" AND (t.creada_en, t.id) {'>' if hacia_atras else '<'} (?, ?)"
+        params.extend(cursor)
+    orden = "ASC" if hacia_atras else "DESC"
+    params.append(limite + 1)
+
+    with get_read_connection() as conn:
+        cuenta = conn.execute(
+            "SELECT id, nombre FROM cuentas WHERE user_id = ? AND id = ?",
+            (user_id, cuenta_id),
         ).fetchone()
+        if not cuenta:
+            return None
+        rows = conn.execute(f"""
+            SELECT t.id, t.tipo, t.monto, t.creada_en, t.transfer_id, t.categoria,
+                   c_rel.nombre AS cuenta_relacionada
+            FROM transacciones t
+            LEFT JOIN cuentas c_rel ON t.cuenta_relacionada_id = c_rel.id
+            WHERE t.user_id = ? AND t.cuenta_id = ?{filtro}
+            ORDER BY t.creada_en {orden}, t.id {orden}
+            LIMIT ?
+        """, params).fetchall()
+
+    hay_mas = len(rows) > limite
+    rows = rows[:limite]
+    if hacia_atras:
+        rows.reverse()
+    registros = []
+    for row in rows:
+        r = _con_importes(row, "monto")
+        r["cuenta_relacionada"] = r.get("cuenta_relacionada") or ""
+        r["categoria"] = r.get("categoria") or "sin_categoria"
+        registros.append(r)
+    return {
+        "cuenta": cuenta["nombre"],
+        "registros": registros,
+        # Venir de una página implica que esa página existe en la otra dirección
+        "hay_mas_recientes": hay_mas if hacia_atras else cursor is not None,
+        "hay_mas_antiguos": cursor is not None if hacia_atras else hay_mas,
+    }
+
+
+@por_usuario
+def iterar_transacciones(
+    user_id: int,
+    cuenta_id: int | None = None,
+    desde: str | None = None,
+    hasta: str | None = None,
+    lote: int = 1000,
+) -> Iterator[list[tuple]]:
+    """Transacciones del usuario en lotes de `lote` filas, para exportar.
+
+    Cada fila es (id, creada_en, cuenta, tipo, monto, categoria, cuenta_relacionada).
+    `desde` y `hasta` son límites [desde, hasta) de creada_en ('AAAA-MM-DD').
+    Se ordena por cuenta y fecha, el orden del índice (user_id, cuenta_id,
+    creada_en): SQLite va leyendo el índice a medida que se piden lotes con
+    fetchmany, sin ordenar ni cargar el resultado completo en memoria.
+    """
+    filtro = ""
+    params: list = [user_id]
+    if cuenta_id is not None:
+        filtro += " AND t.cuenta_id = ?"
+        params.append(cuenta_id)
+    if desde is not None:
+        filtro += " AND t.creada_en >= ?"
+        params.append(desde)
+    if hasta is not None:
+        filtro += " AND t.creada_en < ?"
+        params.append(hasta)
+
+    with get_read_connection() as conn:
+        cur = conn.execute(f"""
+            SELECT t.id, t.creada_en, c.nombre, t.tipo, t.monto,
+                   COALESCE(t.categoria, ''), COALESCE(c_rel.nombre, '')
+            FROM transacciones t
+            JOIN cuentas c ON c.id = t.cuenta_id
+            LEFT JOIN cuentas c_rel ON c_rel.id = t.cuenta_relacionada_id
+            WHERE t.user_id = ?{filtro}
+            ORDER BY t.cuenta_id, t.creada_en, t.id
+        """, params)
+        try:
+            while filas := cur.fetchmany(lote):
+                yield [
+                    (f[0], f[1], f[2], f[3], _de_centavos(f[4]), f[5], f[6])
+                    for f in filas
+                ]
+        finally:
+            cur.close()
+
+
+@por_usuario
+def iterar_presupuesto_movimientos(user_id: int, lote: int = 1000) -> Iterator[list[tuple]]:
+    """Movimientos de todos los presupuestos del usuario en lotes, para exportar.
+
+    Cada fila es (presupuesto, id, tipo, monto, categoria, es_anual, creada_en),
+    en el orden del índice (user_id, presupuesto_id).
+    """
+    with get_read_connection() as conn:
+        cur = conn.execute("""
+            SELECT p.nombre, m.id, m.tipo, m.monto, COALESCE(m.categoria, ''),
+                   COALESCE(m.es_anual, 0), m.creada_en
+            FROM presupuesto_movimientos m
+            JOIN presupuestos p ON p.id = m.presupuesto_id
+            WHERE m.user_id = ?
+            ORDER BY m.presupuesto_id, m.id
+        """, (user_id,))
+        try:
+            while filas := cur.fetchmany(lote):
+                yield [
+                    (f[0], f[1], f[2], _de_centavos(f[3]), f[4], bool(f[5]), f[6])
+                    for f in filas
+                ]
+        finally:
+            cur.close()
+
+
+def _transaccion(conn: sqlite3.Connection, user_id: int, transaccion_id: int) -> dict | None:
+    """Transacción del usuario con el monto en centavos (uso interno)."""
+    row = conn.execute(
+        "SELECT * FROM transacciones WHERE id = ? AND user_id = ?",
+        (transaccion_id, user_id)
+    ).fetchone()
     return dict(row) if row else None
 
 
+@por_usuario
+def obtener_transaccion(user_id: int, transaccion_id: int) -> dict | None:
+    """Obtiene una transacción por ID si pertenece al usuario."""
+    with get_read_connection() as conn:
+        trans = _transaccion(conn, user_id, transaccion_id)
+    if trans:
+        trans["monto"] = _de_centavos(trans["monto"])
+    return trans
+
+
+@por_usuario
 def editar_registro(
     user_id: int,
     transaccion_id: int,
@@ -759,18 +1667,11 @@ def editar_registro(
     categoria: str | None = None,
 ) -> tuple[bool, str]:
     """Edita un gasto o ingreso. Retorna (éxito, mensaje)."""
-    trans = obtener_transaccion(user_id, transaccion_id)
-    if not trans:
-        return False, "No se encontró el registro o no te pertenece."
-
-    tipo = trans["tipo"]
-    if tipo not in ("gasto", "ingreso"):
-        return False, "Solo se pueden editar gastos e ingresos. Las transferencias no son editables."
-
     if monto is None and categoria is None:
         return False, "Debes indicar al menos monto o categoría para editar."
 
-    if monto is not None and monto <= 0:
+    centavos = _a_centavos(monto) if monto is not None else None
+    if centavos is not None and centavos <= 0:
         return False, "El monto debe ser mayor a 0."
 
     cat = None
@@ -778,49 +1679,49 @@ def editar_registro(
         cat = _normalizar_nombre_categoria(categoria)
         if not cat:
             return False, "La categoría no puede estar vacía."
-        if not categoria_permitida_para_movimiento(user_id, cat, tipo):
-            return False, (
-                f"Esa categoría no es válida para {tipo}s. Revisa /mis_categorias o usa /agregar_categoria."
-            )
 
-    with get_connection() as conn:
-        cuenta = conn.execute(
-            "SELECT id, nombre, saldo, tipo FROM cuentas WHERE id = ?",
-            (trans["cuenta_id"],)
-        ).fetchone()
-        if not cuenta:
-            return False, "Error: cuenta no encontrada."
-        cuenta = dict(cuenta)
-        saldo_actual = cuenta["saldo"]
-        monto_viejo = trans["monto"]
+    with _escritura_usuario(user_id, "cuentas") as conn:
+        trans = _transaccion(conn, user_id, transaccion_id)
+        if not trans:
+            return False, "No se encontró el registro o no te pertenece."
 
-        if monto is not None:
-            if tipo == "gasto":
-                nuevo_saldo = saldo_actual + monto_viejo - monto
-            else:
-                nuevo_saldo = saldo_actual - monto_viejo + monto
+        tipo = trans["tipo"]
+        if tipo not in ("gasto", "ingreso"):
+            return False, "Solo se pueden editar gastos e ingresos. Las transferencias no son editables."
 
-            conn.execute("UPDATE transacciones SET monto = ? WHERE id = ?", (monto, transaccion_id))
-            conn.execute("UPDATE cuentas SET saldo = ? WHERE id = ?", (nuevo_saldo, cuenta["id"]))
+        if cat is not None and not _categoria_permitida(conn, user_id, cat, tipo):
+            return False, (
+                f"Esa categoría no es válida para {tipo}s. Revisa /mis_categorias o usa /agregar_categoria."
+            )
 
+        _resumen_mensual_aplicar(conn, transaccion_id, -1)
+        if centavos is not None:
+            diferencia = centavos - trans["monto"]
+            conn.execute("UPDATE transacciones SET monto = ? WHERE id = ?", (centavos, transaccion_id))
+            conn.execute(
+                "UPDATE cuentas SET saldo = saldo + ? WHERE id = ?",
+                (-diferencia if tipo == "gasto" else diferencia, trans["cuenta_id"]),
+            )
         if cat is not None:
             conn.execute("UPDATE transacciones SET categoria = ? WHERE id = ?", (cat, transaccion_id))
+        _resumen_mensual_aplicar(conn, transaccion_id, +1)
 
     cambios = []
-    if monto is not None:
-        cambios.append(f"monto ${monto:,.2f}")
+    if centavos is not None:
+        cambios.append(f"monto ${_de_centavos(centavos):,.2f}")
     if cat is not None:
         cambios.append(f"categoría '{cat}'")
     return True, f"Registro #{transaccion_id} actualizado: {', '.join(cambios)}."
 
 
+@por_usuario
 def eliminar_registro(user_id: int, transaccion_id: int) -> tuple[bool, str]:
     """Elimina una transacción y revierte el saldo. Retorna (éxito, mensaje)."""
-    trans = obtener_transaccion(user_id, transaccion_id)
-    if not trans:
-        return False, "No se encontró el registro o no te pertenece."
+    with _escritura_usuario(user_id, "cuentas") as conn:
+        trans = _transaccion(conn, user_id, transaccion_id)
+        if not trans:
+            return False, "No se encontró el registro o no te pertenece."
 
-    with get_connection() as conn:
         cuenta = conn.execute(
             "SELECT id, nombre, saldo, tipo FROM cuentas WHERE id = ?",
             (trans["cuenta_id"],)
@@ -831,18 +1732,19 @@ def eliminar_registro(user_id: int, transaccion_id: int) -> tuple[bool, str]:
 
         tipo = trans["tipo"]
         monto = trans["monto"]
+        importe = _de_centavos(monto)
 
         if tipo == "gasto":
-            nuevo_saldo = cuenta["saldo"] + monto
+            _resumen_mensual_aplicar(conn, transaccion_id, -1)
             conn.execute("DELETE FROM transacciones WHERE id = ?", (transaccion_id,))
-            conn.execute("UPDATE cuentas SET saldo = ? WHERE id = ?", (nuevo_saldo, cuenta["id"]))
-            return True, f"Gasto de ${monto:,.2f} eliminado de '{cuenta['nombre']}'."
+            conn.execute("UPDATE cuentas SET saldo = saldo + ? WHERE id = ?", (monto, cuenta["id"]))
+            return True, f"Gasto de ${importe:,.2f} eliminado de '{cuenta['nombre']}'."
 
         elif tipo == "ingreso":
-            nuevo_saldo = cuenta["saldo"] - monto
+            _resumen_mensual_aplicar(conn, transaccion_id, -1)
             conn.execute("DELETE FROM transacciones WHERE id = ?", (transaccion_id,))
-            conn.execute("UPDATE cuentas SET saldo = ? WHERE id = ?", (nuevo_saldo, cuenta["id"]))
-            return True, f"Ingreso de ${monto:,.2f} eliminado de '{cuenta['nombre']}'."
+            conn.execute("UPDATE cuentas SET saldo = saldo - ? WHERE id = ?", (monto, cuenta["id"]))
+            return True, f"Ingreso de ${importe:,.2f} eliminado de '{cuenta['nombre']}'."
 
         elif tipo in ("transferencia_salida", "transferencia_entrada"):
             if trans.get("transfer_id"):
@@ -869,20 +1771,15 @@ def eliminar_registro(user_id: int, transaccion_id: int) -> tuple[bool, str]:
             cuenta_origen_id = trans["cuenta_id"] if tipo == "transferencia_salida" else trans["cuenta_relacionada_id"]
             cuenta_destino_id = trans["cuenta_relacionada_id"] if tipo == "transferencia_salida" else trans["cuenta_id"]
 
-            saldo_origen = conn.execute("SELECT saldo FROM cuentas WHERE id = ?", (cuenta_origen_id,)).fetchone()[0]
-            saldo_destino = conn.execute("SELECT saldo FROM cuentas WHERE id = ?", (cuenta_destino_id,)).fetchone()[0]
-
-            nuevo_saldo_origen = saldo_origen + monto
-            nuevo_saldo_destino = saldo_destino - monto
-
             conn.execute("DELETE FROM transacciones WHERE id IN (?, ?)", (transaccion_id, par["id"]))
-            conn.execute("UPDATE cuentas SET saldo = ? WHERE id = ?", (nuevo_saldo_origen, cuenta_origen_id))
-            conn.execute("UPDATE cuentas SET saldo = ? WHERE id = ?", (nuevo_saldo_destino, cuenta_destino_id))
-            return True, f"Transferencia de ${monto:,.2f} eliminada correctamente."
+            conn.execute("UPDATE cuentas SET saldo = saldo + ? WHERE id = ?", (monto, cuenta_origen_id))
+            conn.execute("UPDATE cuentas SET saldo = saldo - ? WHERE id = ?", (monto, cuenta_destino_id))
+            return True, f"Transferencia de ${importe:,.2f} eliminada correctamente."
 
     return False, "Error al eliminar."
 
 
+@por_usuario
 def agregar_presupuesto_registro(
     user_id: int,
     presupuesto_id: int,
@@ -898,8 +1795,10 @@ def agregar_presupuesto_registro(
     tipo = tipo.lower().strip()
     if tipo not in ("gasto", "ingreso"):
         return False, "Tipo interno inválido."
-    if monto <= 0:
+    centavos = _a_centavos(monto)
+    if centavos <= 0:
         return False, "El monto debe ser mayor a 0."
+    monto = _de_centavos(centavos)
     if tipo == "ingreso":
         es_anual = False
     cat = _normalizar_nombre_categoria(categoria)
@@ -924,7 +1823,7 @@ def agregar_presupuesto_registro(
             """INSERT INTO presupuesto_movimientos
                (user_id, presupuesto_id, tipo, monto, categoria, es_anual)
                VALUES (?, ?, ?, ?, ?, ?)""",
-            (user_id, presupuesto_id, tipo, monto, cat, anual_flag),
+            (user_id, presupuesto_id, tipo, centavos, cat, anual_flag),
         )
         reg_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
 
@@ -939,16 +1838,18 @@ def agregar_presupuesto_registro(
     return True, f"{etiqueta} de presupuesto #{reg_id}{sufijo}: ${monto:,.2f} [{cat}]."
 
 
+@por_usuario
 def obtener_presupuesto_registro(user_id: int, registro_id: int) -> dict | None:
     """Obtiene un movimiento de presupuesto por ID si pertenece al usuario."""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         row = conn.execute(
             "SELECT * FROM presupuesto_movimientos WHERE id = ? AND user_id = ?",
             (registro_id, user_id),
         ).fetchone()
-    return dict(row) if row else None
+    return _con_importes(row, "monto") if row else None
 
 
+@por_usuario
 def editar_presupuesto_registro(
     user_id: int,
     registro_id: int,
@@ -961,8 +1862,11 @@ def editar_presupuesto_registro(
         return False, "No se encontró el registro o no te pertenece."
     if monto is None and categoria is None:
         return False, "Debes cambiar al menos monto o categoría."
-    if monto is not None and monto <= 0:
+    centavos = _a_centavos(monto) if monto is not None else None
+    if centavos is not None and centavos <= 0:
         return False, "El monto debe ser mayor a 0."
+    if centavos is not None:
+        monto = _de_centavos(centavos)
 
     cat = None
     if categoria is not None:
@@ -980,7 +1884,7 @@ def editar_presupuesto_registro(
         if monto is not None:
             conn.execute(
                 "UPDATE presupuesto_movimientos SET monto = ? WHERE id = ? AND user_id = ?",
-                (monto, registro_id, user_id),
+                (centavos, registro_id, user_id),
             )
         if cat is not None:
             conn.execute(
@@ -1000,6 +1904,7 @@ def editar_presupuesto_registro(
     return True, f"Registro de presupuesto #{registro_id} actualizado: {', '.join(cambios)}."
 
 
+@por_usuario
 def eliminar_presupuesto_registro(user_id: int, registro_id: int) -> tuple[bool, str]:
     """Elimina una línea de presupuesto por ID (único entre todos los presupuestos del usuario)."""
     reg = obtener_presupuesto_registro(user_id, registro_id)
@@ -1028,9 +1933,37 @@ def eliminar_presupuesto_registro(user_id: int, registro_id: int) -> tuple[bool,
     )
 
 
+@por_usuario
+def eliminar_presupuesto_registros(user_id: int, registro_ids: Iterable[int]) -> tuple[bool, str]:
+    """Elimina varias líneas de presupuesto por ID con un solo DELETE.
+
+    Los IDs que no existen o no son del usuario se indican en el mensaje.
+    """
+    ids = sorted(set(registro_ids))
+    if not ids:
+        return False, "Indica al menos un ID."
+    with get_connection() as conn:
+        borrados = {
+            row[0] for row in conn.execute(
+                """DELETE FROM presupuesto_movimientos
+                   WHERE user_id = ? AND id IN (SELECT value FROM json_each(?))
+                   RETURNING id""",
+                (user_id, json.dumps(ids)),
+            ).fetchall()
+        }
+    if not borrados:
+        return False, "No se encontró ninguna de esas líneas o no te pertenecen."
+    mensaje = f"{len(borrados)} línea(s) eliminada(s): " + ", ".join(f"#{i}" for i in sorted(borrados)) + "."
+    faltan = [i for i in ids if i not in borrados]
+    if faltan:
+        mensaje += " No encontradas: " + ", ".join(f"#{i}" for i in faltan) + "."
+    return True, mensaje
+
+
+@por_usuario
 def listar_presupuesto(user_id: int, presupuesto_id: int) -> list[dict]:
     """Lista movimientos de un presupuesto concreto."""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         ok = conn.execute(
             "SELECT 1 FROM presupuestos WHERE id = ? AND user_id = ?",
             (presupuesto_id, user_id),
@@ -1044,15 +1977,16 @@ def listar_presupuesto(user_id: int, presupuesto_id: int) -> list[dict]:
                ORDER BY categoria COLLATE NOCASE ASC, tipo DESC, id ASC""",
             (user_id, presupuesto_id),
         ).fetchall()
-    return [dict(r) for r in rows]
+    return [_con_importes(r, "monto") for r in rows]
 
 
+@por_usuario
 def totales_presupuesto(user_id: int, presupuesto_id: int) -> dict:
     """Totales de un presupuesto concreto.
 
     Los gastos marcados como anuales cuentan como monto/12 en el total de gastos mensual.
     """
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         ok = conn.execute(
             "SELECT 1 FROM presupuestos WHERE id = ? AND user_id = ?",
             (presupuesto_id, user_id),
@@ -1061,18 +1995,131 @@ def totales_presupuesto(user_id: int, presupuesto_id: int) -> dict:
             return {"total_gasto": 0.0, "total_ingreso": 0.0, "balance": 0.0}
         row = conn.execute(
             """SELECT
-                   COALESCE(SUM(CASE WHEN tipo = 'gasto' THEN
-                       CASE WHEN COALESCE(es_anual, 0) = 1 THEN monto / 12.0 ELSE monto END
-                   ELSE 0 END), 0) AS total_gasto,
+                   COALESCE(SUM(CASE WHEN tipo = 'gasto' AND COALESCE(es_anual, 0) = 0
+                                THEN monto ELSE 0 END), 0) AS gasto_mensual,
+                   COALESCE(SUM(CASE WHEN tipo = 'gasto' AND COALESCE(es_anual, 0) = 1
+                                THEN monto ELSE 0 END), 0) AS gasto_anual,
                    COALESCE(SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END), 0) AS total_ingreso
                FROM presupuesto_movimientos
                WHERE user_id = ? AND presupuesto_id = ?""",
             (user_id, presupuesto_id),
         ).fetchone()
-    g = row["total_gasto"] if row else 0.0
-    i = row["total_ingreso"] if row else 0.0
+    return _totales_presupuesto(row["gasto_mensual"], row["gasto_anual"], row["total_ingreso"])
+
+
+def _totales_presupuesto(gasto_mensual: int, gasto_anual: int, ingreso: int) -> dict:
+    # Sumas exactas en centavos; la única división (anual / 12) se hace al final
+    g = (gasto_mensual + gasto_anual / 12) / 100
+    i = _de_centavos(ingreso)
     return {
         "total_gasto": g,
         "total_ingreso": i,
         "balance": i - g,
     }
+
+
+@por_usuario
+def comparar_presupuesto(user_id: int, presupuesto_id: int, ano: int, mes: int) -> dict | None:
+    """Planificado contra real, por tipo y categoría, para un mes. None si el presupuesto no existe.
+
+    Una sola consulta agrupada une las líneas del presupuesto (los gastos
+    anuales cuentan como monto/12) con los totales del mes en resumen_mensual,
+    así el coste no depende del número de transacciones. Aparecen también las
+    categorías con movimientos reales que no están en el presupuesto.
+    Cada fila: {"categoria", "planificado", "real", "diferencia"} con
+    diferencia = real - planificado.
+    """
+    with get_read_connection() as conn:
+        pres = conn.execute(
+            "SELECT nombre FROM presupuestos WHERE id = ? AND user_id = ?",
+            (presupuesto_id, user_id),
+        ).fetchone()
+        if not pres:
+            return None
+        rows = conn.execute(
+            """SELECT tipo, categoria,
+                      SUM(mensual) AS mensual, SUM(anual) AS anual, SUM(real) AS real
+               FROM (
+                   SELECT tipo, categoria,
+                          SUM(CASE WHEN tipo = 'gasto' AND es_anual = 1 THEN 0 ELSE monto END) AS mensual,
+                          SUM(CASE WHEN tipo = 'gasto' AND es_anual = 1 THEN monto ELSE 0 END) AS anual,
+                          0 AS real
+                   FROM presupuesto_movimientos
+                   WHERE user_id = ? AND presupuesto_id = ?
+                   GROUP BY tipo, categoria
+                   UNION ALL
+                   SELECT tipo, categoria, 0, 0, total
+                   FROM resumen_mensual
+                   WHERE user_id = ? AND ano = ? AND mes = ?
+               )
+               GROUP BY tipo, categoria
+               ORDER BY categoria COLLATE NOCASE ASC""",
+            (user_id, presupuesto_id, user_id, ano, mes),
+        ).fetchall()
+
+    resultado: dict = {"presupuesto": pres["nombre"], "ano": ano, "mes": mes}
+    for tipo, clave in (("gasto", "gastos"), ("ingreso", "ingresos")):
+        filas = []
+        for r in rows:
+            if r["tipo"] != tipo:
+                continue
+            # Centavos exactos; la única división (anual / 12) se hace al final
+            planificado = (r["mensual"] + r["anual"] / 12) / 100
+            real = _de_centavos(r["real"])
+            filas.append({
+                "categoria": r["categoria"],
+                "planificado": planificado,
+                "real": real,
+                "diferencia": real - planificado,
+            })
+        resultado[clave] = filas
+        resultado[f"total_{clave}_planificado"] = sum(f["planificado"] for f in filas)
+        resultado[f"total_{clave}_real"] = _de_centavos(sum(r["real"] for r in rows if r["tipo"] == tipo))
+    return resultado
+
+
+@por_usuario
+def listar_presupuestos_con_detalle(user_id: int) -> list[dict]:
+    """Todos los presupuestos del usuario con sus líneas y totales, en una sola consulta.
+
+    Cada elemento es {"id", "nombre", "registros", "totales"}, con los mismos
+    formatos que listar_presupuesto y totales_presupuesto. Un LEFT JOIN trae
+    presupuestos y líneas ordenados; los totales se suman aquí en centavos.
+    """
+    with get_read_connection() as conn:
+        rows = conn.execute(
+            """SELECT p.id AS presupuesto_id, p.nombre, m.id, m.tipo, m.monto, m.categoria,
+                      COALESCE(m.es_anual, 0) AS es_anual, m.creada_en
+               FROM presupuestos p
+               LEFT JOIN presupuesto_movimientos m
+                 ON m.user_id = p.user_id AND m.presupuesto_id = p.id
+               WHERE p.user_id = ?
+               ORDER BY p.nombre COLLATE NOCASE ASC, p.id,
+                        m.categoria COLLATE NOCASE ASC, m.tipo DESC, m.id ASC""",
+            (user_id,),
+        ).fetchall()
+
+    presupuestos = []
+    for (pid, nombre), grupo in itertools.groupby(rows, key=lambda r: (r["presupuesto_id"], r["nombre"])):
+        registros = []
+        gasto_mensual = gasto_anual = ingreso = 0
+        for r in grupo:
+            if r["id"] is None:
+                continue  # presupuesto sin líneas
+            if r["tipo"] == "ingreso":
+                ingreso += r["monto"]
+            elif r["es_anual"]:
+                gasto_anual += r["monto"]
+            else:
+                gasto_mensual += r["monto"]
+            registros.append(_con_importes(
+                {k: r[k] for k in ("id", "tipo", "monto", "categoria", "es_anual", "creada_en")},
+                "monto",
+            ))
+        presupuestos.append({
+            "id": pid,
+            "nombre": nombre,
+            "registros": registros,
+            "totales": _totales_presupuesto(gasto_mensual, gasto_anual, ingreso),
+        })
+    return presupuestos
@@ -0,0 +1,484 @@
+"""
+Migraciones versionadas del esquema.
+
+Cada migración se aplica una sola vez, en su propia transacción, y queda
+registrada en la tabla schema_version. Para cambiar el esquema se añade una
+función nueva al final de MIGRACIONES; nunca se modifican las ya publicadas.
+"""
+import sqlite3
+from typing import Callable
+
+
+def _migracion_esquema_base(conn: sqlite3.Connection) -> None:
+    """Esquema previo al sistema de migraciones (también actualiza bases antiguas)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cuentas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            nombre TEXT NOT NULL,
+            tipo TEXT NOT NULL CHECK(tipo IN ('credito', 'debito')),
+            saldo REAL NOT NULL DEFAULT 0,
+            creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, nombre)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS transacciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            cuenta_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL CHECK(tipo IN ('gasto', 'ingreso', 'transferencia_entrada', 'transferencia_salida')),
+            monto REAL NOT NULL,
+            cuenta_relacionada_id INTEGER,
+            transfer_id TEXT,
+            creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (cuenta_id) REFERENCES cuentas(id),
+            FOREIGN KEY (cuenta_relacionada_id) REFERENCES cuentas(id)
+        )
+    """)
+    try:
+        conn.execute("ALTER TABLE transacciones ADD COLUMN transfer_id TEXT")
+    except sqlite3.OperationalError:
+        pass
+    try:
+        conn.execute("ALTER TABLE transacciones ADD COLUMN categoria TEXT DEFAULT 'sin_categoria'")
+    except sqlite3.OperationalError:
+        pass
+    _ensure_presupuesto_tabla(conn)
+    _ensure_presupuesto_es_anual(conn)
+    _ensure_presupuestos_y_relacion(conn)
+    _ensure_categorias_usuario_tabla(conn)
+
+
+def _ensure_categorias_usuario_tabla(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS categorias_usuario (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            nombre TEXT NOT NULL,
+            ambito TEXT NOT NULL CHECK(ambito IN ('gasto', 'ingreso', 'ambos')),
+            creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, nombre)
+        )
+    """)
+
+
+def _ensure_presupuesto_es_anual(conn: sqlite3.Connection) -> None:
+    """Añade es_anual (gasto anual → se usa monto/12 en totales) si la tabla ya existía sin la columna."""
+    row = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='presupuesto_movimientos'"
+    ).fetchone()
+    if not row:
+        return
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(presupuesto_movimientos)")}
+    if "es_anual" in cols:
+        return
+    try:
+        conn.execute(
+            "ALTER TABLE presupuesto_movimientos ADD COLUMN es_anual INTEGER NOT NULL DEFAULT 0"
+        )
+    except sqlite3.OperationalError:
+        pass
+
+
+def _ensure_presupuesto_tabla(conn: sqlite3.Connection) -> None:
+    """Crea la tabla de presupuesto (única por usuario, sin periodo) o migra la versión con año/mes."""
+    row = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='presupuesto_movimientos'"
+    ).fetchone()
+    if not row:
+        conn.execute("""
+            CREATE TABLE presupuesto_movimientos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                tipo TEXT NOT NULL CHECK(tipo IN ('gasto', 'ingreso')),
+                monto REAL NOT NULL,
+                categoria TEXT NOT NULL DEFAULT 'sin_categoria',
+                es_anual INTEGER NOT NULL DEFAULT 0 CHECK(es_anual IN (0, 1)),
+                creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        return
+
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(presupuesto_movimientos)")}
+    if "ano" not in cols:
+        return
+
+    conn.execute("""
+        CREATE TABLE presupuesto_movimientos_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL CHECK(tipo IN ('gasto', 'ingreso')),
+            monto REAL NOT NULL,
+            categoria TEXT NOT NULL DEFAULT 'sin_categoria',
+            es_anual INTEGER NOT NULL DEFAULT 0 CHECK(es_anual IN (0, 1)),
+            creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        INSERT INTO presupuesto_movimientos_new (id, user_id, tipo, monto, categoria, es_anual, creada_en)
+        SELECT id, user_id, tipo, monto, categoria, 0, creada_en FROM presupuesto_movimientos
+    """)
+    conn.execute("DROP TABLE presupuesto_movimientos")
+    conn.execute("ALTER TABLE presupuesto_movimientos_new RENAME TO presupuesto_movimientos")
+    mx = conn.execute(
+        "SELECT COALESCE(MAX(id), 0) FROM presupuesto_movimientos"
+    ).fetchone()[0]
+    cur = conn.execute(
+        "UPDATE sqlite_sequence SET seq = ? WHERE name = 'presupuesto_movimientos'",
+        (mx,),
+    )
+    if cur.rowcount == 0:
+        conn.execute(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES ('presupuesto_movimientos', ?)",
+            (mx,),
+        )
+
+
+def _ensure_presupuestos_y_relacion(conn: sqlite3.Connection) -> None:
+    """Varios presupuestos por usuario; movimientos enlazados con presupuesto_id."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS presupuestos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            nombre TEXT NOT NULL,
+            creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, nombre)
+        )
+    """)
+    row = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='presupuesto_movimientos'"
+    ).fetchone()
+    if not row:
+        return
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(presupuesto_movimientos)")}
+    if "presupuesto_id" in cols:
+        return
+    for (uid,) in conn.execute(
+        "SELECT DISTINCT user_id FROM presupuesto_movimientos"
+    ).fetchall():
+        conn.execute(
+            "INSERT OR IGNORE INTO presupuestos (user_id, nombre) VALUES (?, ?)",
+            (uid, "principal"),
+        )
+    conn.execute("ALTER TABLE presupuesto_movimientos ADD COLUMN presupuesto_id INTEGER")
+    for mid, uid in conn.execute(
+        "SELECT id, user_id FROM presupuesto_movimientos"
+    ).fetchall():
+        pr = conn.execute(
+            "SELECT id FROM presupuestos WHERE user_id = ? AND nombre = ?",
+            (uid, "principal"),
+        ).fetchone()
+        if pr:
+            conn.execute(
+                "UPDATE presupuesto_movimientos SET presupuesto_id = ? WHERE id = ?",
+                (pr[0], mid),
+            )
+
+
+def _migracion_indices(conn: sqlite3.Connection) -> None:
+    """Índices compuestos para las consultas por usuario, cuenta, tipo y fecha."""
+    conn.execute(
+        """CREATE INDEX IF NOT EXISTS idx_transacciones_usuario_cuenta_fecha
+           ON transacciones (user_id, cuenta_id, creada_en)"""
+    )
+    conn.execute(
+        """CREATE INDEX IF NOT EXISTS idx_transacciones_usuario_tipo_fecha
+           ON transacciones (user_id, tipo, creada_en)"""
+    )
+    conn.execute(
+        """CREATE INDEX IF NOT EXISTS idx_transacciones_transfer
+           ON transacciones (transfer_id) WHERE transfer_id IS NOT NULL"""
+    )
+    conn.execute(
+        """CREATE INDEX IF NOT EXISTS idx_presupuesto_mov_usuario_presupuesto
+           ON presupuesto_movimientos (user_id, presupuesto_id)"""
+    )
+    conn.execute("ANALYZE")
+
+
+def _migracion_resumen_mensual(conn: sqlite3.Connection) -> None:
+    """Tabla de totales mensuales por categoría, mantenida en cada escritura."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_mensual (
+            user_id INTEGER NOT NULL,
+            ano INTEGER NOT NULL,
+            mes INTEGER NOT NULL,
+            tipo TEXT NOT NULL CHECK(tipo IN ('gasto', 'ingreso')),
+            categoria TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, ano, mes, tipo, categoria)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO resumen_mensual (user_id, ano, mes, tipo, categoria, total, n)
+        SELECT user_id,
+               CAST(strftime('%Y', creada_en) AS INTEGER),
+               CAST(strftime('%m', creada_en) AS INTEGER),
+               tipo,
+               COALESCE(categoria, 'sin_categoria'),
+               SUM(monto),
+               COUNT(*)
+        FROM transacciones
+        WHERE tipo IN ('gasto', 'ingreso')
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+_CUENTAS_CENTAVOS = """
+    CREATE TABLE {tabla} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        nombre TEXT NOT NULL,
+        tipo TEXT NOT NULL CHECK(tipo IN ('credito', 'debito')),
+        saldo INTEGER NOT NULL DEFAULT 0,
+        creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, nombre)
+    )
+"""
+_TRANSACCIONES_CENTAVOS = """
+    CREATE TABLE {tabla} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        cuenta_id INTEGER NOT NULL,
+        tipo TEXT NOT NULL CHECK(tipo IN ('gasto', 'ingreso', 'transferencia_entrada', 'transferencia_salida')),
+        monto INTEGER NOT NULL,
+        cuenta_relacionada_id INTEGER,
+        transfer_id TEXT,
+        creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        categoria TEXT DEFAULT 'sin_categoria',
+        FOREIGN KEY (cuenta_id) REFERENCES cuentas(id),
+        FOREIGN KEY (cuenta_relacionada_id) REFERENCES cuentas(id)
+    )
+"""
+_PRESUPUESTO_MOVIMIENTOS_CENTAVOS = """
+    CREATE TABLE {tabla} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        tipo TEXT NOT NULL CHECK(tipo IN ('gasto', 'ingreso')),
+        monto INTEGER NOT NULL,
+        categoria TEXT NOT NULL DEFAULT 'sin_categoria',
+        es_anual INTEGER NOT NULL DEFAULT 0 CHECK(es_anual IN (0, 1)),
+        creada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        presupuesto_id INTEGER
+    )
+"""
+
+
+def _reconstruir_en_centavos(
+    conn: sqlite3.Connection, tabla: str, ddl: str, columnas: tuple[str, ...], importe: str
+) -> None:
+    """Copia `tabla` a una nueva con `importe` INTEGER (centavos) y la reemplaza.
+
+    Se conserva el contador de AUTOINCREMENT para no reutilizar ids borrados.
+    """
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabla,)).fetchone()
+    conn.execute(ddl.format(tabla=f"{tabla}_centavos"))
+    lista = ", ".join(columnas)
+    origen = ", ".join(
+        f"CAST(ROUND({c} * 100) AS INTEGER)" if c == importe else c for c in columnas
+    )
+    conn.execute(f"INSERT INTO {tabla}_centavos ({lista}) SELECT {origen} FROM {tabla}")
+    conn.execute(f"DROP TABLE {tabla}")
+    conn.execute(f"ALTER TABLE {tabla}_centavos RENAME TO {tabla}")
+    if seq:
+        conn.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq[0], tabla)
+        )
+
+
+def _migracion_importes_en_centavos(conn: sqlite3.Connection) -> None:
+    """Saldos, montos y totales pasan de REAL a INTEGER en centavos.
+
+    Con REAL las sumas acumulaban error de redondeo; con enteros son exactas.
+    La conversión a unidades para mostrar se hace en db.py.
+    """
+    _reconstruir_en_centavos(
+        conn, "cuentas", _CUENTAS_CENTAVOS,
+        ("id", "user_id", "nombre", "tipo", "saldo", "creada_en"), "saldo",
+    )
+    _reconstruir_en_centavos(
+        conn, "transacciones", _TRANSACCIONES_CENTAVOS,
+        ("id", "user_id", "cuenta_id", "tipo", "monto", "cuenta_relacionada_id",
+         "transfer_id", "creada_en", "categoria"),
+        "monto",
+    )
+    _reconstruir_en_centavos(
+        conn, "presupuesto_movimientos", _PRESUPUESTO_MOVIMIENTOS_CENTAVOS,
+        ("id", "user_id", "tipo", "monto", "categoria", "es_anual", "creada_en", "presupuesto_id"),
+        "monto",
+    )
+    # DROP TABLE se llevó los índices de la migración 2
+    _migracion_indices(conn)
+
+    # El resumen se recalcula desde los montos ya redondeados para que cuadre exacto
+    conn.execute("DROP TABLE resumen_mensual")
+    conn.execute("""
+        CREATE TABLE resumen_mensual (
+            user_id INTEGER NOT NULL,
+            ano INTEGER NOT NULL,
+            mes INTEGER NOT NULL,
+            tipo TEXT NOT NULL CHECK(tipo IN ('gasto', 'ingreso')),
+            categoria TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, ano, mes, tipo, categoria)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO resumen_mensual (user_id, ano, mes, tipo, categoria, total, n)
+        SELECT user_id,
+               CAST(strftime('%Y', creada_en) AS INTEGER),
+               CAST(strftime('%m', creada_en) AS INTEGER),
+               tipo,
+               COALESCE(categoria, 'sin_categoria'),
+               SUM(monto),
+               COUNT(*)
+        FROM transacciones
+        WHERE tipo IN ('gasto', 'ingreso')
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+def _migracion_indice_cuentas_nombre(conn: sqlite3.Connection) -> None:
+    """Cuentas de cada usuario en el orden en que se muestran (nombre sin mayúsculas).
+
+    Sirve el ORDER BY de los listados por usuario y el recorrido de todas las
+    cuentas, ordenadas por usuario, del resumen diario sin ordenar en memoria.
+    """
+    conn.execute(
+        """CREATE INDEX IF NOT EXISTS idx_cuentas_usuario_nombre_nocase
+           ON cuentas (user_id, nombre COLLATE NOCASE)"""
+    )
+    conn.execute("ANALYZE cuentas")
+
+
+def _migracion_preferencias_usuario(conn: sqlite3.Connection) -> None:
+    """Zona horaria y hora del resumen diario de cada usuario.
+
+    proximo_envio es el siguiente envío en UTC ('AAAA-MM-DD HH:MM:SS'); el
+    índice parcial permite encontrar en cada minuto solo a los que les toca.
+    Las filas se crean desde el código (al crear la primera cuenta o al
+    arrancar), porque calcular proximo_envio necesita la zona horaria.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS preferencias_usuario (
+            user_id INTEGER PRIMARY KEY,
+            zona_horaria TEXT NOT NULL,
+            hora_envio TEXT NOT NULL,
+            resumen_activo INTEGER NOT NULL DEFAULT 1,
+            proximo_envio TEXT
+        )
+    """)
+    conn.execute(
+        """CREATE INDEX IF NOT EXISTS idx_preferencias_proximo_envio
+           ON preferencias_usuario (proximo_envio) WHERE proximo_envio IS NOT NULL"""
+    )
+
+
+def _migracion_fallos_entrega(conn: sqlite3.Connection) -> None:
+    """Fallos al enviar mensajes automáticos y usuarios en pausa.
+
+    fallos_entrega cuenta los fallos por usuario y tipo (bloqueado,
+    chat_no_encontrado, red, ...). usuarios_pausados guarda a quienes tuvieron
+    un fallo permanente: no se les envía nada hasta que vuelvan a escribir.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fallos_entrega (
+            user_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            veces INTEGER NOT NULL DEFAULT 0,
+            ultimo_detalle TEXT,
+            ultimo_en TEXT NOT NULL,
+            PRIMARY KEY (user_id, tipo)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios_pausados (
+            user_id INTEGER PRIMARY KEY,
+            motivo TEXT NOT NULL,
+            pausado_en TEXT NOT NULL
+        )
+    """)
+
+
+def _migracion_persistencia(conn: sqlite3.Connection) -> None:
+    """Estado de las conversaciones y user_data del bot, para sobrevivir a un reinicio.
+
+    Los valores se guardan como JSON; ver src.persistencia.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS persistencia_usuarios (
+            user_id INTEGER PRIMARY KEY,
+            datos TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS persistencia_conversaciones (
+            nombre TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            estado TEXT NOT NULL,
+            PRIMARY KEY (nombre, clave)
+        ) WITHOUT ROWID
+    """)
+
+
+MIGRACIONES: list[tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "esquema base", _migracion_esquema_base),
+    (2, "índices de consultas frecuentes", _migracion_indices),
+    (3, "tabla resumen_mensual", _migracion_resumen_mensual),
+    (4, "importes en centavos enteros", _migracion_importes_en_centavos),
+    (5, "índice de cuentas por usuario y nombre", _migracion_indice_cuentas_nombre),
+    (6, "preferencias del resumen diario", _migracion_preferencias_usuario),
+    (7, "fallos de entrega y usuarios en pausa", _migracion_fallos_entrega),
+    (8, "persistencia de conversaciones y user_data", _migracion_persistencia),
+]
+
+
+def version_actual(conn: sqlite3.Connection) -> int:
+    """Última versión aplicada (0 si la base aún no tiene schema_version)."""
+    row = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='schema_version'"
+    ).fetchone()
+    if not row:
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def aplicar_migraciones(conn: sqlite3.Connection) -> int:
+    """Aplica las migraciones pendientes en orden y devuelve la versión final.
+
+    Abre una transacción (BEGIN IMMEDIATE) por migración, así que `conn` no
+    debe tener ninguna abierta. La versión se vuelve a leer con el lock
+    tomado: si dos procesos arrancan a la vez, el segundo salta las
+    migraciones que el primero ya aplicó mientras esperaba.
+    """
+    if conn.in_transaction:
+        raise RuntimeError("aplicar_migraciones abre sus propias transacciones: llámala sin una abierta.")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    actual = version_actual(conn)
+    for version, descripcion, migrar in MIGRACIONES:
+        if version <= actual:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            actual = version_actual(conn)
+            if version > actual:
+                migrar(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, descripcion) VALUES (?, ?)",
+                    (version, descripcion),
+                )
+                actual = version
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return actual
@@ -0,0 +1,132 @@
+"""Pool de conexiones SQLite persistentes: un escritor y N lectores."""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from ..utils import entero_env
+
+_SYNCHRONOUS_VALIDOS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+@dataclass(frozen=True)
+class ConfigPool:
+    """Tamaño del pool y pragmas aplicados a cada conexión al abrirla."""
+
+    lectores: int = 4
+    cache_size_kb: int = 16384
+    mmap_size_mb: int = 64
+    busy_timeout_ms: int = 5000
+    synchronous: str = "NORMAL"
+
+    @classmethod
+    def desde_entorno(cls) -> "ConfigPool":
+        """Lee la configuración de las variables DB_* (ver README)."""
+        synchronous = os.getenv("DB_SYNCHRONOUS", cls.synchronous).strip().upper()
+        if synchronous not in _SYNCHRONOUS_VALIDOS:
+            synchronous = cls.synchronous
+        return cls(
+            lectores=max(1, entero_env("DB_POOL_LECTORES", cls.lectores)),
+            cache_size_kb=max(0, entero_env("DB_CACHE_SIZE_KB", cls.cache_size_kb)),
+            mmap_size_mb=max(0, entero_env("DB_MMAP_SIZE_MB", cls.mmap_size_mb)),
+            busy_timeout_ms=max(0, entero_env("DB_BUSY_TIMEOUT_MS", cls.busy_timeout_ms)),
+            synchronous=synchronous,
+        )
+
+
+class PoolConexiones:
+    """Conexiones abiertas una sola vez y reutilizadas entre llamadas.
+
+    La conexión de escritura es única y se entrega en exclusiva (lock); las de
+    lectura salen de una cola y son `query_only`. Con WAL los lectores no
+    bloquean al escritor ni el escritor a los lectores.
+    """
+
+    def __init__(self, path: str | Path, config: ConfigPool | None = None):
+        self.path = str(path)
+        self.config = config or ConfigPool()
+        self._lock_escritura = threading.Lock()
+        self._escritor = self._abrir(solo_lectura=False)
+        self._lectores: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._todas = [self._escritor]
+        for _ in range(self.config.lectores):
+            conn = self._abrir(solo_lectura=True)
+            self._todas.append(conn)
+            self._lectores.put(conn)
+        self._cerrado = False
+
+    def _abrir(self, solo_lectura: bool) -> sqlite3.Connection:
+        cfg = self.config
+        # isolation_level=None: las transacciones se abren explícitamente
+        # (BEGIN IMMEDIATE en escritura) en lugar de implícitamente antes de cada DML.
+        conn = sqlite3.connect(
+            self.path,
+            timeout=cfg.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {cfg.busy_timeout_ms}")
+        if not solo_lectura:
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {cfg.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {-cfg.cache_size_kb}")
+        conn.execute(f"PRAGMA mmap_size = {cfg.mmap_size_mb * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if solo_lectura:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def escritura(self):
+        """Conexión de escritura en exclusiva dentro de BEGIN IMMEDIATE.
+
+        Commit al salir, rollback si hay error. BEGIN IMMEDIATE toma el lock de
+        escritura al empezar, así lecturas y escrituras del bloque ven un estado
+        que ningún otro proceso puede cambiar hasta el commit.
+        """
+        with self._lock_escritura:
+            conn = self._escritor
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+
+    @contextmanager
+    def escritor(self):
+        """Conexión de escritura en exclusiva, sin abrir transacción.
+
+        Para quien gestiona sus propias transacciones (aplicar_migraciones).
+        """
+        with self._lock_escritura:
+            yield self._escritor
+
+    @contextmanager
+    def lectura(self):
+        """Conexión de solo lectura tomada del pool (espera si están todas ocupadas)."""
+        conn = self._lectores.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._lectores.put(conn)
+
+    def cerrar(self) -> None:
+        """Cierra todas las conexiones (al apagar el bot o en scripts)."""
+        if self._cerrado:
+            return
+        self._cerrado = True
+        for conn in self._todas:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
@@ -0,0 +1,172 @@
+"""
+Almacenamiento repartido: DB_SHARDS archivos SQLite, cada usuario en el `user_id % DB_SHARDS`.
+
+Con un solo archivo todas las escrituras de todos los usuarios esperan el
+mismo lock de escritura de SQLite. Con DB_SHARDS=K hay K archivos
+(finanzas.0.db ... finanzas.{K-1}.db), cada uno con su pool de conexiones:
+los escritores de usuarios de archivos distintos no se esperan y cada
+archivo se puede vacuumar o copiar por separado. Con DB_SHARDS=1 (por
+defecto) se usa DB_PATH tal cual, como siempre.
+
+Las funciones de db.py eligen archivo con estos decoradores:
+
+- `por_usuario`: el archivo del user_id (primer argumento);
+- `en_todos(combinar)`: se ejecuta en cada archivo y `combinar` une los
+  resultados (listas de ids, contadores...).
+
+El archivo activo se guarda por hilo: las funciones de db.py son síncronas
+y corren enteras en el hilo que las llama (executor de aio o el event loop).
+"""
+import functools
+import heapq
+import inspect
+import itertools
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from ..utils import entero_env
+
+_actual = threading.local()
+
+
+def total_shards() -> int:
+    """Número de archivos (DB_SHARDS, por defecto 1)."""
+    return max(1, entero_env("DB_SHARDS", 1))
+
+
+def shard_de_usuario(user_id: int) -> int:
+    return user_id % total_shards()
+
+
+def shard_actual() -> int:
+    return getattr(_actual, "indice", 0)
+
+
+def ruta_shard(base: str | Path, indice: int, total: int) -> Path:
+    """finanzas.db → finanzas.{indice}.db (con un solo shard, la ruta sin cambios)."""
+    base = Path(base)
+    if total == 1:
+        return base
+    return base.with_name(f"{base.stem}.{indice}{base.suffix}")
+
+
+@contextmanager
+def en_shard(indice: int):
+    """Las llamadas a get_connection/get_read_connection de dentro usan ese archivo."""
+    anterior = shard_actual()
+    _actual.indice = indice
+    try:
+        yield
+    finally:
+        _actual.indice = anterior
+
+
+def iterar_en_shard(indice: int, iterador: Iterator) -> Iterator:
+    """Recorre un generador de db.py en un shard sin dejarlo activo entre elementos.
+
+    Quien consume el generador puede llamar a otras funciones entre un
+    elemento y el siguiente: el shard se activa solo mientras avanza.
+    """
+    try:
+        while True:
+            with en_shard(indice):
+                try:
+                    elemento = next(iterador)
+                except StopIteration:
+                    return
+            yield elemento
+    finally:
+        with en_shard(indice):
+            iterador.close()
+
+
+def repartir(elementos: Iterable, user_id_de: Callable) -> dict[int, list]:
+    """Agrupa elementos por el shard de su usuario: {indice: [elementos]}."""
+    grupos: dict[int, list] = {}
+    for elemento in elementos:
+        grupos.setdefault(shard_de_usuario(user_id_de(elemento)), []).append(elemento)
+    return grupos
+
+
+def por_usuario(func=None, *, todos: Callable[[list], object] | None = None):
+    """Ejecuta func en el archivo de su primer argumento, user_id.
+
+    Con `todos`, un user_id None recorre todos los archivos y une los
+    resultados con esa función (ver en_todos).
+    """
+    if func is None:
+        return functools.partial(por_usuario, todos=todos)
+
+    generador = inspect.isgeneratorfunction(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        total = total_shards()
+        if total == 1:
+            return func(*args, **kwargs)
+        user_id = args[0] if args else kwargs.get("user_id")
+        if user_id is None and todos is not None:
+            return _en_cada_shard(func, total, todos, args, kwargs)
+        indice = user_id % total
+        if generador:
+            return iterar_en_shard(indice, func(*args, **kwargs))
+        with en_shard(indice):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def en_todos(combinar: Callable[[list], object]):
+    """Ejecuta func en cada archivo y devuelve combinar([resultado de cada uno])."""
+
+    def decorador(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            total = total_shards()
+            if total == 1:
+                return func(*args, **kwargs)
+            return _en_cada_shard(func, total, combinar, args, kwargs)
+
+        return wrapper
+
+    return decorador
+
+
+def _en_cada_shard(func, total: int, combinar: Callable[[list], object], args, kwargs):
+    resultados = []
+    for indice in range(total):
+        with en_shard(indice):
+            resultados.append(func(*args, **kwargs))
+    return combinar(resultados)
+
+
+# Formas de unir los resultados de en_todos
+
+def sumar(resultados: list) -> int:
+    return sum(resultados)
+
+
+def concatenar(resultados: list) -> list:
+    return list(itertools.chain.from_iterable(resultados))
+
+
+def unir_ordenados(resultados: list) -> list:
+    """Listas ya ordenadas en cada archivo → una sola lista ordenada."""
+    return list(heapq.merge(*resultados))
+
+
+def unir_dicts(resultados: list) -> dict:
+    unidos: dict = {}
+    for resultado in resultados:
+        unidos.update(resultado)
+    return unidos
+
+
+def unir_conjuntos(resultados: list) -> set:
+    return set().union(*resultados)
+
+
+def ninguno(resultados: list) -> None:
+    return None
@@ -0,0 +1,223 @@
+"""
+Envío de un mensaje a muchos usuarios (resumen diario) respetando los límites de Telegram.
+
+Telegram admite unos 30 mensajes por segundo en total por bot. `difundir`
+envía con varias tareas en paralelo (acotadas), pasa cada envío por un token
+bucket compartido y, si Telegram responde RetryAfter (flood control), pausa
+todos los envíos ese tiempo antes de reintentar.
+
+Cada envío que no se entrega queda en el resultado con su tipo de fallo;
+los permanentes (el usuario bloqueó el bot, el chat no existe) sirven para
+pausar al usuario y no volver a intentarlo cada día.
+"""
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import AsyncIterable, Callable, Iterable
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from src.utils import numero_env
+
+
+class LimitadorTasa:
+    """Token bucket: como mucho `por_segundo` envíos por segundo, con ráfagas de `rafaga`.
+
+    En cualquier ventana de un segundo caben `rafaga + por_segundo` envíos; por
+    eso la ráfaga por defecto es 1 y el ritmo queda uniforme.
+    """
+
+    def __init__(
+        self,
+        por_segundo: float,
+        rafaga: int | None = None,
+        reloj: Callable[[], float] = time.monotonic,
+    ):
+        self.por_segundo = por_segundo
+        self.rafaga = rafaga if rafaga is not None else 1
+        self._reloj = reloj
+        self._fichas = float(self.rafaga)
+        self._ultimo = reloj()
+        self._pausa_hasta = 0.0
+        self._lock = asyncio.Lock()
+
+    def pausar(self, segundos: float) -> None:
+        """Detiene todos los envíos `segundos` (tras un RetryAfter) y vacía el bucket."""
+        self._pausa_hasta = max(self._pausa_hasta, self._reloj() + segundos)
+        self._fichas = 0.0
+
+    async def esperar(self) -> None:
+        """Espera hasta poder hacer un envío y consume una ficha."""
+        # El lock hace que las tareas tomen fichas en orden de llegada
+        async with self._lock:
+            while True:
+                ahora = self._reloj()
+                if ahora < self._pausa_hasta:
+                    await asyncio.sleep(self._pausa_hasta - ahora)
+                    continue
+                self._fichas = min(
+                    self.rafaga, self._fichas + (ahora - self._ultimo) * self.por_segundo
+                )
+                self._ultimo = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                await asyncio.sleep((1 - self._fichas) / self.por_segundo)
+
+
+# Tipos de fallo de entrega
+FALLO_BLOQUEADO = "bloqueado"
+FALLO_CHAT_NO_ENCONTRADO = "chat_no_encontrado"
+FALLO_PETICION = "peticion_invalida"
+FALLO_RED = "red"
+FALLO_LIMITE = "limite"
+FALLO_OTRO = "otro"
+
+FALLOS_PERMANENTES = (FALLO_BLOQUEADO, FALLO_CHAT_NO_ENCONTRADO)
+
+
+@dataclass
+class FalloEntrega:
+    chat_id: int
+    tipo: str
+    detalle: str
+
+    @property
+    def permanente(self) -> bool:
+        return self.tipo in FALLOS_PERMANENTES
+
+
+def tipo_fallo(error: Exception) -> str:
+    """Tipo de fallo (FALLO_*) de una excepción al enviar."""
+    if isinstance(error, Forbidden):
+        # Bloqueó el bot, borró la cuenta o el bot no puede iniciar el chat
+        return FALLO_BLOQUEADO
+    if isinstance(error, BadRequest):
+        if "chat not found" in str(error).lower() or "user not found" in str(error).lower():
+            return FALLO_CHAT_NO_ENCONTRADO
+        return FALLO_PETICION
+    if isinstance(error, RetryAfter):
+        return FALLO_LIMITE
+    if isinstance(error, (TimedOut, NetworkError)):
+        return FALLO_RED
+    return FALLO_OTRO
+
+
+@dataclass
+class ResultadoDifusion:
+    enviados: int = 0
+    fallidos: int = 0
+    omitidos: int = 0
+    reintentos: int = 0
+    duracion_s: float = 0.0
+    fallos: list[FalloEntrega] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        texto = (
+            f"{self.enviados} enviados, {self.fallidos} fallidos, {self.omitidos} omitidos, "
+            f"{self.reintentos} reintentos en {self.duracion_s:.1f}s"
+        )
+        if self.fallos:
+            por_tipo = Counter(f.tipo for f in self.fallos)
+            texto += " (" + ", ".join(f"{tipo}: {n}" for tipo, n in por_tipo.most_common()) + ")"
+        return texto
+
+
+def _segundos(retry_after) -> float:
+    # PTB 21 da segundos (int); versiones posteriores un timedelta
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+async def _enviar(
+    bot: Bot,
+    chat_id: int,
+    texto: str,
+    limitador: LimitadorTasa,
+    resultado: ResultadoDifusion,
+    max_reintentos: int,
+) -> FalloEntrega | None:
+    """Envía un mensaje con reintentos. Retorna el fallo si no se pudo entregar."""
+    espera = 1.0
+    ultimo: Exception | None = None
+    for intento in range(max_reintentos + 1):
+        await limitador.esperar()
+        try:
+            await bot.send_message(chat_id=chat_id, text=texto)
+            return None
+        except RetryAfter as e:
+            ultimo = e
+            limitador.pausar(_segundos(e.retry_after))
+        except (Forbidden, BadRequest) as e:
+            # Bloqueó el bot, borró la cuenta o el chat no existe: reintentar no sirve
+            return FalloEntrega(chat_id, tipo_fallo(e), str(e))
+        except (TimedOut, NetworkError) as e:
+            ultimo = e
+            await asyncio.sleep(espera)
+            espera *= 2
+        if intento < max_reintentos:
+            resultado.reintentos += 1
+    return FalloEntrega(chat_id, tipo_fallo(ultimo), str(ultimo))
+
+
+async def difundir(
+    bot: Bot,
+    mensajes: Iterable[tuple[int, str | None]] | AsyncIterable[tuple[int, str | None]],
+    *,
+    concurrencia: int | None = None,
+    por_segundo: float | None = None,
+    max_reintentos: int = 3,
+) -> ResultadoDifusion:
+    """Envía cada (chat_id, texto) de `mensajes`; un texto None cuenta como omitido.
+
+    Los mensajes no entregados quedan en `resultado.fallos` con su tipo.
+
+    `mensajes` puede ser síncrono o asíncrono. `concurrencia` tareas envían a
+    la vez desde una cola acotada, así nunca hay más de unos pocos textos
+    esperando en memoria. Por defecto se leen DIFUSION_CONCURRENCIA (8) y
+    DIFUSION_MENSAJES_POR_SEGUNDO (25).
+    """
+    if concurrencia is None:
+        concurrencia = int(numero_env("DIFUSION_CONCURRENCIA", 8))
+    if por_segundo is None:
+        por_segundo = numero_env("DIFUSION_MENSAJES_POR_SEGUNDO", 25)
+    concurrencia = max(1, concurrencia)
+    limitador = LimitadorTasa(max(0.1, por_segundo))
+    resultado = ResultadoDifusion()
+    cola: asyncio.Queue[tuple[int, str | None] | None] = asyncio.Queue(maxsize=concurrencia * 2)
+    inicio = time.monotonic()
+
+    async def trabajador() -> None:
+        while (mensaje := await cola.get()) is not None:
+            chat_id, texto = mensaje
+            if texto is None:
+                resultado.omitidos += 1
+                continue
+            try:
+                fallo = await _enviar(bot, chat_id, texto, limitador, resultado, max_reintentos)
+            except Exception as e:
+                # Un error inesperado con un usuario no debe parar el resto del envío
+                fallo = FalloEntrega(chat_id, FALLO_OTRO, f"{type(e).__name__}: {e}")
+            if fallo is None:
+                resultado.enviados += 1
+            else:
+                resultado.fallidos += 1
+                resultado.fallos.append(fallo)
+
+    tareas = [asyncio.create_task(trabajador()) for _ in range(concurrencia)]
+    try:
+        if isinstance(mensajes, AsyncIterable):
+            async for mensaje in mensajes:
+                await cola.put(mensaje)
+        else:
+            for mensaje in mensajes:
+                await cola.put(mensaje)
+        for _ in tareas:
+            await cola.put(None)
+        await asyncio.gather(*tareas)
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+    resultado.duracion_s = time.monotonic() - inicio
+    return resultado
@@ -0,0 +1,221 @@
+"""
+Exportación de movimientos y presupuestos a CSV o XLSX para /exportar.
+
+Las filas llegan de la base de datos en lotes (fetchmany) y se escriben en un
+SpooledTemporaryFile: los archivos pequeños se quedan en memoria y los grandes
+pasan solos a disco, así la memoria no crece con el tamaño del historial. El
+XLSX se genera a mano (un zip con XML), sin dependencias externas.
+"""
+import csv
+import io
+import re
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator
+from xml.sax.saxutils import escape
+
+from src.database.db import iterar_presupuesto_movimientos, iterar_transacciones
+
+# A partir de este tamaño el archivo temporal pasa de memoria a disco
+_MAX_EN_MEMORIA = 1024 * 1024
+
+COLUMNAS_MOVIMIENTOS = ("id", "fecha", "cuenta", "tipo", "monto", "categoria", "cuenta_relacionada")
+COLUMNAS_PRESUPUESTOS = ("presupuesto", "id", "tipo", "monto", "categoria", "es_anual", "creada_en")
+
+FORMATOS = ("csv", "xlsx")
+
+
+@dataclass
+class Exportado:
+    """Un documento listo para enviar; el llamador debe cerrar `archivo`."""
+
+    nombre: str
+    archivo: BinaryIO
+    filas: int
+
+
+class _Seccion:
+    """Hoja o archivo de la exportación: nombre, cabecera y lotes de filas."""
+
+    def __init__(self, nombre: str, columnas: tuple[str, ...], lotes: Iterable[list[tuple]]):
+        self.nombre = nombre
+        self.columnas = columnas
+        self.lotes = lotes
+        self.filas = 0
+
+    def __iter__(self) -> Iterator[list[tuple]]:
+        for lote in self.lotes:
+            self.filas += len(lote)
+            yield lote
+
+
+def _fila_presupuesto(fila: tuple) -> tuple:
+    return fila[:5] + ("si" if fila[5] else "no",) + fila[6:]
+
+
+def _secciones(
+    user_id: int,
+    movimientos: bool,
+    presupuestos: bool,
+    cuenta_id: int | None,
+    desde: str | None,
+    hasta: str | None,
+) -> list[_Seccion]:
+    secciones = []
+    if movimientos:
+        secciones.append(_Seccion(
+            "movimientos",
+            COLUMNAS_MOVIMIENTOS,
+            iterar_transacciones(user_id, cuenta_id, desde, hasta),
+        ))
+    if presupuestos:
+        secciones.append(_Seccion(
+            "presupuestos",
+            COLUMNAS_PRESUPUESTOS,
+            ([_fila_presupuesto(f) for f in lote] for lote in iterar_presupuesto_movimientos(user_id)),
+        ))
+    return secciones
+
+
+def _escribir_csv(destino: BinaryIO, seccion: _Seccion) -> None:
+    texto = io.TextIOWrapper(destino, encoding="utf-8-sig", newline="")
+    try:
+        escritor = csv.writer(texto)
+        escritor.writerow(seccion.columnas)
+        for lote in seccion:
+            escritor.writerows(lote)
+        texto.flush()
+    finally:
+        # Sin detach(), al destruir el wrapper se cerraría el archivo temporal
+        texto.detach()
+
+
+# Caracteres de control que XML 1.0 no admite
+_NO_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    "{hojas}</Types>"
+)
+_HOJA_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    "<sheets>{hojas}</sheets></workbook>"
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    "{hojas}</Relationships>"
+)
+_HOJA_REL = (
+    '<Relationship Id="rId{n}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{n}.xml"/>'
+)
+
+
+def _celda(valor) -> str:
+    if isinstance(valor, bool):
+        valor = "si" if valor else "no"
+    if isinstance(valor, (int, float)):
+        return f"<c><v>{valor}</v></c>"
+    texto = escape(_NO_XML.sub("", str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(valores: Iterable) -> str:
+    return "<row>" + "".join(_celda(v) for v in valores) + "</row>"
+
+
+def _escribir_xlsx(destino: BinaryIO, secciones: list[_Seccion]) -> None:
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as zf:
+        for n, seccion in enumerate(secciones, start=1):
+            # force_zip64: el tamaño de la hoja no se conoce hasta terminar de escribirla
+            with zf.open(f"xl/worksheets/sheet{n}.xml", "w", force_zip64=True) as hoja:
+                hoja.write(
+                    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                    b"<sheetData>"
+                )
+                hoja.write(_fila_xml(seccion.columnas).encode())
+                for lote in seccion:
+                    hoja.write("".join(_fila_xml(f) for f in lote).encode())
+                hoja.write(b"</sheetData></worksheet>")
+        numeros = range(1, len(secciones) + 1)
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES.format(
+            hojas="".join(_HOJA_CONTENT_TYPE.format(n=n) for n in numeros)
+        ))
+        zf.writestr("_rels/.rels", _RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(hojas="".join(
+            f'<sheet name="{s.nombre}" sheetId="{n}" r:id="rId{n}"/>'
+            for n, s in zip(numeros, secciones)
+        )))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS.format(
+            hojas="".join(_HOJA_REL.format(n=n) for n in numeros)
+        ))
+
+
+def exportar(
+    user_id: int,
+    formato: str,
+    *,
+    movimientos: bool = True,
+    presupuestos: bool = False,
+    cuenta_id: int | None = None,
+    desde: str | None = None,
+    hasta: str | None = None,
+) -> list[Exportado]:
+    """Genera los documentos de la exportación (bloqueante: llamar fuera del event loop).
+
+    CSV produce un archivo por sección (movimientos, presupuestos); XLSX un solo
+    libro con una hoja por sección. `cuenta_id`, `desde` y `hasta` ('AAAA-MM-DD',
+    rango [desde, hasta)) filtran solo los movimientos. Las secciones vacías se
+    omiten; si todo está vacío retorna una lista vacía.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    secciones = _secciones(user_id, movimientos, presupuestos, cuenta_id, desde, hasta)
+    resultado: list[Exportado] = []
+    try:
+        if formato == "csv":
+            for seccion in secciones:
+                archivo = tempfile.SpooledTemporaryFile(max_size=_MAX_EN_MEMORIA)
+                resultado.append(Exportado(f"{seccion.nombre}.csv", archivo, 0))
+                _escribir_csv(archivo, seccion)
+                resultado[-1].filas = seccion.filas
+        else:
+            archivo = tempfile.SpooledTemporaryFile(max_size=_MAX_EN_MEMORIA)
+            resultado.append(Exportado("finanzas.xlsx", archivo, 0))
+            _escribir_xlsx(archivo, secciones)
+            resultado[-1].filas = sum(s.filas for s in secciones)
+    except BaseException:
+        for exportado in resultado:
+            exportado.archivo.close()
+        raise
+
+    listos = []
+    for exportado in resultado:
+        if exportado.filas:
+            exportado.archivo.seek(0)
+            listos.append(exportado)
+        else:
+            exportado.archivo.close()
+    return listos
@@ -1,5 +1,5 @@
 """Handlers del bot y ConversationHandler."""
-from telegram.ext import CallbackQueryHandler, CommandHandler, ConversationHandler, MessageHandler
+from telegram.ext import CallbackQueryHandler, CommandHandler, ConversationHandler, MessageHandler, filters
 
 from src.config import (
     CREAR_CUENTA_NOMBRE,
@@ -42,11 +42,41 @@ from src.config import (
     PRES_ELIMINAR_ID,
     CLONAR_PRES_ORIGEN,
     CLONAR_PRES_NUEVO_NOMBRE,
+    IMPORTAR_CUENTA,
+    IMPORTAR_CATEGORIA,
+    IMPORTAR_ARCHIVO,
+    EXPORTAR_CONTENIDO,
+    EXPORTAR_CUENTA,
+    EXPORTAR_DESDE,
+    EXPORTAR_HASTA,
+    EXPORTAR_FORMATO,
+    PREF_ZONA,
+    PREF_HORA,
+    ESCALAR_PRES_NOMBRE,
+    ESCALAR_PRES_PORCENTAJE,
+    FUSIONAR_PRES_ORIGEN,
+    FUSIONAR_PRES_DESTINO,
+    COMPARAR_PRES_NOMBRE,
+    COMPARAR_PRES_MES,
     TEXT,
 )
-from src.handlers import commands, cuentas, movimientos, historial, resumenes, presupuesto, categorias
+from src.handlers import (
+    commands,
+    cuentas,
+    movimientos,
+    historial,
+    resumenes,
+    presupuesto,
+    categorias,
+    importacion,
+    exportacion,
+    preferencias,
+)
 
 conv_handler = ConversationHandler(
+    # El estado se guarda en SQLite (src/persistencia.py): sobrevive a un reinicio
+    name="conversacion",
+    persistent=True,
     entry_points=[
         CommandHandler("crear_cuenta", cuentas.crear_cuenta_start),
         CommandHandler("gasto", movimientos.gasto_start),
@@ -70,8 +100,14 @@ conv_handler = ConversationHandler(
             presupuesto.editar_registro_presupuesto_start,
         ),
         CommandHandler("clonar_presupuesto", presupuesto.clonar_presupuesto_start),
+        CommandHandler("escalar_presupuesto", presupuesto.escalar_presupuesto_start),
+        CommandHandler("fusionar_presupuestos", presupuesto.fusionar_presupuestos_start),
+        CommandHandler("comparar_presupuesto", presupuesto.comparar_presupuesto_start),
         CommandHandler("agregar_categoria", categorias.agregar_categoria_start),
         CommandHandler("editar_mi_categoria", categorias.editar_mi_categoria_start),
+        CommandHandler("importar", importacion.importar_start),
+        CommandHandler("exportar", exportacion.exportar_start),
+        CommandHandler("resumen_diario", preferencias.resumen_diario_start),
     ],
     states={
         CREAR_CUENTA_NOMBRE: [MessageHandler(TEXT, cuentas.crear_cuenta_nombre)],
@@ -152,6 +188,40 @@ conv_handler = ConversationHandler(
         CAT_AGREGAR_AMBITO: [MessageHandler(TEXT, categorias.agregar_categoria_ambito)],
         CAT_EDITAR_ID: [MessageHandler(TEXT, categorias.editar_mi_categoria_id)],
         CAT_EDITAR_NOMBRE: [MessageHandler(TEXT, categorias.editar_mi_categoria_nombre)],
+        IMPORTAR_CUENTA: [
+            CallbackQueryHandler(importacion.importar_cuenta_callback, pattern=r"^imc:\d+$"),
+            MessageHandler(TEXT, importacion.importar_cuenta),
+        ],
+        IMPORTAR_CATEGORIA: [MessageHandler(TEXT, importacion.importar_categoria)],
+        IMPORTAR_ARCHIVO: [
+            MessageHandler(filters.Document.ALL, importacion.importar_archivo),
+            MessageHandler(TEXT, importacion.importar_archivo),
+        ],
+        EXPORTAR_CONTENIDO: [
+            CallbackQueryHandler(
+                exportacion.exportar_contenido_callback,
+                pattern=r"^exq:(movimientos|presupuestos|todo)$",
+            ),
+            MessageHandler(TEXT, exportacion.exportar_contenido),
+        ],
+        EXPORTAR_CUENTA: [
+            CallbackQueryHandler(exportacion.exportar_cuenta_callback, pattern=r"^exc:\d+$"),
+            MessageHandler(TEXT, exportacion.exportar_cuenta),
+        ],
+        EXPORTAR_DESDE: [MessageHandler(TEXT, exportacion.exportar_desde)],
+        EXPORTAR_HASTA: [MessageHandler(TEXT, exportacion.exportar_hasta)],
+        EXPORTAR_FORMATO: [
+            CallbackQueryHandler(exportacion.exportar_formato_callback, pattern=r"^exf:(csv|xlsx)$"),
+            MessageHandler(TEXT, exportacion.exportar_formato),
+        ],
+        PREF_ZONA: [MessageHandler(TEXT, preferencias.resumen_diario_zona)],
+        PREF_HORA: [MessageHandler(TEXT, preferencias.resumen_diario_hora)],
+        ESCALAR_PRES_NOMBRE: [MessageHandler(TEXT, presupuesto.escalar_presupuesto_nombre)],
+        ESCALAR_PRES_PORCENTAJE: [MessageHandler(TEXT, presupuesto.escalar_presupuesto_porcentaje)],
+        FUSIONAR_PRES_ORIGEN: [MessageHandler(TEXT, presupuesto.fusionar_presupuestos_origen)],
+        FUSIONAR_PRES_DESTINO: [MessageHandler(TEXT, presupuesto.fusionar_presupuestos_destino)],
+        COMPARAR_PRES_NOMBRE: [MessageHandler(TEXT, presupuesto.comparar_presupuesto_nombre)],
+        COMPARAR_PRES_MES: [MessageHandler(TEXT, presupuesto.comparar_presupuesto_mes)],
     },
     fallbacks=[
         CommandHandler("cancel", commands.cmd_cancel),
@@ -177,7 +247,13 @@ conv_handler = ConversationHandler(
             presupuesto.editar_registro_presupuesto_start,
         ),
         CommandHandler("clonar_presupuesto", presupuesto.clonar_presupuesto_start),
+        CommandHandler("escalar_presupuesto", presupuesto.escalar_presupuesto_start),
+        CommandHandler("fusionar_presupuestos", presupuesto.fusionar_presupuestos_start),
+        CommandHandler("comparar_presupuesto", presupuesto.comparar_presupuesto_start),
         CommandHandler("agregar_categoria", categorias.agregar_categoria_start),
         CommandHandler("editar_mi_categoria", categorias.editar_mi_categoria_start),
+        CommandHandler("importar", importacion.importar_start),
+        CommandHandler("exportar", exportacion.exportar_start),
+        CommandHandler("resumen_diario", preferencias.resumen_diario_start),
     ],
 )
@@ -1,6 +1,8 @@
 """Teclado en línea para elegir una categoría definida por el usuario."""
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+from src.database.aio import derivado_de_categorias
+
 
 def texto_elegir_categoria(categorias: list[dict]) -> str:
     lineas = ["Elige categoría con los botones o escribe el nombre exacto:\n"]
@@ -25,3 +27,21 @@ def keyboard_categorias(categorias: list[dict], prefix: str) -> InlineKeyboardMa
     if row:
         rows.append(row)
     return InlineKeyboardMarkup(rows)
+
+
+async def teclado_categorias(
+    user_id: int, movimiento_tipo: str, prefix: str
+) -> tuple[str, InlineKeyboardMarkup] | None:
+    """Texto y teclado para elegir categoría de gasto o ingreso; None si no hay ninguna.
+
+    Memorizado por usuario, tipo y prefijo junto a la caché de categorías.
+    """
+    def construir(categorias: list[dict]) -> tuple[str, InlineKeyboardMarkup] | None:
+        cats = [c for c in categorias if c["ambito"] in (movimiento_tipo, "ambos")]
+        if not cats:
+            return None
+        return texto_elegir_categoria(cats), keyboard_categorias(cats, prefix)
+
+    return await derivado_de_categorias(
+        user_id, ("teclado", movimiento_tipo, prefix), construir
+    )
@@ -9,15 +9,15 @@ from src.config import (
     CAT_EDITAR_NOMBRE,
     END,
 )
-from src.database import (
+from src.database.aio import (
     agregar_categoria_usuario,
     listar_categorias_usuario,
     renombrar_categoria_usuario,
 )
 
 
-def texto_mis_categorias(user_id: int) -> str:
-    cats = listar_categorias_usuario(user_id)
+async def texto_mis_categorias(user_id: int) -> str:
+    cats = await listar_categorias_usuario(user_id)
     if not cats:
         return (
             "📂 Aún no tienes categorías.\n\n"
@@ -33,7 +33,7 @@ def texto_mis_categorias(user_id: int) -> str:
 
 async def cmd_mis_categorias(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    await update.message.reply_text(texto_mis_categorias(user_id))
+    await update.message.reply_text(await texto_mis_categorias(user_id))
 
 
 def _parse_ambito(text: str) -> str | None:
@@ -77,7 +77,7 @@ async def agregar_categoria_ambito(update: Update, context: ContextTypes.DEFAULT
         return CAT_AGREGAR_AMBITO
     user_id = update.effective_user.id
     nombre = context.user_data.get("cat_nuevo_nombre", "")
-    exito, mensaje = agregar_categoria_usuario(user_id, nombre, ambito)
+    exito, mensaje = await agregar_categoria_usuario(user_id, nombre, ambito)
     await update.message.reply_text(mensaje)
     context.user_data.pop("cat_nuevo_nombre", None)
     return END
@@ -108,7 +108,7 @@ async def editar_mi_categoria_nombre(update: Update, context: ContextTypes.DEFAU
     if cid is None:
         await update.message.reply_text("Algo salió mal. Usa /edita_mi_categoria de nuevo.")
         return END
-    exito, mensaje = renombrar_categoria_usuario(user_id, cid, nuevo)
+    exito, mensaje = await renombrar_categoria_usuario(user_id, cid, nuevo)
     await update.message.reply_text(mensaje)
     context.user_data.pop("cat_edit_id", None)
     return END
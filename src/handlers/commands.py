@@ -1,9 +1,12 @@
 """Comandos simples sin conversación."""
+from typing import Iterator
+
 from telegram import Update
 from telegram.ext import ContextTypes
 
 from src.config import END
-from src.database import listar_cuentas, obtener_resumen
+from src.database.aio import listar_cuentas, obtener_resumen
+from src.database.db import iterar_resumenes
 
 
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -39,8 +42,11 @@ Los comandos piden cada parámetro <b>paso a paso</b>. Para parámetros opcional
 
 /ajustar — Elige cuenta con botones (o nombre), luego saldo deseado (registro [ajuste])
 
+/importar — Cuenta, categoría por defecto (null = sin_categoria) y luego envía un archivo CSV u OFX con tus movimientos
+/exportar — Movimientos, presupuestos o todo; cuenta (null = todas), desde y hasta (AAAA-MM-DD o null) y formato CSV o XLSX
+
 <b>Historial</b>
-/registros — Elige cuenta con botones (o escribe el nombre)
+/registros — Elige cuenta con botones (o escribe el nombre). Muestra 25 por página: ◀ / ▶ para moverte y botones para filtrar por tipo o categoría
 
 /editar — ID, monto (null = no cambiar), categoría (null = no cambiar; si cambias, debe estar en /mis_categorias)
 
@@ -53,6 +59,8 @@ Los comandos piden cada parámetro <b>paso a paso</b>. Para parámetros opcional
 
 /resumen_mes — Te pedirá: año (null = últimos 12 meses), mes (null = todos)
 
+/resumen_diario — Zona horaria (ej: America/Mexico_City) y hora HH:MM del resumen automático diario; «no» lo desactiva (null = no cambiar)
+
 <b>Presupuesto</b> (varios por nombre; no afecta cuentas ni transacciones reales)
 /presupuestos — Lista nombres, #id y cantidad de líneas
 
@@ -62,10 +70,16 @@ Los comandos piden cada parámetro <b>paso a paso</b>. Para parámetros opcional
 
 /resumen_presupuesto — Nombre del presupuesto o «todos» para ver todos; líneas #id, totales y balance
 
-/eliminar_registro_presupuesto — ID de la línea (# único entre presupuestos)
+/eliminar_registro_presupuesto — ID de la línea (# único entre presupuestos); varios separados por comas
 
 /clonar_presupuesto — Presupuesto origen (nombre o #id), luego nombre del presupuesto nuevo
 
+/escalar_presupuesto — Presupuesto (nombre o #id) y porcentaje (ej: 10 o -5) que se aplica a todas sus líneas
+
+/fusionar_presupuestos — Presupuesto origen y destino (nombre o #id); las líneas pasan al destino y el origen se borra
+
+/comparar_presupuesto — Presupuesto (nombre o #id) y mes (MM/AAAA o null = actual, meses en UTC); planificado contra gastos e ingresos reales por categoría
+
 /editar_registro_presupuesto — ID, monto y/o categoría válida en /mis_categorias (null = no cambiar)
 
 <b>Otros</b>
@@ -84,7 +98,7 @@ async def cmd_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 async def cmd_cuentas(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    cuentas = listar_cuentas(user_id)
+    cuentas = await listar_cuentas(user_id)
     if not cuentas:
         await update.message.reply_text("No tienes ninguna cuenta. Usa /crear_cuenta para crear una.")
         return
@@ -95,9 +109,23 @@ async def cmd_cuentas(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     await update.message.reply_text("\n".join(lineas))
 
 
-def formatear_resumen(user_id: int) -> str | None:
+async def formatear_resumen(user_id: int) -> str | None:
     """Genera el texto del resumen para un usuario. Retorna None si no tiene cuentas."""
-    resumen = obtener_resumen(user_id)
+    return texto_resumen(await obtener_resumen(user_id))
+
+
+def resumenes_diarios(user_ids: list[int] | None = None) -> Iterator[tuple[int, str]]:
+    """(user_id, texto) del resumen de cada usuario con cuentas (o solo de `user_ids`).
+
+    Una sola consulta en streaming (iterar_resumenes) en lugar de una por
+    usuario. Lee la base al recorrerse: consumirlo fuera del event loop.
+    """
+    for user_id, resumen in iterar_resumenes(user_ids=user_ids):
+        yield user_id, texto_resumen(resumen)
+
+
+def texto_resumen(resumen: dict) -> str | None:
+    """Texto del resumen de obtener_resumen / iterar_resumenes; None si no hay cuentas."""
     cuentas = resumen["cuentas"]
     if not cuentas:
         return None
@@ -114,7 +142,7 @@ def formatear_resumen(user_id: int) -> str | None:
 
 async def cmd_resumen(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    texto = formatear_resumen(user_id)
+    texto = await formatear_resumen(user_id)
     if texto is None:
         await update.message.reply_text("No tienes ninguna cuenta. Usa /crear_cuenta para crear una.")
         return
@@ -1,6 +1,8 @@
 """Teclado en línea para elegir una cuenta."""
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+from src.database.aio import derivado_de_cuentas
+
 
 def keyboard_cuentas(
     cuentas: list[dict], prefix: str, *, excluir_id: int | None = None
@@ -19,3 +21,19 @@ def keyboard_cuentas(
     if row:
         rows.append(row)
     return InlineKeyboardMarkup(rows)
+
+
+async def teclado_cuentas(
+    user_id: int, prefix: str, *, excluir_id: int | None = None
+) -> tuple[int, InlineKeyboardMarkup]:
+    """(número de cuentas en el teclado, teclado) de las cuentas del usuario.
+
+    Se memoriza por usuario, prefijo y excluir_id junto a los nombres de sus
+    cuentas, así que solo se vuelve a construir cuando el usuario crea una
+    cuenta (los saldos no aparecen en el teclado).
+    """
+    def construir(cuentas: list[dict]) -> tuple[int, InlineKeyboardMarkup]:
+        n = sum(1 for c in cuentas if c["id"] != excluir_id)
+        return n, keyboard_cuentas(cuentas, prefix, excluir_id=excluir_id)
+
+    return await derivado_de_cuentas(user_id, ("teclado", prefix, excluir_id), construir)
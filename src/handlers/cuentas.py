@@ -3,7 +3,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from src.config import CREAR_CUENTA_NOMBRE, CREAR_CUENTA_TIPO, END
-from src.database import crear_cuenta
+from src.database.aio import crear_cuenta
 
 
 async def crear_cuenta_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -24,6 +24,6 @@ async def crear_cuenta_tipo(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return CREAR_CUENTA_TIPO
     nombre = context.user_data["crear_cuenta_nombre"]
     user_id = update.effective_user.id
-    exito, mensaje = crear_cuenta(user_id, nombre, tipo)
+    exito, mensaje = await crear_cuenta(user_id, nombre, tipo)
     await update.message.reply_text(mensaje)
     return END
@@ -0,0 +1,207 @@
+"""Flujo /exportar: movimientos y presupuestos a un archivo CSV o XLSX."""
+import re
+from datetime import date, timedelta
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import ContextTypes
+
+from src.config import (
+    EXPORTAR_CONTENIDO,
+    EXPORTAR_CUENTA,
+    EXPORTAR_DESDE,
+    EXPORTAR_HASTA,
+    EXPORTAR_FORMATO,
+    END,
+)
+from src.database.aio import ejecutar, listar_cuentas, obtener_cuenta_por_id, obtener_cuenta_por_nombre
+from src.exportacion import FORMATOS, exportar
+from src.handlers.cuenta_inline import keyboard_cuentas
+from src.utils import is_null
+
+_EXPORTAR_CONTENIDO_CB = re.compile(r"^exq:(movimientos|presupuestos|todo)$")
+_EXPORTAR_CUENTA_CB = re.compile(r"^exc:(\d+)$")
+_EXPORTAR_FORMATO_CB = re.compile(r"^exf:(csv|xlsx)$")
+
+_CONTENIDOS = ("movimientos", "presupuestos", "todo")
+
+
+def _keyboard_contenido() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("Movimientos", callback_data="exq:movimientos"),
+            InlineKeyboardButton("Presupuestos", callback_data="exq:presupuestos"),
+        ],
+        [InlineKeyboardButton("Todo", callback_data="exq:todo")],
+    ])
+
+
+def _keyboard_formato() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(f.upper(), callback_data=f"exf:{f}") for f in FORMATOS]
+    ])
+
+
+def _parse_fecha(texto: str) -> date | None:
+    try:
+        return date.fromisoformat(texto.strip())
+    except ValueError:
+        return None
+
+
+async def exportar_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    for clave in ("exportar_contenido", "exportar_cuenta_id", "exportar_desde", "exportar_hasta"):
+        context.user_data.pop(clave, None)
+    await update.message.reply_text(
+        "¿Qué quieres exportar? (movimientos, presupuestos o todo)",
+        reply_markup=_keyboard_contenido(),
+    )
+    return EXPORTAR_CONTENIDO
+
+
+async def _elegir_contenido(message, context: ContextTypes.DEFAULT_TYPE, user_id: int, contenido: str) -> int:
+    context.user_data["exportar_contenido"] = contenido
+    if contenido == "presupuestos":
+        await message.reply_text("¿Formato? (csv o xlsx)", reply_markup=_keyboard_formato())
+        return EXPORTAR_FORMATO
+    cuentas = await listar_cuentas(user_id)
+    teclado = keyboard_cuentas(cuentas, "exc")
+    teclado = InlineKeyboardMarkup(
+        list(teclado.inline_keyboard)
+        + [[InlineKeyboardButton("Todas las cuentas", callback_data="exc:0")]]
+    )
+    await message.reply_text(
+        "¿De qué cuenta? (botones, nombre, o null para todas)", reply_markup=teclado
+    )
+    return EXPORTAR_CUENTA
+
+
+async def exportar_contenido_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    m = _EXPORTAR_CONTENIDO_CB.match(query.data or "")
+    await query.answer()
+    if not m:
+        return EXPORTAR_CONTENIDO
+    await query.edit_message_reply_markup(None)
+    return await _elegir_contenido(query.message, context, update.effective_user.id, m.group(1))
+
+
+async def exportar_contenido(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip().lower()
+    if text not in _CONTENIDOS:
+        await update.message.reply_text("Escribe movimientos, presupuestos o todo.")
+        return EXPORTAR_CONTENIDO
+    return await _elegir_contenido(update.message, context, update.effective_user.id, text)
+
+
+async def _pedir_desde(message, context: ContextTypes.DEFAULT_TYPE, cuenta: dict | None) -> int:
+    context.user_data["exportar_cuenta_id"] = cuenta["id"] if cuenta else None
+    nombre = cuenta["nombre"] if cuenta else "todas"
+    await message.reply_text(
+        f"Cuenta: {nombre}\n\n¿Desde qué fecha? (AAAA-MM-DD, o null para el inicio)"
+    )
+    return EXPORTAR_DESDE
+
+
+async def exportar_cuenta_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    m = _EXPORTAR_CUENTA_CB.match(query.data or "")
+    if not m:
+        await query.answer()
+        return EXPORTAR_CUENTA
+    cuenta = None
+    if m.group(1) != "0":
+        cuenta = await obtener_cuenta_por_id(update.effective_user.id, int(m.group(1)))
+        if not cuenta:
+            await query.answer("Esa cuenta ya no existe. Usa /exportar de nuevo.", show_alert=True)
+            return EXPORTAR_CUENTA
+    await query.answer()
+    await query.edit_message_reply_markup(None)
+    return await _pedir_desde(query.message, context, cuenta)
+
+
+async def exportar_cuenta(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip().lower()
+    cuenta = None
+    if not is_null(text):
+        cuenta = await obtener_cuenta_por_nombre(update.effective_user.id, text)
+        if not cuenta:
+            await update.message.reply_text(f"No se encontró la cuenta '{text}'. Escribe otro nombre o null.")
+            return EXPORTAR_CUENTA
+    return await _pedir_desde(update.message, context, cuenta)
+
+
+async def exportar_desde(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip()
+    desde = None
+    if not is_null(text):
+        desde = _parse_fecha(text)
+        if desde is None:
+            await update.message.reply_text("Fecha inválida. Usa AAAA-MM-DD (ej: 2025-01-31) o null.")
+            return EXPORTAR_DESDE
+    context.user_data["exportar_desde"] = desde.isoformat() if desde else None
+    await update.message.reply_text("¿Hasta qué fecha, incluida? (AAAA-MM-DD, o null para hoy)")
+    return EXPORTAR_HASTA
+
+
+async def exportar_hasta(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip()
+    hasta = None
+    if not is_null(text):
+        hasta = _parse_fecha(text)
+        if hasta is None:
+            await update.message.reply_text("Fecha inválida. Usa AAAA-MM-DD (ej: 2025-12-31) o null.")
+            return EXPORTAR_HASTA
+        desde = context.user_data.get("exportar_desde")
+        if desde and hasta.isoformat() < desde:
+            await update.message.reply_text("La fecha final es anterior a la inicial. Escribe otra.")
+            return EXPORTAR_HASTA
+    # El día final entra completo: el límite es el inicio del día siguiente
+    context.user_data["exportar_hasta"] = (hasta + timedelta(days=1)).isoformat() if hasta else None
+    await update.message.reply_text("¿Formato? (csv o xlsx)", reply_markup=_keyboard_formato())
+    return EXPORTAR_FORMATO
+
+
+async def _exportar(message, context: ContextTypes.DEFAULT_TYPE, user_id: int, formato: str) -> int:
+    contenido = context.user_data.get("exportar_contenido", "movimientos")
+    await message.reply_text("⏳ Generando archivo…")
+    # La consulta y la escritura del archivo son bloqueantes: van al pool de lectura
+    documentos = await ejecutar(
+        exportar,
+        user_id,
+        formato,
+        movimientos=contenido in ("movimientos", "todo"),
+        presupuestos=contenido in ("presupuestos", "todo"),
+        cuenta_id=context.user_data.get("exportar_cuenta_id"),
+        desde=context.user_data.get("exportar_desde"),
+        hasta=context.user_data.get("exportar_hasta"),
+    )
+    if not documentos:
+        await message.reply_text("No hay datos para exportar con esos filtros.")
+        return END
+    try:
+        for doc in documentos:
+            await message.reply_document(
+                doc.archivo, filename=doc.nombre, caption=f"{doc.nombre}: {doc.filas} filas"
+            )
+    finally:
+        for doc in documentos:
+            doc.archivo.close()
+    return END
+
+
+async def exportar_formato_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    m = _EXPORTAR_FORMATO_CB.match(query.data or "")
+    await query.answer()
+    if not m:
+        return EXPORTAR_FORMATO
+    await query.edit_message_reply_markup(None)
+    return await _exportar(query.message, context, update.effective_user.id, m.group(1))
+
+
+async def exportar_formato(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip().lower()
+    if text not in FORMATOS:
+        await update.message.reply_text("Escribe csv o xlsx.")
+        return EXPORTAR_FORMATO
+    return await _exportar(update.message, context, update.effective_user.id, text)
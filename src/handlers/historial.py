@@ -1,7 +1,8 @@
 """Flujos registros, editar, eliminar."""
 import re
 
-from telegram import Update
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
 from src.config import (
@@ -12,59 +13,155 @@ from src.config import (
     ELIMINAR_ID,
     END,
 )
-from src.database import (
-    listar_cuentas,
-    listar_registros,
+from src.database.aio import (
+    listar_categorias_usuario,
+    listar_registros_pagina,
+    obtener_categoria_usuario_por_id,
     obtener_cuenta_por_id,
+    obtener_cuenta_por_nombre,
     editar_registro,
     eliminar_registro,
 )
-from src.handlers.cuenta_inline import keyboard_cuentas
+from src.handlers.categoria_inline import keyboard_categorias
+from src.handlers.cuenta_inline import teclado_cuentas
 from src.utils import is_null, parse_cantidad, formato_tipo
 
 _REGISTROS_CUENTA_CB = re.compile(r"^reg:(\d+)$")
 
+# Navegación sin estado: cada botón lleva cuenta, filtros y cursor en callback_data.
+#   rgp:<cuenta>:<tipo>:<categoria>:<a|r>:<creada_en sin separadores>:<id>  → página
+#   rgf:<cuenta>:<tipo>:<categoria>                                        → primera página
+#   rgc:<cuenta>:<tipo>                                                    → elegir categoría
+# a = más antiguos (▶), r = más recientes (◀); categoria 0 = todas.
+_REGISTROS_PAGINA_CB = re.compile(r"^rgp:(\d+):([-git]):(\d+):([ar]):(\d{14}):(\d+)$")
+_REGISTROS_FILTRO_CB = re.compile(r"^rgf:(\d+):([-git]):(\d+)$")
+_REGISTROS_CATEGORIA_CB = re.compile(r"^rgc:(\d+):([-git])$")
+REGISTROS_CALLBACK_PATTERN = r"^rg[pfc]:"
+
+REGISTROS_POR_PAGINA = 25
+_FILTROS_TIPO = {
+    "-": (None, "Todos"),
+    "g": ("gasto", "Gastos"),
+    "i": ("ingreso", "Ingresos"),
+    "t": ("transferencia", "Transf."),
+}
+
+
+def _clave_cursor(registro: dict) -> str:
+    """creada_en 'AAAA-MM-DD HH:MM:SS' → 'AAAAMMDDHHMMSS' para callback_data."""
+    return re.sub(r"\D", "", registro["creada_en"] or "")[:14].ljust(14, "0")
+
+
+def _cursor_desde_clave(clave: str, registro_id: str) -> tuple[str, int]:
+    c = clave  # AAAAMMDDHHMMSS
+    return f"{c[:4]}-{c[4:6]}-{c[6:8]} {c[8:10]}:{c[10:12]}:{c[12:]}", int(registro_id)
+
+
+def _linea_registro(r: dict) -> str:
+    fecha = r["creada_en"][:10] if r.get("creada_en") else "?"
+    tipo_str = formato_tipo(r["tipo"])
+    monto = r["monto"]
+    monto_str = f"-${monto:,.2f}" if r["tipo"] in ("gasto", "transferencia_salida") else f"+${monto:,.2f}"
+    extra = f" → {r['cuenta_relacionada']}" if r.get("cuenta_relacionada") else ""
+    cat = f" [{r.get('categoria', 'sin_categoria')}]" if r["tipo"] in ("gasto", "ingreso") else ""
+    return f"#{r['id']} | {fecha} | {tipo_str}{extra}{cat} | {monto_str}"
+
+
+def _keyboard_registros(
+    cuenta_id: int, tipo: str, categoria_id: int, categoria: str | None, pagina: dict
+) -> InlineKeyboardMarkup:
+    base = f"{cuenta_id}:{tipo}:{categoria_id}"
+    rows: list[list[InlineKeyboardButton]] = []
+    registros = pagina["registros"]
+    nav: list[InlineKeyboardButton] = []
+    if registros and pagina["hay_mas_recientes"]:
+        primero = registros[0]
+        nav.append(InlineKeyboardButton(
+            "◀", callback_data=f"rgp:{base}:r:{_clave_cursor(primero)}:{primero['id']}"
+        ))
+    if registros and pagina["hay_mas_antiguos"]:
+        ultimo = registros[-1]
+        nav.append(InlineKeyboardButton(
+            "▶", callback_data=f"rgp:{base}:a:{_clave_cursor(ultimo)}:{ultimo['id']}"
+        ))
+    if nav:
+        rows.append(nav)
+    rows.append([
+        InlineKeyboardButton(
+            f"• {etiqueta}" if clave == tipo else etiqueta,
+            # Las transferencias no tienen categoría: al elegirlas se quita el filtro
+            callback_data=f"rgf:{cuenta_id}:{clave}:{0 if clave == 't' else categoria_id}",
+        )
+        for clave, (_, etiqueta) in _FILTROS_TIPO.items()
+    ])
+    if categoria is not None:
+        rows.append([InlineKeyboardButton(
+            f"🏷 {categoria} ✕", callback_data=f"rgf:{cuenta_id}:{tipo}:0"
+        )])
+    elif tipo != "t":
+        rows.append([InlineKeyboardButton("🏷 Filtrar por categoría", callback_data=f"rgc:{cuenta_id}:{tipo}")])
+    return InlineKeyboardMarkup(rows)
+
+
+async def _pagina_registros(
+    user_id: int,
+    cuenta_id: int,
+    tipo: str = "-",
+    categoria_id: int = 0,
+    cursor: tuple[str, int] | None = None,
+    hacia_atras: bool = False,
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Texto y botones de una página de /registros."""
+    categoria = None
+    if categoria_id:
+        cat = await obtener_categoria_usuario_por_id(user_id, categoria_id)
+        if not cat:
+            return "Esa categoría ya no existe. Usa /registros de nuevo.", None
+        categoria = cat["nombre"]
+    pagina = await listar_registros_pagina(
+        user_id,
+        cuenta_id,
+        limite=REGISTROS_POR_PAGINA,
+        cursor=cursor,
+        hacia_atras=hacia_atras,
+        tipo=_FILTROS_TIPO[tipo][0],
+        categoria=categoria,
+    )
+    if pagina is None:
+        return "Esa cuenta ya no existe. Usa /registros de nuevo.", None
+
+    nombre = pagina["cuenta"]
+    filtros = []
+    if tipo != "-":
+        filtros.append(_FILTROS_TIPO[tipo][1].lower())
+    if categoria is not None:
+        filtros.append(f"[{categoria}]")
+    sufijo = f" ({' · '.join(filtros)})" if filtros else ""
+    if not pagina["registros"]:
+        texto = f"No hay registros{sufijo} en la cuenta '{nombre}'."
+    else:
+        lineas = [f"📜 Registros de {nombre}{sufijo}:\n"]
+        lineas.extend(_linea_registro(r) for r in pagina["registros"])
+        lineas.append("\nUsa /editar o /eliminar para modificar o borrar.")
+        texto = "\n".join(lineas)
+    return texto, _keyboard_registros(cuenta_id, tipo, categoria_id, categoria, pagina)
+
 
 async def registros_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
-    cuentas = listar_cuentas(user_id)
-    if not cuentas:
+    n_cuentas, teclado = await teclado_cuentas(user_id, "reg")
+    if not n_cuentas:
         await update.message.reply_text(
             "No tienes cuentas. Crea una con /crear_cuenta y vuelve a usar /registros."
         )
         return END
     await update.message.reply_text(
         "Elige la cuenta (o escribe el nombre):",
-        reply_markup=keyboard_cuentas(cuentas, "reg"),
+        reply_markup=teclado,
     )
     return REGISTROS_CUENTA
 
 
-async def _enviar_registros_texto(message, user_id: int, nombre_cuenta: str) -> None:
-    registros, nombre = listar_registros(user_id, nombre_cuenta)
-    if registros is None:
-        await message.reply_text(nombre)
-        return
-    if not registros:
-        await message.reply_text(f"No hay registros en la cuenta '{nombre}'.")
-        return
-    LIMITE = 25
-    mostrar = registros[:LIMITE]
-    lineas = [f"📜 Registros de {nombre}:\n"]
-    for r in mostrar:
-        fecha = r["creada_en"][:10] if r.get("creada_en") else "?"
-        tipo_str = formato_tipo(r["tipo"])
-        monto = r["monto"]
-        monto_str = f"-${monto:,.2f}" if r["tipo"] in ("gasto", "transferencia_salida") else f"+${monto:,.2f}"
-        extra = f" → {r['cuenta_relacionada']}" if r.get("cuenta_relacionada") else ""
-        cat = f" [{r.get('categoria', 'sin_categoria')}]" if r["tipo"] in ("gasto", "ingreso") else ""
-        lineas.append(f"#{r['id']} | {fecha} | {tipo_str}{extra}{cat} | {monto_str}")
-    if len(registros) > LIMITE:
-        lineas.append(f"\n... y {len(registros) - LIMITE} más.")
-    lineas.append("Usa /editar o /eliminar para modificar o borrar.")
-    await message.reply_text("\n".join(lineas))
-
-
 async def registros_cuenta_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     m = _REGISTROS_CUENTA_CB.match(query.data or "")
@@ -73,23 +170,82 @@ async def registros_cuenta_callback(update: Update, context: ContextTypes.DEFAUL
         return REGISTROS_CUENTA
     cuenta_id = int(m.group(1))
     user_id = update.effective_user.id
-    cuenta = obtener_cuenta_por_id(user_id, cuenta_id)
+    cuenta = await obtener_cuenta_por_id(user_id, cuenta_id)
     if not cuenta:
         await query.answer("Esa cuenta ya no existe. Usa /registros de nuevo.", show_alert=True)
         return REGISTROS_CUENTA
     await query.answer()
     await query.edit_message_text(f"Cuenta: {cuenta['nombre']}")
-    await _enviar_registros_texto(query.message, user_id, cuenta["nombre"].strip().lower())
+    texto, teclado = await _pagina_registros(user_id, cuenta_id)
+    await query.message.reply_text(texto, reply_markup=teclado)
     return END
 
 
 async def registros_cuenta(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
     nombre_cuenta = update.message.text.strip().lower()
-    await _enviar_registros_texto(update.message, user_id, nombre_cuenta)
+    cuenta = await obtener_cuenta_por_nombre(user_id, nombre_cuenta)
+    if not cuenta:
+        await update.message.reply_text(f"No se encontró la cuenta '{nombre_cuenta}'.")
+        return END
+    texto, teclado = await _pagina_registros(user_id, cuenta["id"])
+    await update.message.reply_text(texto, reply_markup=teclado)
     return END
 
 
+async def registros_pagina_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Botones ◀ / ▶ y filtros de /registros: editan el mismo mensaje."""
+    query = update.callback_query
+    data = query.data or ""
+    user_id = update.effective_user.id
+
+    m = _REGISTROS_CATEGORIA_CB.match(data)
+    if m:
+        cuenta_id, tipo = int(m.group(1)), m.group(2)
+        categorias = await listar_categorias_usuario(user_id)
+        if tipo in ("g", "i"):
+            ambito = _FILTROS_TIPO[tipo][0]
+            categorias = [c for c in categorias if c["ambito"] in (ambito, "ambos")]
+        if not categorias:
+            await query.answer("No tienes categorías para filtrar. Usa /agregar_categoria.", show_alert=True)
+            return
+        await query.answer()
+        teclado = keyboard_categorias(categorias, f"rgf:{cuenta_id}:{tipo}")
+        volver = [InlineKeyboardButton("Todas", callback_data=f"rgf:{cuenta_id}:{tipo}:0")]
+        await query.edit_message_text(
+            "Elige la categoría a mostrar:",
+            reply_markup=InlineKeyboardMarkup([*teclado.inline_keyboard, volver]),
+        )
+        return
+
+    m = _REGISTROS_FILTRO_CB.match(data)
+    if m:
+        cuenta_id, tipo, categoria_id = int(m.group(1)), m.group(2), int(m.group(3))
+        texto, teclado = await _pagina_registros(user_id, cuenta_id, tipo, categoria_id)
+    else:
+        m = _REGISTROS_PAGINA_CB.match(data)
+        if not m:
+            await query.answer()
+            return
+        cuenta_id, tipo, categoria_id = int(m.group(1)), m.group(2), int(m.group(3))
+        texto, teclado = await _pagina_registros(
+            user_id,
+            cuenta_id,
+            tipo,
+            categoria_id,
+            cursor=_cursor_desde_clave(m.group(5), m.group(6)),
+            hacia_atras=m.group(4) == "r",
+        )
+
+    await query.answer()
+    try:
+        await query.edit_message_text(texto, reply_markup=teclado)
+    except BadRequest as e:
+        # Pulsar el filtro ya activo no cambia el mensaje
+        if "not modified" not in str(e).lower():
+            raise
+
+
 async def editar_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await update.message.reply_text("¿ID del registro? (usa /registros para ver los IDs)")
     return EDITAR_ID
@@ -131,7 +287,7 @@ async def editar_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         return END
     user_id = update.effective_user.id
     transaccion_id = context.user_data["editar_id"]
-    exito, mensaje = editar_registro(user_id, transaccion_id, monto=monto, categoria=categoria)
+    exito, mensaje = await editar_registro(user_id, transaccion_id, monto=monto, categoria=categoria)
     await update.message.reply_text(mensaje)
     return END
 
@@ -148,6 +304,6 @@ async def eliminar_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         await update.message.reply_text("ID inválido. Escribe un número.")
         return ELIMINAR_ID
     user_id = update.effective_user.id
-    exito, mensaje = eliminar_registro(user_id, transaccion_id)
+    exito, mensaje = await eliminar_registro(user_id, transaccion_id)
     await update.message.reply_text(mensaje)
     return END
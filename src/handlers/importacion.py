@@ -0,0 +1,130 @@
+"""Flujo /importar: movimientos desde un archivo CSV u OFX."""
+import re
+import tempfile
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from src.config import IMPORTAR_CUENTA, IMPORTAR_CATEGORIA, IMPORTAR_ARCHIVO, END
+from src.database.aio import (
+    importar_movimientos,
+    listar_categorias_usuario,
+    obtener_cuenta_por_id,
+    obtener_cuenta_por_nombre,
+)
+from src.handlers.cuenta_inline import teclado_cuentas
+from src.importacion import es_ofx, leer_csv, leer_ofx
+from src.utils import is_null
+
+_IMPORTAR_CUENTA_CB = re.compile(r"^imc:(\d+)$")
+
+# Límite de descarga de archivos de la Bot API
+_TAMANO_MAXIMO = 20 * 1024 * 1024
+
+_INSTRUCCIONES_ARCHIVO = (
+    "Envía el archivo como documento:\n\n"
+    "• CSV con cabecera: columnas «fecha» y «monto» (obligatorias), «tipo» y «categoria» (opcionales). "
+    "Separador , ; o tabulador. Sin columna tipo, monto negativo = gasto y positivo = ingreso. "
+    "Fechas AAAA-MM-DD o DD/MM/AAAA.\n"
+    "• OFX/QFX: el extracto que exporta tu banco.\n\n"
+    "/cancel para salir."
+)
+
+
+async def importar_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    user_id = update.effective_user.id
+    n_cuentas, teclado = await teclado_cuentas(user_id, "imc")
+    if not n_cuentas:
+        await update.message.reply_text(
+            "No tienes cuentas. Crea una con /crear_cuenta y vuelve a usar /importar."
+        )
+        return END
+    await update.message.reply_text(
+        "¿En qué cuenta importo los movimientos? (botones o nombre)",
+        reply_markup=teclado,
+    )
+    return IMPORTAR_CUENTA
+
+
+async def _pedir_categoria(message, context: ContextTypes.DEFAULT_TYPE, cuenta: dict) -> int:
+    context.user_data["importar_cuenta_id"] = cuenta["id"]
+    await message.reply_text(
+        f"Cuenta: {cuenta['nombre']}\n\n"
+        "Categoría para las filas sin categoría o con una que no está en /mis_categorias "
+        "(nombre, o null para [sin_categoria]):"
+    )
+    return IMPORTAR_CATEGORIA
+
+
+async def importar_cuenta_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    m = _IMPORTAR_CUENTA_CB.match(query.data or "")
+    if not m:
+        await query.answer()
+        return IMPORTAR_CUENTA
+    cuenta = await obtener_cuenta_por_id(update.effective_user.id, int(m.group(1)))
+    if not cuenta:
+        await query.answer("Esa cuenta ya no existe. Usa /importar de nuevo.", show_alert=True)
+        return IMPORTAR_CUENTA
+    await query.answer()
+    await query.edit_message_reply_markup(None)
+    return await _pedir_categoria(query.message, context, cuenta)
+
+
+async def importar_cuenta(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    nombre = update.message.text.strip().lower()
+    cuenta = await obtener_cuenta_por_nombre(update.effective_user.id, nombre)
+    if not cuenta:
+        await update.message.reply_text(f"No se encontró la cuenta '{nombre}'. Escribe otro nombre.")
+        return IMPORTAR_CUENTA
+    return await _pedir_categoria(update.message, context, cuenta)
+
+
+async def importar_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip().lower()
+    if is_null(text):
+        context.user_data["importar_categoria"] = None
+    else:
+        nombres = {c["nombre"] for c in await listar_categorias_usuario(update.effective_user.id)}
+        if text not in nombres:
+            await update.message.reply_text(
+                "Esa categoría no está en /mis_categorias. Escribe otra o null."
+            )
+            return IMPORTAR_CATEGORIA
+        context.user_data["importar_categoria"] = text
+    await update.message.reply_text(_INSTRUCCIONES_ARCHIVO)
+    return IMPORTAR_ARCHIVO
+
+
+async def importar_archivo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    documento = update.message.document
+    if documento is None:
+        await update.message.reply_text("Envía el archivo como documento (📎), o /cancel.")
+        return IMPORTAR_ARCHIVO
+    if documento.file_size and documento.file_size > _TAMANO_MAXIMO:
+        await update.message.reply_text("El archivo supera los 20 MB que permite Telegram. Divídelo en partes.")
+        return IMPORTAR_ARCHIVO
+
+    await update.message.reply_text("⏳ Importando…")
+    errores: list[str] = []
+    with tempfile.TemporaryFile() as tmp:
+        archivo = await documento.get_file()
+        await archivo.download_to_memory(out=tmp)
+        tmp.seek(0)
+        nombre = (documento.file_name or "").lower()
+        ofx = nombre.endswith((".ofx", ".qfx")) or es_ofx(tmp.read(1024))
+        tmp.seek(0)
+        lector = leer_ofx(tmp, errores) if ofx else leer_csv(tmp, errores)
+        # El archivo se lee por partes dentro del hilo escritor, en una sola transacción
+        # (con el lock de escritura tomado: ver importar_movimientos)
+        _, mensaje = await importar_movimientos(
+            update.effective_user.id,
+            context.user_data["importar_cuenta_id"],
+            lector,
+            context.user_data.get("importar_categoria"),
+        )
+
+    if errores:
+        mensaje += "\n\n⚠️ Filas omitidas:\n" + "\n".join(errores)
+    await update.message.reply_text(mensaje)
+    return END
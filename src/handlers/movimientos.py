@@ -18,20 +18,15 @@ from src.config import (
     AJUSTAR_MONTO,
     END,
 )
-from src.database import (
-    categoria_permitida_para_movimiento,
-    listar_categorias_para_movimiento,
-    listar_cuentas,
-    obtener_categoria_usuario_por_id,
+from src.database.aio import (
     obtener_cuenta_por_id,
     obtener_cuenta_por_nombre,
-    registrar_gasto,
-    registrar_ingreso,
+    registrar_movimiento,
     registrar_ajuste_saldo,
     transferir,
 )
-from src.handlers.categoria_inline import keyboard_categorias, texto_elegir_categoria
-from src.handlers.cuenta_inline import keyboard_cuentas
+from src.handlers.categoria_inline import teclado_categorias
+from src.handlers.cuenta_inline import teclado_cuentas
 from src.utils import parse_cantidad
 
 _GASTO_CUENTA_CB = re.compile(r"^gc:(\d+)$")
@@ -43,17 +38,22 @@ _GASTO_CAT_CB = re.compile(r"^cg:(\d+)$")
 _INGRESO_CAT_CB = re.compile(r"^ci:(\d+)$")
 
 
+async def _cuenta_perdida(user_id: int, cuenta_id: int) -> bool:
+    """True si la cuenta elegida ya no existe: elegir otra categoría no arregla ese fallo."""
+    return await obtener_cuenta_por_id(user_id, cuenta_id) is None
+
+
 async def gasto_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
-    cuentas = listar_cuentas(user_id)
-    if not cuentas:
+    n_cuentas, teclado = await teclado_cuentas(user_id, "gc")
+    if not n_cuentas:
         await update.message.reply_text(
             "No tienes cuentas. Crea una con /crear_cuenta y vuelve a usar /gasto."
         )
         return END
     await update.message.reply_text(
         "Elige la cuenta (o escribe el nombre si prefieres):",
-        reply_markup=keyboard_cuentas(cuentas, "gc"),
+        reply_markup=teclado,
     )
     return GASTO_CUENTA
 
@@ -66,12 +66,12 @@ async def gasto_cuenta_callback(update: Update, context: ContextTypes.DEFAULT_TY
         return GASTO_CUENTA
     cuenta_id = int(m.group(1))
     user_id = update.effective_user.id
-    cuenta = obtener_cuenta_por_id(user_id, cuenta_id)
+    cuenta = await obtener_cuenta_por_id(user_id, cuenta_id)
     if not cuenta:
         await query.answer("Esa cuenta ya no existe. Usa /gasto de nuevo.", show_alert=True)
         return GASTO_CUENTA
     await query.answer()
-    context.user_data["gasto_cuenta"] = cuenta["nombre"].strip().lower()
+    context.user_data["gasto_cuenta_id"] = cuenta["id"]
     await query.edit_message_text(
         f"Cuenta: {cuenta['nombre']}\n\n¿Monto?"
     )
@@ -79,7 +79,14 @@ async def gasto_cuenta_callback(update: Update, context: ContextTypes.DEFAULT_TY
 
 
 async def gasto_cuenta(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    context.user_data["gasto_cuenta"] = update.message.text.strip().lower()
+    nombre = update.message.text.strip().lower()
+    cuenta = await obtener_cuenta_por_nombre(update.effective_user.id, nombre)
+    if not cuenta:
+        await update.message.reply_text(
+            f"No se encontró la cuenta '{nombre}'. Escribe otro nombre o usa los botones."
+        )
+        return GASTO_CUENTA
+    context.user_data["gasto_cuenta_id"] = cuenta["id"]
     await update.message.reply_text("¿Monto?")
     return GASTO_MONTO
 
@@ -91,17 +98,15 @@ async def gasto_monto(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         return GASTO_MONTO
     context.user_data["gasto_monto"] = monto
     user_id = update.effective_user.id
-    cats = listar_categorias_para_movimiento(user_id, "gasto")
-    if not cats:
+    eleccion = await teclado_categorias(user_id, "gasto", "cg")
+    if eleccion is None:
         await update.message.reply_text(
             "No tienes categorías para gastos. Crea una con /agregar_categoria "
             "(elige ámbito «gasto» o «ambos») y vuelve a usar /gasto."
         )
         return END
-    await update.message.reply_text(
-        texto_elegir_categoria(cats),
-        reply_markup=keyboard_categorias(cats, "cg"),
-    )
+    texto, teclado = eleccion
+    await update.message.reply_text(texto, reply_markup=teclado)
     return GASTO_CATEGORIA
 
 
@@ -111,46 +116,52 @@ async def gasto_categoria_callback(update: Update, context: ContextTypes.DEFAULT
     if not m:
         await query.answer()
         return GASTO_CATEGORIA
-    cat_id = int(m.group(1))
-    user_id = update.effective_user.id
-    row = obtener_categoria_usuario_por_id(user_id, cat_id)
-    if not row or not categoria_permitida_para_movimiento(user_id, row["nombre"], "gasto"):
-        await query.answer("Categoría no válida. Usa /gasto de nuevo.", show_alert=True)
+    # Cuenta y categoría se validan dentro de la misma escritura
+    exito, mensaje = await registrar_movimiento(
+        update.effective_user.id,
+        "gasto",
+        context.user_data["gasto_monto"],
+        cuenta_id=context.user_data["gasto_cuenta_id"],
+        categoria_id=int(m.group(1)),
+    )
+    if not exito:
+        if await _cuenta_perdida(update.effective_user.id, context.user_data["gasto_cuenta_id"]):
+            await query.answer()
+            await query.edit_message_text(f"{mensaje} Usa /gasto de nuevo.")
+            return END
+        await query.answer(mensaje, show_alert=True)
         return GASTO_CATEGORIA
     await query.answer()
-    cuenta = context.user_data["gasto_cuenta"]
-    monto = context.user_data["gasto_monto"]
-    _, mensaje = registrar_gasto(user_id, cuenta, monto, row["nombre"])
     await query.edit_message_text(mensaje)
     return END
 
 
 async def gasto_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    cat = update.message.text.strip().lower()
-    user_id = update.effective_user.id
-    if not categoria_permitida_para_movimiento(user_id, cat, "gasto"):
-        await update.message.reply_text(
-            "Categoría no reconocida para gastos. Usa un nombre de /mis_categorias o los botones."
-        )
-        return GASTO_CATEGORIA
-    cuenta = context.user_data["gasto_cuenta"]
-    monto = context.user_data["gasto_monto"]
-    _, mensaje = registrar_gasto(user_id, cuenta, monto, cat)
+    exito, mensaje = await registrar_movimiento(
+        update.effective_user.id,
+        "gasto",
+        context.user_data["gasto_monto"],
+        cuenta_id=context.user_data["gasto_cuenta_id"],
+        categoria=update.message.text,
+    )
+    if not exito and await _cuenta_perdida(update.effective_user.id, context.user_data["gasto_cuenta_id"]):
+        await update.message.reply_text(f"{mensaje} Usa /gasto de nuevo.")
+        return END
     await update.message.reply_text(mensaje)
-    return END
+    return END if exito else GASTO_CATEGORIA
 
 
 async def ingreso_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
-    cuentas = listar_cuentas(user_id)
-    if not cuentas:
+    n_cuentas, teclado = await teclado_cuentas(user_id, "ic")
+    if not n_cuentas:
         await update.message.reply_text(
             "No tienes cuentas. Crea una con /crear_cuenta y vuelve a usar /ingreso."
         )
         return END
     await update.message.reply_text(
         "Elige la cuenta (o escribe el nombre si prefieres):",
-        reply_markup=keyboard_cuentas(cuentas, "ic"),
+        reply_markup=teclado,
     )
     return INGRESO_CUENTA
 
@@ -163,12 +174,12 @@ async def ingreso_cuenta_callback(update: Update, context: ContextTypes.DEFAULT_
         return INGRESO_CUENTA
     cuenta_id = int(m.group(1))
     user_id = update.effective_user.id
-    cuenta = obtener_cuenta_por_id(user_id, cuenta_id)
+    cuenta = await obtener_cuenta_por_id(user_id, cuenta_id)
     if not cuenta:
         await query.answer("Esa cuenta ya no existe. Usa /ingreso de nuevo.", show_alert=True)
         return INGRESO_CUENTA
     await query.answer()
-    context.user_data["ingreso_cuenta"] = cuenta["nombre"].strip().lower()
+    context.user_data["ingreso_cuenta_id"] = cuenta["id"]
     await query.edit_message_text(
         f"Cuenta: {cuenta['nombre']}\n\n¿Monto?"
     )
@@ -176,7 +187,14 @@ async def ingreso_cuenta_callback(update: Update, context: ContextTypes.DEFAULT_
 
 
 async def ingreso_cuenta(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    context.user_data["ingreso_cuenta"] = update.message.text.strip().lower()
+    nombre = update.message.text.strip().lower()
+    cuenta = await obtener_cuenta_por_nombre(update.effective_user.id, nombre)
+    if not cuenta:
+        await update.message.reply_text(
+            f"No se encontró la cuenta '{nombre}'. Escribe otro nombre o usa los botones."
+        )
+        return INGRESO_CUENTA
+    context.user_data["ingreso_cuenta_id"] = cuenta["id"]
     await update.message.reply_text("¿Monto?")
     return INGRESO_MONTO
 
@@ -188,17 +206,15 @@ async def ingreso_monto(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         return INGRESO_MONTO
     context.user_data["ingreso_monto"] = monto
     user_id = update.effective_user.id
-    cats = listar_categorias_para_movimiento(user_id, "ingreso")
-    if not cats:
+    eleccion = await teclado_categorias(user_id, "ingreso", "ci")
+    if eleccion is None:
         await update.message.reply_text(
             "No tienes categorías para ingresos. Crea una con /agregar_categoria "
             "(ámbito «ingreso» o «ambos») y vuelve a usar /ingreso."
         )
         return END
-    await update.message.reply_text(
-        texto_elegir_categoria(cats),
-        reply_markup=keyboard_categorias(cats, "ci"),
-    )
+    texto, teclado = eleccion
+    await update.message.reply_text(texto, reply_markup=teclado)
     return INGRESO_CATEGORIA
 
 
@@ -208,46 +224,52 @@ async def ingreso_categoria_callback(update: Update, context: ContextTypes.DEFAU
     if not m:
         await query.answer()
         return INGRESO_CATEGORIA
-    cat_id = int(m.group(1))
-    user_id = update.effective_user.id
-    row = obtener_categoria_usuario_por_id(user_id, cat_id)
-    if not row or not categoria_permitida_para_movimiento(user_id, row["nombre"], "ingreso"):
-        await query.answer("Categoría no válida. Usa /ingreso de nuevo.", show_alert=True)
+    # Cuenta y categoría se validan dentro de la misma escritura
+    exito, mensaje = await registrar_movimiento(
+        update.effective_user.id,
+        "ingreso",
+        context.user_data["ingreso_monto"],
+        cuenta_id=context.user_data["ingreso_cuenta_id"],
+        categoria_id=int(m.group(1)),
+    )
+    if not exito:
+        if await _cuenta_perdida(update.effective_user.id, context.user_data["ingreso_cuenta_id"]):
+            await query.answer()
+            await query.edit_message_text(f"{mensaje} Usa /ingreso de nuevo.")
+            return END
+        await query.answer(mensaje, show_alert=True)
         return INGRESO_CATEGORIA
     await query.answer()
-    cuenta = context.user_data["ingreso_cuenta"]
-    monto = context.user_data["ingreso_monto"]
-    _, mensaje = registrar_ingreso(user_id, cuenta, monto, row["nombre"])
     await query.edit_message_text(mensaje)
     return END
 
 
 async def ingreso_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    cat = update.message.text.strip().lower()
-    user_id = update.effective_user.id
-    if not categoria_permitida_para_movimiento(user_id, cat, "ingreso"):
-        await update.message.reply_text(
-            "Categoría no reconocida para ingresos. Usa un nombre de /mis_categorias o los botones."
-        )
-        return INGRESO_CATEGORIA
-    cuenta = context.user_data["ingreso_cuenta"]
-    monto = context.user_data["ingreso_monto"]
-    _, mensaje = registrar_ingreso(user_id, cuenta, monto, cat)
+    exito, mensaje = await registrar_movimiento(
+        update.effective_user.id,
+        "ingreso",
+        context.user_data["ingreso_monto"],
+        cuenta_id=context.user_data["ingreso_cuenta_id"],
+        categoria=update.message.text,
+    )
+    if not exito and await _cuenta_perdida(update.effective_user.id, context.user_data["ingreso_cuenta_id"]):
+        await update.message.reply_text(f"{mensaje} Usa /ingreso de nuevo.")
+        return END
     await update.message.reply_text(mensaje)
-    return END
+    return END if exito else INGRESO_CATEGORIA
 
 
 async def transferencia_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
-    cuentas = listar_cuentas(user_id)
-    if len(cuentas) < 2:
+    n_cuentas, teclado = await teclado_cuentas(user_id, "tro")
+    if n_cuentas < 2:
         await update.message.reply_text(
             "Necesitas al menos dos cuentas para transferir. Usa /crear_cuenta si hace falta."
         )
         return END
     await update.message.reply_text(
         "Elige la cuenta origen (o escribe el nombre):",
-        reply_markup=keyboard_cuentas(cuentas, "tro"),
+        reply_markup=teclado,
     )
     return TRANSFERENCIA_ORIGEN
 
@@ -258,18 +280,17 @@ async def _transferencia_pedir_destino(
     origen_nombre_lower: str,
 ) -> bool:
     """Envía el teclado de destino. Retorna False si no hay otra cuenta."""
-    origen = obtener_cuenta_por_nombre(user_id, origen_nombre_lower)
+    origen = await obtener_cuenta_por_nombre(user_id, origen_nombre_lower)
     if not origen:
         await message.reply_text(f"No se encontró la cuenta '{origen_nombre_lower}'.")
         return False
-    cuentas = listar_cuentas(user_id)
-    otras = [c for c in cuentas if c["id"] != origen["id"]]
-    if not otras:
+    n_otras, teclado = await teclado_cuentas(user_id, "trd", excluir_id=origen["id"])
+    if not n_otras:
         await message.reply_text("No tienes otra cuenta como destino.")
         return False
     await message.reply_text(
         "Elige la cuenta destino (o escribe el nombre):",
-        reply_markup=keyboard_cuentas(cuentas, "trd", excluir_id=origen["id"]),
+        reply_markup=teclado,
     )
     return True
 
@@ -282,7 +303,7 @@ async def transferencia_origen_callback(update: Update, context: ContextTypes.DE
         return TRANSFERENCIA_ORIGEN
     cuenta_id = int(m.group(1))
     user_id = update.effective_user.id
-    cuenta = obtener_cuenta_por_id(user_id, cuenta_id)
+    cuenta = await obtener_cuenta_por_id(user_id, cuenta_id)
     if not cuenta:
         await query.answer("Esa cuenta ya no existe. Usa /transferencia de nuevo.", show_alert=True)
         return TRANSFERENCIA_ORIGEN
@@ -298,7 +319,7 @@ async def transferencia_origen_callback(update: Update, context: ContextTypes.DE
 async def transferencia_origen(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
     nombre = update.message.text.strip().lower()
-    cuenta = obtener_cuenta_por_nombre(user_id, nombre)
+    cuenta = await obtener_cuenta_por_nombre(user_id, nombre)
     if not cuenta:
         await update.message.reply_text(f"No se encontró la cuenta '{nombre}'.")
         return TRANSFERENCIA_ORIGEN
@@ -317,7 +338,7 @@ async def transferencia_destino_callback(update: Update, context: ContextTypes.D
         return TRANSFERENCIA_DESTINO
     cuenta_id = int(m.group(1))
     user_id = update.effective_user.id
-    cuenta = obtener_cuenta_por_id(user_id, cuenta_id)
+    cuenta = await obtener_cuenta_por_id(user_id, cuenta_id)
     if not cuenta:
         await query.answer("Esa cuenta ya no existe. Elige otra o usa /transferencia de nuevo.", show_alert=True)
         return TRANSFERENCIA_DESTINO
@@ -343,22 +364,22 @@ async def transferencia_monto(update: Update, context: ContextTypes.DEFAULT_TYPE
     user_id = update.effective_user.id
     origen = context.user_data["transferencia_origen"]
     destino = context.user_data["transferencia_destino"]
-    exito, mensaje = transferir(user_id, origen, destino, monto)
+    exito, mensaje = await transferir(user_id, origen, destino, monto)
     await update.message.reply_text(mensaje)
     return END
 
 
 async def ajustar_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
-    cuentas = listar_cuentas(user_id)
-    if not cuentas:
+    n_cuentas, teclado = await teclado_cuentas(user_id, "ac")
+    if not n_cuentas:
         await update.message.reply_text(
             "No tienes cuentas. Crea una con /crear_cuenta y vuelve a usar /ajustar."
         )
         return END
     await update.message.reply_text(
         "Elige la cuenta a ajustar (o escribe el nombre):",
-        reply_markup=keyboard_cuentas(cuentas, "ac"),
+        reply_markup=teclado,
     )
     return AJUSTAR_CUENTA
 
@@ -371,7 +392,7 @@ async def ajustar_cuenta_callback(update: Update, context: ContextTypes.DEFAULT_
         return AJUSTAR_CUENTA
     cuenta_id = int(m.group(1))
     user_id = update.effective_user.id
-    cuenta = obtener_cuenta_por_id(user_id, cuenta_id)
+    cuenta = await obtener_cuenta_por_id(user_id, cuenta_id)
     if not cuenta:
         await query.answer("Esa cuenta ya no existe. Usa /ajustar de nuevo.", show_alert=True)
         return AJUSTAR_CUENTA
@@ -397,6 +418,6 @@ async def ajustar_monto(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         return AJUSTAR_MONTO
     user_id = update.effective_user.id
     cuenta = context.user_data["ajustar_cuenta"]
-    _, mensaje = registrar_ajuste_saldo(user_id, cuenta, saldo_objetivo)
+    _, mensaje = await registrar_ajuste_saldo(user_id, cuenta, saldo_objetivo)
     await update.message.reply_text(mensaje)
     return END
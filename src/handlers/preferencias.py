@@ -0,0 +1,55 @@
+"""Flujo /resumen_diario: zona horaria y hora del resumen automático."""
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from src.config import PREF_ZONA, PREF_HORA, END
+from src.database.aio import guardar_preferencias_resumen, obtener_preferencias_resumen
+from src.utils import is_null
+
+_DESACTIVAR = ("no", "off", "desactivar", "ninguna")
+
+
+async def resumen_diario_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    pref = await obtener_preferencias_resumen(update.effective_user.id)
+    estado = (
+        f"a las {pref['hora_envio']} ({pref['zona_horaria']})"
+        if pref["resumen_activo"] else "desactivado"
+    )
+    await update.message.reply_text(
+        f"🕙 Resumen diario: {estado}\n\n"
+        "¿Zona horaria? Formato Región/Ciudad (ej: America/Mexico_City, Europe/Madrid), "
+        "o null para no cambiarla."
+    )
+    return PREF_ZONA
+
+
+async def resumen_diario_zona(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip()
+    if not is_null(text):
+        # La zona se guarda ya: si es inválida se vuelve a pedir aquí y no tras la hora
+        exito, mensaje = await guardar_preferencias_resumen(update.effective_user.id, zona_horaria=text)
+        if not exito:
+            await update.message.reply_text(f"{mensaje}\nEscribe otra o null.")
+            return PREF_ZONA
+    await update.message.reply_text(
+        "¿A qué hora? HH:MM en formato 24 h (ej: 08:30), «no» para desactivar el resumen, "
+        "o null para no cambiarla."
+    )
+    return PREF_HORA
+
+
+async def resumen_diario_hora(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip().lower()
+    user_id = update.effective_user.id
+    if text in _DESACTIVAR:
+        exito, mensaje = await guardar_preferencias_resumen(user_id, activo=False)
+    else:
+        # Elegir una hora reactiva el resumen; null deja también el estado como estaba
+        hora = None if is_null(text) else text
+        activo = None if hora is None else True
+        exito, mensaje = await guardar_preferencias_resumen(user_id, hora_envio=hora, activo=activo)
+        if not exito:
+            await update.message.reply_text(f"{mensaje}\nEscribe otra, «no» o null.")
+            return PREF_HORA
+    await update.message.reply_text(("✅ " if exito else "❌ ") + mensaje)
+    return END
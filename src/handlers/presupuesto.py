@@ -1,5 +1,6 @@
 """Presupuestos nombrados por usuario (varios por persona; movimientos por presupuesto)."""
 import re
+from datetime import datetime, timezone
 
 from telegram import Update
 from telegram.ext import ContextTypes
@@ -19,28 +20,42 @@ from src.config import (
     PRES_ELIMINAR_ID,
     CLONAR_PRES_ORIGEN,
     CLONAR_PRES_NUEVO_NOMBRE,
+    ESCALAR_PRES_NOMBRE,
+    ESCALAR_PRES_PORCENTAJE,
+    FUSIONAR_PRES_ORIGEN,
+    FUSIONAR_PRES_DESTINO,
+    COMPARAR_PRES_NOMBRE,
+    COMPARAR_PRES_MES,
+    MESES,
     END,
 )
-from src.database import (
+from src.database.aio import (
     agregar_presupuesto_registro,
     clonar_presupuesto,
+    comparar_presupuesto,
     categoria_permitida_para_movimiento,
     editar_presupuesto_registro,
     eliminar_presupuesto_registro,
-    listar_categorias_para_movimiento,
+    eliminar_presupuesto_registros,
+    escalar_presupuesto,
+    fusionar_presupuestos,
     listar_presupuesto,
     listar_presupuestos,
+    listar_presupuestos_con_detalle,
     obtener_categoria_usuario_por_id,
     obtener_presupuesto_por_id,
     obtener_presupuesto_por_nombre,
     resolver_presupuesto_por_nombre,
     totales_presupuesto,
 )
-from src.handlers.categoria_inline import keyboard_categorias, texto_elegir_categoria
+from src.handlers.categoria_inline import teclado_categorias
 from src.utils import is_null, parse_cantidad
 
 _PRES_GASTO_CAT_CB = re.compile(r"^pg:(\d+)$")
 _PRES_INGRESO_CAT_CB = re.compile(r"^pi:(\d+)$")
+_IDS = re.compile(r"^[#\d\s,;]+$")
+_MES_ANO = re.compile(r"^(\d{1,2})\s*[/\-]\s*(\d{4})$")
+_ANO_MES = re.compile(r"^(\d{4})\s*[/\-]\s*(\d{1,2})$")
 _MAX_MSG = 3900
 
 
@@ -69,9 +84,13 @@ def _formatear_linea_presupuesto(r: dict) -> str:
     return f"#{r['id']} | [{r.get('categoria', 'sin_categoria')}] | {monto_str}"
 
 
-def _lineas_detalle_presupuesto(user_id: int, presupuesto_id: int, nombre: str) -> list[str]:
-    registros = listar_presupuesto(user_id, presupuesto_id)
-    t = totales_presupuesto(user_id, presupuesto_id)
+async def _lineas_detalle_presupuesto(user_id: int, presupuesto_id: int, nombre: str) -> list[str]:
+    registros = await listar_presupuesto(user_id, presupuesto_id)
+    t = await totales_presupuesto(user_id, presupuesto_id)
+    return _formatear_detalle_presupuesto(nombre, registros, t)
+
+
+def _formatear_detalle_presupuesto(nombre: str, registros: list[dict], t: dict) -> list[str]:
     lineas = [f"📒 Presupuesto «{nombre}»\n"]
     if not registros:
         lineas.append("Sin líneas aún. Usa /gasto_presupuesto o /ingreso_presupuesto.")
@@ -132,7 +151,7 @@ async def gasto_presupuesto_start(update: Update, context: ContextTypes.DEFAULT_
 
 async def gasto_presupuesto_nombre(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
-    pid, err = resolver_presupuesto_por_nombre(user_id, update.message.text)
+    pid, err = await resolver_presupuesto_por_nombre(user_id, update.message.text)
     if err:
         await update.message.reply_text(err)
         return PRES_GASTO_NOMBRE
@@ -164,16 +183,14 @@ async def gasto_presupuesto_anual(update: Update, context: ContextTypes.DEFAULT_
         return GASTO_PRESUPUESTO_ANUAL
     context.user_data["pres_gasto_es_anual"] = parsed
     user_id = update.effective_user.id
-    cats = listar_categorias_para_movimiento(user_id, "gasto")
-    if not cats:
+    eleccion = await teclado_categorias(user_id, "gasto", "pg")
+    if eleccion is None:
         await update.message.reply_text(
             "No tienes categorías para gastos. Usa /agregar_categoria (gasto o ambos) y vuelve a /gasto_presupuesto."
         )
         return END
-    await update.message.reply_text(
-        texto_elegir_categoria(cats),
-        reply_markup=keyboard_categorias(cats, "pg"),
-    )
+    texto, teclado = eleccion
+    await update.message.reply_text(texto, reply_markup=teclado)
     return GASTO_PRESUPUESTO_CATEGORIA
 
 
@@ -185,8 +202,8 @@ async def gasto_presupuesto_categoria_callback(update: Update, context: ContextT
         return GASTO_PRESUPUESTO_CATEGORIA
     cat_id = int(m.group(1))
     user_id = update.effective_user.id
-    row = obtener_categoria_usuario_por_id(user_id, cat_id)
-    if not row or not categoria_permitida_para_movimiento(user_id, row["nombre"], "gasto"):
+    row = await obtener_categoria_usuario_por_id(user_id, cat_id)
+    if not row or not await categoria_permitida_para_movimiento(user_id, row["nombre"], "gasto"):
         await query.answer("Categoría no válida.", show_alert=True)
         return GASTO_PRESUPUESTO_CATEGORIA
     await query.answer()
@@ -196,7 +213,7 @@ async def gasto_presupuesto_categoria_callback(update: Update, context: ContextT
         return END
     monto = context.user_data["pres_gasto_monto"]
     es_anual = bool(context.user_data.get("pres_gasto_es_anual", False))
-    _, mensaje = agregar_presupuesto_registro(
+    _, mensaje = await agregar_presupuesto_registro(
         user_id, pres_id, "gasto", monto, row["nombre"], es_anual=es_anual
     )
     await query.edit_message_text(mensaje)
@@ -206,7 +223,7 @@ async def gasto_presupuesto_categoria_callback(update: Update, context: ContextT
 async def gasto_presupuesto_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     cat = update.message.text.strip().lower()
     user_id = update.effective_user.id
-    if not categoria_permitida_para_movimiento(user_id, cat, "gasto"):
+    if not await categoria_permitida_para_movimiento(user_id, cat, "gasto"):
         await update.message.reply_text(
             "Categoría no reconocida. Usa /mis_categorias o los botones."
         )
@@ -217,7 +234,7 @@ async def gasto_presupuesto_categoria(update: Update, context: ContextTypes.DEFA
         return END
     monto = context.user_data["pres_gasto_monto"]
     es_anual = bool(context.user_data.get("pres_gasto_es_anual", False))
-    _, mensaje = agregar_presupuesto_registro(
+    _, mensaje = await agregar_presupuesto_registro(
         user_id, pres_id, "gasto", monto, cat, es_anual=es_anual
     )
     await update.message.reply_text(mensaje)
@@ -234,7 +251,7 @@ async def ingreso_presupuesto_start(update: Update, context: ContextTypes.DEFAUL
 
 async def ingreso_presupuesto_nombre(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.effective_user.id
-    pid, err = resolver_presupuesto_por_nombre(user_id, update.message.text)
+    pid, err = await resolver_presupuesto_por_nombre(user_id, update.message.text)
     if err:
         await update.message.reply_text(err)
         return PRES_INGRESO_NOMBRE
@@ -250,16 +267,14 @@ async def ingreso_presupuesto_monto(update: Update, context: ContextTypes.DEFAUL
         return INGRESO_PRESUPUESTO_MONTO
     context.user_data["pres_ing_monto"] = monto
     user_id = update.effective_user.id
-    cats = listar_categorias_para_movimiento(user_id, "ingreso")
-    if not cats:
+    eleccion = await teclado_categorias(user_id, "ingreso", "pi")
+    if eleccion is None:
         await update.message.reply_text(
             "No tienes categorías para ingresos. Usa /agregar_categoria (ingreso o ambos) y vuelve a /ingreso_presupuesto."
         )
         return END
-    await update.message.reply_text(
-        texto_elegir_categoria(cats),
-        reply_markup=keyboard_categorias(cats, "pi"),
-    )
+    texto, teclado = eleccion
+    await update.message.reply_text(texto, reply_markup=teclado)
     return INGRESO_PRESUPUESTO_CATEGORIA
 
 
@@ -271,8 +286,8 @@ async def ingreso_presupuesto_categoria_callback(update: Update, context: Contex
         return INGRESO_PRESUPUESTO_CATEGORIA
     cat_id = int(m.group(1))
     user_id = update.effective_user.id
-    row = obtener_categoria_usuario_por_id(user_id, cat_id)
-    if not row or not categoria_permitida_para_movimiento(user_id, row["nombre"], "ingreso"):
+    row = await obtener_categoria_usuario_por_id(user_id, cat_id)
+    if not row or not await categoria_permitida_para_movimiento(user_id, row["nombre"], "ingreso"):
         await query.answer("Categoría no válida.", show_alert=True)
         return INGRESO_PRESUPUESTO_CATEGORIA
     await query.answer()
@@ -281,7 +296,7 @@ async def ingreso_presupuesto_categoria_callback(update: Update, context: Contex
         await query.edit_message_text("Sesión caducada. Usa /ingreso_presupuesto de nuevo.")
         return END
     monto = context.user_data["pres_ing_monto"]
-    _, mensaje = agregar_presupuesto_registro(user_id, pres_id, "ingreso", monto, row["nombre"])
+    _, mensaje = await agregar_presupuesto_registro(user_id, pres_id, "ingreso", monto, row["nombre"])
     await query.edit_message_text(mensaje)
     return END
 
@@ -289,7 +304,7 @@ async def ingreso_presupuesto_categoria_callback(update: Update, context: Contex
 async def ingreso_presupuesto_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     cat = update.message.text.strip().lower()
     user_id = update.effective_user.id
-    if not categoria_permitida_para_movimiento(user_id, cat, "ingreso"):
+    if not await categoria_permitida_para_movimiento(user_id, cat, "ingreso"):
         await update.message.reply_text(
             "Categoría no reconocida. Usa /mis_categorias o los botones."
         )
@@ -299,7 +314,7 @@ async def ingreso_presupuesto_categoria(update: Update, context: ContextTypes.DE
         await update.message.reply_text("Sesión caducada. Usa /ingreso_presupuesto de nuevo.")
         return END
     monto = context.user_data["pres_ing_monto"]
-    _, mensaje = agregar_presupuesto_registro(user_id, pres_id, "ingreso", monto, cat)
+    _, mensaje = await agregar_presupuesto_registro(user_id, pres_id, "ingreso", monto, cat)
     await update.message.reply_text(mensaje)
     return END
 
@@ -354,7 +369,7 @@ async def editar_presupuesto_categoria(update: Update, context: ContextTypes.DEF
         return END
     user_id = update.effective_user.id
     rid = context.user_data["pres_edit_id"]
-    _, mensaje = editar_presupuesto_registro(user_id, rid, monto=monto, categoria=categoria)
+    _, mensaje = await editar_presupuesto_registro(user_id, rid, monto=monto, categoria=categoria)
     await update.message.reply_text(mensaje)
     return END
 
@@ -371,19 +386,21 @@ async def resumen_presupuesto_nombre(update: Update, context: ContextTypes.DEFAU
     raw = update.message.text.strip()
     user_id = update.effective_user.id
     if raw.lower() == "todos":
-        pres_list = listar_presupuestos(user_id)
+        # Una sola consulta para todos los presupuestos con sus líneas y totales
+        pres_list = await listar_presupuestos_con_detalle(user_id)
         if not pres_list:
             await update.message.reply_text(
                 "No tienes presupuestos. Indica un nombre en /gasto_presupuesto para crear el primero."
             )
             return END
-        bloques: list[str] = []
-        for p in pres_list:
-            bloques.append("\n".join(_lineas_detalle_presupuesto(user_id, p["id"], p["nombre"])))
+        bloques = [
+            "\n".join(_formatear_detalle_presupuesto(p["nombre"], p["registros"], p["totales"]))
+            for p in pres_list
+        ]
         await _reply_texto_largo(update.message, "\n\n═══════════════\n\n".join(bloques))
         return END
 
-    p = obtener_presupuesto_por_nombre(user_id, raw)
+    p = await obtener_presupuesto_por_nombre(user_id, raw)
     if not p:
         await update.message.reply_text(
             f"No existe el presupuesto «{raw}». Revisa /presupuestos o el nombre exacto."
@@ -391,7 +408,7 @@ async def resumen_presupuesto_nombre(update: Update, context: ContextTypes.DEFAU
         return RESUMEN_PRES_NOMBRE
     await _reply_texto_largo(
         update.message,
-        "\n".join(_lineas_detalle_presupuesto(user_id, p["id"], p["nombre"])),
+        "\n".join(await _lineas_detalle_presupuesto(user_id, p["id"], p["nombre"])),
     )
     return END
 
@@ -400,23 +417,37 @@ async def eliminar_registro_presupuesto_start(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
     await update.message.reply_text(
-        "¿ID de la línea a borrar? (# único; aparece en /resumen_presupuesto)."
+        "¿ID de la línea a borrar? (# único; aparece en /resumen_presupuesto). "
+        "Para borrar varias, sepáralas con espacios o comas (ej: 12 15 20)."
     )
     return PRES_ELIMINAR_ID
 
 
 async def eliminar_presupuesto_por_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    try:
-        rid = int(update.message.text.strip())
-    except ValueError:
-        await update.message.reply_text("ID inválido. Escribe el número del registro.")
+    text = update.message.text.strip()
+    ids = [int(n) for n in re.findall(r"\d+", text)] if _IDS.match(text) else []
+    if not ids:
+        await update.message.reply_text("ID inválido. Escribe el número del registro (o varios separados por comas).")
         return PRES_ELIMINAR_ID
     user_id = update.effective_user.id
-    exito, mensaje = eliminar_presupuesto_registro(user_id, rid)
+    if len(ids) == 1:
+        exito, mensaje = await eliminar_presupuesto_registro(user_id, ids[0])
+    else:
+        exito, mensaje = await eliminar_presupuesto_registros(user_id, ids)
     await update.message.reply_text(mensaje)
     return END
 
 
+async def _buscar_presupuesto(user_id: int, text: str) -> dict | None:
+    """Presupuesto del usuario por #id o por nombre."""
+    pres = None
+    if text.lstrip("#").isdigit():
+        pres = await obtener_presupuesto_por_id(user_id, int(text.lstrip("#")))
+    if pres is None:
+        pres = await obtener_presupuesto_por_nombre(user_id, text)
+    return pres
+
+
 async def clonar_presupuesto_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await update.message.reply_text(
         "¿Qué presupuesto quieres copiar? Escribe su nombre o su #id (ver /presupuestos)."
@@ -425,13 +456,7 @@ async def clonar_presupuesto_start(update: Update, context: ContextTypes.DEFAULT
 
 
 async def clonar_presupuesto_origen(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    text = update.message.text.strip()
-    user_id = update.effective_user.id
-    orig = None
-    if text.isdigit():
-        orig = obtener_presupuesto_por_id(user_id, int(text))
-    if orig is None:
-        orig = obtener_presupuesto_por_nombre(user_id, text)
+    orig = await _buscar_presupuesto(update.effective_user.id, update.message.text.strip())
     if not orig:
         await update.message.reply_text(
             "No encontré ese presupuesto. Revisa /presupuestos (nombre o #id)."
@@ -453,15 +478,190 @@ async def clonar_presupuesto_nuevo_nombre(
     if oid is None:
         await update.message.reply_text("Sesión caducada. Usa /clonar_presupuesto de nuevo.")
         return END
-    _, mensaje = clonar_presupuesto(user_id, oid, update.message.text)
+    _, mensaje = await clonar_presupuesto(user_id, oid, update.message.text)
     await update.message.reply_text(mensaje)
     context.user_data.pop("pres_clonar_origen_id", None)
     return END
 
 
+async def escalar_presupuesto_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text(
+        "¿Qué presupuesto quieres ajustar? Escribe su nombre o su #id (ver /presupuestos)."
+    )
+    return ESCALAR_PRES_NOMBRE
+
+
+async def escalar_presupuesto_nombre(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    pres = await _buscar_presupuesto(update.effective_user.id, update.message.text.strip())
+    if not pres:
+        await update.message.reply_text(
+            "No encontré ese presupuesto. Revisa /presupuestos (nombre o #id)."
+        )
+        return ESCALAR_PRES_NOMBRE
+    context.user_data["pres_escalar_id"] = pres["id"]
+    await update.message.reply_text(
+        f"Presupuesto: «{pres['nombre']}». ¿Qué porcentaje? "
+        "Positivo para subir, negativo para bajar (ej: 10 o -5,5). Se aplica a todas sus líneas."
+    )
+    return ESCALAR_PRES_PORCENTAJE
+
+
+async def escalar_presupuesto_porcentaje(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    porcentaje = parse_cantidad(update.message.text.strip().rstrip("%"))
+    if porcentaje is None:
+        await update.message.reply_text("Porcentaje inválido. Escribe un número, por ejemplo 10 o -5.")
+        return ESCALAR_PRES_PORCENTAJE
+    pid = context.user_data.get("pres_escalar_id")
+    if pid is None:
+        await update.message.reply_text("Sesión caducada. Usa /escalar_presupuesto de nuevo.")
+        return END
+    exito, mensaje = await escalar_presupuesto(update.effective_user.id, pid, porcentaje)
+    await update.message.reply_text(mensaje)
+    if not exito:
+        return ESCALAR_PRES_PORCENTAJE
+    context.user_data.pop("pres_escalar_id", None)
+    return END
+
+
+async def fusionar_presupuestos_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text(
+        "¿Qué presupuesto quieres fusionar? Sus líneas pasarán a otro y este se borrará. "
+        "Escribe su nombre o su #id (ver /presupuestos)."
+    )
+    return FUSIONAR_PRES_ORIGEN
+
+
+async def fusionar_presupuestos_origen(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    orig = await _buscar_presupuesto(update.effective_user.id, update.message.text.strip())
+    if not orig:
+        await update.message.reply_text(
+            "No encontré ese presupuesto. Revisa /presupuestos (nombre o #id)."
+        )
+        return FUSIONAR_PRES_ORIGEN
+    context.user_data["pres_fusionar_origen_id"] = orig["id"]
+    await update.message.reply_text(
+        f"Origen: «{orig['nombre']}». ¿En qué presupuesto lo fusiono? (nombre o #id)"
+    )
+    return FUSIONAR_PRES_DESTINO
+
+
+async def fusionar_presupuestos_destino(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    user_id = update.effective_user.id
+    oid = context.user_data.get("pres_fusionar_origen_id")
+    if oid is None:
+        await update.message.reply_text("Sesión caducada. Usa /fusionar_presupuestos de nuevo.")
+        return END
+    destino = await _buscar_presupuesto(user_id, update.message.text.strip())
+    if not destino:
+        await update.message.reply_text(
+            "No encontré ese presupuesto. Revisa /presupuestos (nombre o #id)."
+        )
+        return FUSIONAR_PRES_DESTINO
+    exito, mensaje = await fusionar_presupuestos(user_id, oid, destino["id"])
+    await update.message.reply_text(mensaje)
+    if not exito:
+        return FUSIONAR_PRES_DESTINO
+    context.user_data.pop("pres_fusionar_origen_id", None)
+    return END
+
+
+def _parse_mes_ano(text: str) -> tuple[int, int] | None:
+    """'3/2025', '03-2025' o '2025-03' → (año, mes); None si no se reconoce."""
+    text = text.strip()
+    if m := _MES_ANO.match(text):
+        mes, ano = int(m.group(1)), int(m.group(2))
+    elif m := _ANO_MES.match(text):
+        ano, mes = int(m.group(1)), int(m.group(2))
+    else:
+        return None
+    return (ano, mes) if 1 <= mes <= 12 else None
+
+
+def _mes_actual() -> tuple[int, int]:
+    """(año, mes) de hoy en UTC: los movimientos se agrupan por mes UTC (resumen_mensual)."""
+    hoy = datetime.now(timezone.utc)
+    return hoy.year, hoy.month
+
+
+def _formatear_comparacion(c: dict) -> str:
+    lineas = [f"📊 «{c['presupuesto']}» vs real — {MESES[c['mes']]} {c['ano']}\n"]
+    lineas.append("📤 Gastos (planificado → real)")
+    if not c["gastos"]:
+        lineas.append("  (ninguno)")
+    for g in c["gastos"]:
+        if g["planificado"] == 0:
+            estado = "⚠️ fuera de presupuesto"
+        elif g["diferencia"] > 0:
+            estado = f"⚠️ excedido ${g['diferencia']:,.2f}"
+        else:
+            estado = f"✅ quedan ${-g['diferencia']:,.2f} ({g['real'] / g['planificado']:.0%})"
+        lineas.append(f"  • {g['categoria']}: ${g['planificado']:,.2f} → ${g['real']:,.2f}  {estado}")
+    lineas.append(
+        f"  Total: ${c['total_gastos_planificado']:,.2f} → ${c['total_gastos_real']:,.2f}\n"
+    )
+    lineas.append("📥 Ingresos (planificado → real)")
+    if not c["ingresos"]:
+        lineas.append("  (ninguno)")
+    for i in c["ingresos"]:
+        signo = "+" if i["diferencia"] >= 0 else "−"
+        lineas.append(
+            f"  • {i['categoria']}: ${i['planificado']:,.2f} → ${i['real']:,.2f}  "
+            f"({signo}${abs(i['diferencia']):,.2f})"
+        )
+    lineas.append(
+        f"  Total: ${c['total_ingresos_planificado']:,.2f} → ${c['total_ingresos_real']:,.2f}\n"
+    )
+    plan = c["total_ingresos_planificado"] - c["total_gastos_planificado"]
+    real = c["total_ingresos_real"] - c["total_gastos_real"]
+    lineas.append(f"Balance: planificado ${plan:,.2f} → real ${real:,.2f}")
+    lineas.append("(Los gastos anuales del presupuesto cuentan como monto ÷ 12.)")
+    return "\n".join(lineas)
+
+
+async def comparar_presupuesto_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text(
+        "¿Qué presupuesto quieres comparar con tus movimientos reales? "
+        "Escribe su nombre o su #id (ver /presupuestos)."
+    )
+    return COMPARAR_PRES_NOMBRE
+
+
+async def comparar_presupuesto_nombre(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    pres = await _buscar_presupuesto(update.effective_user.id, update.message.text.strip())
+    if not pres:
+        await update.message.reply_text(
+            "No encontré ese presupuesto. Revisa /presupuestos (nombre o #id)."
+        )
+        return COMPARAR_PRES_NOMBRE
+    context.user_data["pres_comparar_id"] = pres["id"]
+    await update.message.reply_text("¿Qué mes? (MM/AAAA, ej: 03/2025, o null para el mes actual). Los meses se cuentan en hora UTC.")
+    return COMPARAR_PRES_MES
+
+
+async def comparar_presupuesto_mes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip()
+    if is_null(text):
+        periodo = _mes_actual()
+    else:
+        periodo = _parse_mes_ano(text)
+        if periodo is None:
+            await update.message.reply_text("Mes inválido. Usa MM/AAAA (ej: 03/2025) o null.")
+            return COMPARAR_PRES_MES
+    pid = context.user_data.pop("pres_comparar_id", None)
+    if pid is None:
+        await update.message.reply_text("Sesión caducada. Usa /comparar_presupuesto de nuevo.")
+        return END
+    comparacion = await comparar_presupuesto(update.effective_user.id, pid, *periodo)
+    if comparacion is None:
+        await update.message.reply_text("Ese presupuesto ya no existe. Revisa /presupuestos.")
+        return END
+    await _reply_texto_largo(update.message, _formatear_comparacion(comparacion))
+    return END
+
+
 async def cmd_presupuestos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    lst = listar_presupuestos(user_id)
+    lst = await listar_presupuestos(user_id)
     if not lst:
         await update.message.reply_text(
             "No tienes presupuestos. El primero se crea al usar /gasto_presupuesto o /ingreso_presupuesto "
@@ -473,4 +673,7 @@ async def cmd_presupuestos(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         lineas.append(f"• «{p['nombre']}» (#{p['id']}) — {p['n_movimientos']} líneas")
     lineas.append("\n/resumen_presupuesto — detalle de uno o todos")
     lineas.append("/clonar_presupuesto — copiar uno con otro nombre")
+    lineas.append("/escalar_presupuesto — subir o bajar todas sus líneas un %")
+    lineas.append("/fusionar_presupuestos — pasar las líneas de uno a otro")
+    lineas.append("/comparar_presupuesto — planificado contra real en un mes")
     await update.message.reply_text("\n".join(lineas))
@@ -10,7 +10,7 @@ from src.config import (
     MESES,
     END,
 )
-from src.database import obtener_resumen_por_categoria, obtener_resumen_por_mes
+from src.database.aio import obtener_resumen_por_categoria, obtener_resumen_por_mes
 from src.utils import is_null
 
 
@@ -46,7 +46,7 @@ async def resumen_cat_ano(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         except ValueError:
             pass
     user_id = update.effective_user.id
-    resumen = obtener_resumen_por_categoria(user_id, ano=ano, mes=mes)
+    resumen = await obtener_resumen_por_categoria(user_id, ano=ano, mes=mes)
     titulo = "📂 Resumen por categoría"
     if ano is not None and mes is not None:
         titulo += f" ({MESES[mes]} {ano})"
@@ -83,7 +83,7 @@ async def resumen_mes_ano(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         context.user_data["resumen_mes_ano"] = None
         context.user_data["resumen_mes_mes"] = None
         user_id = update.effective_user.id
-        registros = obtener_resumen_por_mes(user_id, ano=None, mes=None, limite=12)
+        registros = await obtener_resumen_por_mes(user_id, ano=None, mes=None, limite=12)
         await _enviar_resumen_mes(update, registros, None, None)
         return END
     try:
@@ -108,7 +108,7 @@ async def resumen_mes_mes(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         except ValueError:
             pass
     user_id = update.effective_user.id
-    registros = obtener_resumen_por_mes(user_id, ano=ano, mes=mes, limite=12)
+    registros = await obtener_resumen_por_mes(user_id, ano=ano, mes=mes, limite=12)
     await _enviar_resumen_mes(update, registros, ano, mes)
     return END
 
@@ -0,0 +1,203 @@
+"""
+Lectura de movimientos desde archivos CSV u OFX para /importar.
+
+Los lectores son generadores: recorren el archivo por partes y entregan un
+dict por movimiento ({"fecha", "tipo", "monto", "categoria"}), así un archivo
+de miles de filas nunca se carga entero en memoria. Las filas que no se
+pueden interpretar se saltan y se anotan en la lista `errores`.
+"""
+import codecs
+import csv
+import io
+import re
+from datetime import datetime
+from typing import BinaryIO, Iterator
+
+from src.utils import parse_cantidad
+
+MAX_ERRORES = 20
+
+_COLUMNAS = {
+    "fecha": ("fecha", "date", "dia", "día", "fecha operacion", "fecha operación"),
+    "monto": ("monto", "importe", "cantidad", "amount", "valor"),
+    "tipo": ("tipo", "type"),
+    "categoria": ("categoria", "categoría", "category"),
+}
+_FORMATOS_FECHA = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+)
+_TIPOS = {
+    "gasto": "gasto", "gastos": "gasto", "egreso": "gasto", "debit": "gasto", "debito": "gasto",
+    "ingreso": "ingreso", "ingresos": "ingreso", "credit": "ingreso", "credito": "ingreso",
+}
+
+
+def _anotar(errores: list[str], mensaje: str) -> None:
+    if len(errores) < MAX_ERRORES:
+        errores.append(mensaje)
+    elif len(errores) == MAX_ERRORES:
+        errores.append("… (más errores omitidos)")
+
+
+def _parse_fecha(texto: str) -> str | None:
+    """Fecha del archivo → 'AAAA-MM-DD HH:MM:SS' (el formato de creada_en)."""
+    texto = texto.strip()
+    for formato in _FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    return None
+
+
+def _movimiento(fecha: str | None, monto: float | None, tipo: str | None, categoria: str | None) -> dict | None:
+    """Normaliza un movimiento; el signo del monto decide el tipo si no viene explícito."""
+    if fecha is None or monto is None or monto == 0:
+        return None
+    if tipo is None:
+        tipo = "gasto" if monto < 0 else "ingreso"
+    return {
+        "fecha": fecha,
+        "tipo": tipo,
+        "monto": abs(monto),
+        "categoria": (categoria or "").strip().lower() or None,
+    }
+
+
+def es_ofx(cabecera: bytes) -> bool:
+    """True si los primeros bytes del archivo parecen OFX/QFX."""
+    inicio = cabecera.lstrip()[:512].upper()
+    return inicio.startswith(b"OFXHEADER") or b"<OFX>" in inicio or (
+        inicio.startswith(b"<?XML") and b"OFX" in inicio
+    )
+
+
+def leer_csv(archivo: BinaryIO, errores: list[str]) -> Iterator[dict]:
+    """Movimientos de un CSV con cabecera (columnas fecha, monto y opcionalmente tipo, categoria).
+
+    Detecta el separador (, ; o tabulador). Sin columna tipo, un monto negativo
+    es un gasto y uno positivo un ingreso.
+    """
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        yield from _filas_csv(texto, errores)
+    finally:
+        # Sin detach(), al destruir el wrapper se cerraría el archivo del llamador
+        texto.detach()
+
+
+def _leer_filas(lector, errores: list[str]) -> Iterator[list[str]]:
+    """Filas del lector csv; una línea mal formada (p. ej. un campo enorme) se anota y se salta."""
+    while True:
+        try:
+            yield next(lector)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            _anotar(errores, f"Línea {lector.line_num}: no se pudo leer ({e}).")
+
+
+def _filas_csv(texto: io.TextIOWrapper, errores: list[str]) -> Iterator[dict]:
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.reader(texto, dialecto)
+    filas = _leer_filas(lector, errores)
+    cabecera = next(filas, None)
+    if not cabecera:
+        _anotar(errores, "El archivo está vacío.")
+        return
+    nombres = [c.strip().lower() for c in cabecera]
+    indices: dict[str, int] = {}
+    for campo, alias in _COLUMNAS.items():
+        for i, nombre in enumerate(nombres):
+            if nombre in alias:
+                indices[campo] = i
+                break
+    if "fecha" not in indices or "monto" not in indices:
+        _anotar(errores, "La cabecera debe tener al menos las columnas «fecha» y «monto».")
+        return
+
+    def celda(fila: list[str], campo: str) -> str | None:
+        i = indices.get(campo)
+        return fila[i] if i is not None and i < len(fila) else None
+
+    for fila in filas:
+        if not any(c.strip() for c in fila):
+            continue
+        linea = lector.line_num
+        fecha = _parse_fecha(celda(fila, "fecha") or "")
+        monto = parse_cantidad((celda(fila, "monto") or "").replace("$", "").replace("€", "").replace(" ", ""))
+        tipo = None
+        tipo_texto = (celda(fila, "tipo") or "").strip().lower()
+        if tipo_texto:
+            tipo = _TIPOS.get(tipo_texto)
+            if tipo is None:
+                _anotar(errores, f"Línea {linea}: tipo «{tipo_texto}» no reconocido (gasto o ingreso).")
+                continue
+        mov = _movimiento(fecha, monto, tipo, celda(fila, "categoria"))
+        if mov is None:
+            _anotar(errores, f"Línea {linea}: fecha o monto inválido.")
+            continue
+        yield mov
+
+
+_ETIQUETA_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def _etiquetas_ofx(archivo: BinaryIO, tamano: int = 65536) -> Iterator[tuple[bool, str, str]]:
+    """(cierre, etiqueta, valor) de un OFX leído por bloques; sirve para SGML (v1) y XML (v2)."""
+    decodificador = codecs.getincrementaldecoder("latin-1")()
+    pendiente = ""
+    while True:
+        bloque = archivo.read(tamano)
+        pendiente += decodificador.decode(bloque, final=not bloque)
+        # Solo se procesa hasta el último '<': la etiqueta siguiente puede venir cortada
+        corte = len(pendiente) if not bloque else pendiente.rfind("<")
+        if corte > 0:
+            for m in _ETIQUETA_OFX.finditer(pendiente, 0, corte):
+                yield m.group(1) == "/", m.group(2).upper(), m.group(3).strip()
+            pendiente = pendiente[corte:]
+        if not bloque:
+            return
+
+
+def leer_ofx(archivo: BinaryIO, errores: list[str]) -> Iterator[dict]:
+    """Movimientos (<STMTTRN>) de un extracto OFX/QFX. OFX no trae categoría."""
+    actual: dict[str, str] | None = None
+    n = 0
+    for cierre, etiqueta, valor in _etiquetas_ofx(archivo):
+        if etiqueta == "STMTTRN":
+            if not cierre:
+                actual = {}
+                continue
+            if actual is None:
+                continue
+            n += 1
+            fecha = None
+            dt = re.match(r"(\d{8})(\d{6})?", actual.get("DTPOSTED", ""))
+            if dt:
+                try:
+                    fecha = datetime.strptime(
+                        dt.group(1) + (dt.group(2) or "000000"), "%Y%m%d%H%M%S"
+                    ).strftime("%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    pass
+            monto = parse_cantidad(actual.get("TRNAMT", "").replace("+", ""))
+            mov = _movimiento(fecha, monto, None, None)
+            if mov is None:
+                _anotar(errores, f"Movimiento {n}: fecha o monto inválido.")
+            else:
+                yield mov
+            actual = None
+        elif actual is not None and not cierre and valor:
+            actual[etiqueta] = valor
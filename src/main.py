@@ -1,65 +1,154 @@
 """Punto de entrada del bot."""
 import os
-from datetime import time
-from zoneinfo import ZoneInfo
+import time
 
 from dotenv import load_dotenv
 from telegram import BotCommand, Update
-from telegram.ext import Application, CommandHandler
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, TypeHandler
 
-from src.database import init_db, obtener_ids_usuarios_con_cuentas
-from src.handlers import categorias, commands, conv_handler, presupuesto
+from src.database import aio, cerrar_conexiones, init_db, sincronizar_preferencias
+from src.difusion import difundir
+from src.handlers import categorias, commands, conv_handler, historial, presupuesto
+from src.persistencia import PersistenciaSQLite
+from src.procesador import ProcesadorPorUsuario
+from src.shards import Trabajadores, crear_frente, shards_desde_entorno
+from src.webhook import ConfigWebhook, crear_cola_updates
 
 load_dotenv()
 
 
 async def send_resumen_diario(context) -> None:
-    """Envía el resumen diario a todos los usuarios con cuentas."""
-    for user_id in obtener_ids_usuarios_con_cuentas():
-        texto = commands.formatear_resumen(user_id)
-        if texto:
-            try:
-                await context.bot.send_message(chat_id=user_id, text=texto)
-            except Exception:
-                pass  # Usuario puede haber bloqueado el bot o no existir
+    """Tick de cada minuto: envía el resumen diario a los usuarios a los que les toca.
+
+    Cada usuario elige zona y hora (/resumen_diario); en lugar de un job por
+    usuario, un único job consulta el índice de próximos envíos y reprograma
+    a los que encuentra. Con BOT_SHARDS cada trabajador reclama solo a los
+    usuarios de su shard.
+    """
+    user_ids = await aio.reclamar_resumenes_pendientes(shard=context.bot_data.get("shard"))
+    if not user_ids:
+        return
+    # Una sola consulta en streaming para el lote; los textos se generan en el pool de lectura
+    mensajes = await aio.ejecutar(list, commands.resumenes_diarios(user_ids))
+    resultado = await difundir(context.bot, mensajes)
+    context.bot_data["ultimo_resumen_diario"] = resultado
+    # Quien bloqueó el bot o ya no existe queda en pausa y no se reintenta cada día
+    pausados = await aio.registrar_fallos_entrega(
+        [(f.chat_id, f.tipo, f.detalle, f.permanente) for f in resultado.fallos]
+    )
+    print(f"Resumen diario: {resultado}; {pausados} usuarios en pausa")
+
+
+async def informar_carga(context) -> None:
+    """Cada minuto: profundidad de las colas de updates, solo si algo tuvo que esperar."""
+    procesador = context.application.update_processor
+    estado = procesador.estado(reiniciar_maximo=True)
+    cola = context.application.update_queue.qsize()
+    if estado.max_en_espera or cola:
+        print(f"Updates: {estado}; {cola} sin admitir en la cola de la aplicación")
+
+
+async def reanudar_si_pausado(update: Update, context) -> None:
+    """Un usuario en pausa por fallos de entrega que vuelve a escribir se reactiva."""
+    user = update.effective_user
+    if user is not None and await aio.usuario_pausado(user.id):
+        await aio.reanudar_usuario(user.id)
 
 
 async def post_init(application: Application) -> None:
-    await application.bot.set_my_commands([
-        BotCommand("start", "Mensaje de bienvenida"),
-        BotCommand("help", "Ayuda detallada"),
-        BotCommand("cancel", "Cancelar comando actual"),
-        BotCommand("crear_cuenta", "Crear cuenta"),
-        BotCommand("cuentas", "Ver cuentas"),
-        BotCommand("mis_categorias", "Ver tus categorías"),
-        BotCommand("agregar_categoria", "Nueva categoría (gasto/ingreso/ambos)"),
-        BotCommand("editar_mi_categoria", "Renombrar una categoría"),
-        BotCommand("gasto", "Registrar gasto"),
-        BotCommand("ingreso", "Registrar ingreso"),
-        BotCommand("transferencia", "Transferir"),
-        BotCommand("registros", "Listar movimientos"),
-        BotCommand("editar", "Editar registro"),
-        BotCommand("eliminar", "Eliminar registro"),
-        BotCommand("resumen", "Resumen total"),
-        BotCommand("resumen_categorias", "Resumen por categoría"),
-        BotCommand("resumen_mes", "Resumen mensual"),
-        BotCommand("ajustar", "Ajustar saldo de una cuenta"),
-        BotCommand("presupuestos", "Listar presupuestos por nombre"),
-        BotCommand("gasto_presupuesto", "Gasto planificado (elige presupuesto)"),
-        BotCommand("ingreso_presupuesto", "Ingreso planificado (elige presupuesto)"),
-        BotCommand("resumen_presupuesto", "Resumen de un presupuesto o todos"),
-        BotCommand("eliminar_registro_presupuesto", "Borrar línea de presupuesto"),
-        BotCommand("clonar_presupuesto", "Copiar presupuesto con otro nombre"),
-        BotCommand("editar_registro_presupuesto", "Editar registro de presupuesto"),
-    ])
-
-    # Resumen diario automático a las 10:00 (zona configurable vía RESUMEN_DIARIO_TZ)
-    tz = ZoneInfo(os.getenv("RESUMEN_DIARIO_TZ", "Europe/Madrid"))
-    application.job_queue.run_daily(
+    shard = application.bot_data.get("shard")
+    # Con BOT_SHARDS los comandos los registra solo el primer trabajador
+    if shard is None or shard[0] == 0:
+        await application.bot.set_my_commands([
+            BotCommand("start", "Mensaje de bienvenida"),
+            BotCommand("help", "Ayuda detallada"),
+            BotCommand("cancel", "Cancelar comando actual"),
+            BotCommand("crear_cuenta", "Crear cuenta"),
+            BotCommand("cuentas", "Ver cuentas"),
+            BotCommand("mis_categorias", "Ver tus categorías"),
+            BotCommand("agregar_categoria", "Nueva categoría (gasto/ingreso/ambos)"),
+            BotCommand("editar_mi_categoria", "Renombrar una categoría"),
+            BotCommand("gasto", "Registrar gasto"),
+            BotCommand("ingreso", "Registrar ingreso"),
+            BotCommand("transferencia", "Transferir"),
+            BotCommand("registros", "Listar movimientos"),
+            BotCommand("editar", "Editar registro"),
+            BotCommand("eliminar", "Eliminar registro"),
+            BotCommand("resumen", "Resumen total"),
+            BotCommand("resumen_categorias", "Resumen por categoría"),
+            BotCommand("resumen_mes", "Resumen mensual"),
+            BotCommand("resumen_diario", "Zona y hora del resumen diario"),
+            BotCommand("ajustar", "Ajustar saldo de una cuenta"),
+            BotCommand("importar", "Importar movimientos (CSV u OFX)"),
+            BotCommand("exportar", "Exportar movimientos o presupuestos (CSV o XLSX)"),
+            BotCommand("presupuestos", "Listar presupuestos por nombre"),
+            BotCommand("gasto_presupuesto", "Gasto planificado (elige presupuesto)"),
+            BotCommand("ingreso_presupuesto", "Ingreso planificado (elige presupuesto)"),
+            BotCommand("resumen_presupuesto", "Resumen de un presupuesto o todos"),
+            BotCommand("eliminar_registro_presupuesto", "Borrar línea de presupuesto"),
+            BotCommand("clonar_presupuesto", "Copiar presupuesto con otro nombre"),
+            BotCommand("escalar_presupuesto", "Subir o bajar un presupuesto un %"),
+            BotCommand("fusionar_presupuestos", "Pasar las líneas de un presupuesto a otro"),
+            BotCommand("comparar_presupuesto", "Presupuesto vs gasto real de un mes"),
+            BotCommand("editar_registro_presupuesto", "Editar registro de presupuesto"),
+        ])
+
+    # Resumen diario automático: cada usuario a su hora (por defecto RESUMEN_DIARIO_HORA
+    # en RESUMEN_DIARIO_TZ); un solo job revisa cada minuto a quién le toca
+    application.job_queue.run_repeating(
         send_resumen_diario,
-        time=time(10, 0, 0, tzinfo=tz),
+        interval=60,
+        first=60 - time.time() % 60,
         name="resumen_diario",
     )
+    application.job_queue.run_repeating(informar_carga, interval=60, first=60, name="informe_carga")
+
+
+async def post_shutdown(application: Application) -> None:
+    aio.cerrar()
+    cerrar_conexiones()
+
+
+def crear_aplicacion(
+    token: str, *, base_url: str | None = None, shard: tuple[int, int] | None = None
+) -> Application:
+    """Application con todos los handlers registrados.
+
+    `base_url` apunta el bot a otro servidor de la Bot API (lo usa
+    scripts/bench_webhook.py con una API simulada). Con `shard=(indice, total)`
+    es un trabajador de src/shards.py: sin updater, recibe las updates del frente.
+    """
+    builder = (
+        Application.builder()
+        .token(token)
+        .update_queue(crear_cola_updates())
+        .persistence(PersistenciaSQLite(shard=shard))
+        # Usuarios distintos en paralelo, cada usuario en orden (src/procesador.py)
+        .concurrent_updates(ProcesadorPorUsuario())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    if shard is not None:
+        builder = builder.updater(None)
+    app = builder.build()
+    if shard is not None:
+        app.bot_data["shard"] = shard
+
+    # Grupo -1: se ejecuta antes que el resto de handlers para cada update
+    app.add_handler(TypeHandler(Update, reanudar_si_pausado), group=-1)
+    app.add_handler(CommandHandler("start", commands.cmd_start))
+    app.add_handler(CommandHandler("help", commands.cmd_help))
+    app.add_handler(CommandHandler("cuentas", commands.cmd_cuentas))
+    app.add_handler(CommandHandler("resumen", commands.cmd_resumen))
+    app.add_handler(CommandHandler("presupuestos", presupuesto.cmd_presupuestos))
+    app.add_handler(CommandHandler("mis_categorias", categorias.cmd_mis_categorias))
+    app.add_handler(CallbackQueryHandler(
+        historial.registros_pagina_callback, pattern=historial.REGISTROS_CALLBACK_PATTERN
+    ))
+    app.add_handler(conv_handler)
+    return app
 
 
 def main() -> None:
@@ -68,20 +157,37 @@ def main() -> None:
         print("Error: TELEGRAM_BOT_TOKEN no encontrado en .env")
         return
 
-    init_db()
-
-    app = Application.builder().token(token).post_init(post_init).build()
-
-    app.add_handler(CommandHandler("start", commands.cmd_start))
-    app.add_handler(CommandHandler("help", commands.cmd_help))
-    app.add_handler(CommandHandler("cuentas", commands.cmd_cuentas))
-    app.add_handler(CommandHandler("resumen", commands.cmd_resumen))
-    app.add_handler(CommandHandler("presupuestos", presupuesto.cmd_presupuestos))
-    app.add_handler(CommandHandler("mis_categorias", categorias.cmd_mis_categorias))
-    app.add_handler(conv_handler)
+    modo = os.getenv("BOT_MODO", "polling").strip().lower()
+    if modo not in ("polling", "webhook"):
+        print(f"Error: BOT_MODO debe ser polling o webhook (no '{modo}')")
+        return
+    webhook = None
+    try:
+        shards = shards_desde_entorno()
+        if modo == "webhook":
+            webhook = ConfigWebhook.desde_entorno()
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
 
-    print("Bot iniciado. Presiona Ctrl+C para detener.")
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+    init_db()
+    sincronizar_preferencias()
+    if shards > 1:
+        # Este proceso solo reparte las updates; las procesan BOT_SHARDS trabajadores,
+        # cada uno con sus conexiones
+        cerrar_conexiones()
+        app = crear_frente(token, Trabajadores(shards, token))
+        print(f"{shards} procesos trabajadores (shard = user_id % {shards}).")
+    else:
+        app = crear_aplicacion(token)
+
+    if webhook is not None:
+        print(f"Bot iniciado (webhook en {webhook.listen}:{webhook.port}/{webhook.url_path}). "
+              "Presiona Ctrl+C para detener.")
+        app.run_webhook(**webhook.argumentos(), allowed_updates=Update.ALL_TYPES)
+    else:
+        print("Bot iniciado. Presiona Ctrl+C para detener.")
+        app.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+"""
+Persistencia del bot en la misma base SQLite: estado de las conversaciones y user_data.
+
+Así un reinicio (systemd Restart=always, despliegue) no corta a mitad un
+/gasto o un /gasto_presupuesto. PTB ya agrupa los cambios: cada
+`update_interval` segundos (PERSISTENCIA_INTERVALO_S) llama a update_* solo
+por los usuarios y conversaciones que cambiaron. Aquí esas llamadas solo
+apuntan el cambio en memoria y una única tarea los escribe todos en una
+transacción del hilo escritor: ningún mensaje añade una escritura propia.
+Al parar el bot, flush() escribe lo que quede.
+"""
+import asyncio
+import json
+from typing import Any
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from src.database import aio
+from src.utils import numero_env
+
+
+class PersistenciaSQLite(BasePersistence):
+    """Guarda user_data y las conversaciones en las tablas persistencia_*.
+
+    Los valores se guardan como JSON: en user_data solo deben ir tipos
+    simples (números, textos, listas, dicts), como hasta ahora. chat_data,
+    bot_data y callback_data no se guardan.
+    """
+
+    def __init__(self, update_interval: float | None = None, shard: tuple[int, int] | None = None):
+        if update_interval is None:
+            update_interval = max(1.0, numero_env("PERSISTENCIA_INTERVALO_S", 10.0))
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=False, user_data=True, callback_data=False
+            ),
+            update_interval=update_interval,
+        )
+        self._usuarios: dict[int, str | None] = {}
+        self._conversaciones: dict[tuple[str, str], str | None] = {}
+        self._escritura: asyncio.Task | None = None
+        # Con varios procesos (src/shards.py) cada uno carga solo a sus usuarios
+        self._shard = shard
+
+    def _es_mio(self, user_id: int) -> bool:
+        return self._shard is None or user_id % self._shard[1] == self._shard[0]
+
+    # Lectura al arrancar
+
+    async def get_user_data(self) -> dict[int, dict]:
+        datos = await aio.cargar_datos_usuarios()
+        return {user_id: json.loads(texto) for user_id, texto in datos.items() if self._es_mio(user_id)}
+
+    async def get_conversations(self, name: str) -> dict:
+        estados = await aio.cargar_conversaciones(name)
+        conversaciones = {tuple(json.loads(clave)): json.loads(estado) for clave, estado in estados.items()}
+        # La clave es (chat_id, user_id): el usuario es el último elemento
+        return {clave: estado for clave, estado in conversaciones.items() if self._es_mio(clave[-1])}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    # Cambios: se acumulan y se escriben juntos
+
+    def _programar_escritura(self) -> None:
+        # Una sola tarea por tanda: PTB llama a todos los update_* de una vez
+        # (asyncio.gather) y la tarea corre después de todos ellos
+        if self._escritura is None or self._escritura.done():
+            self._escritura = asyncio.create_task(self._escribir())
+
+    async def _escribir(self) -> None:
+        usuarios, self._usuarios = self._usuarios, {}
+        conversaciones, self._conversaciones = self._conversaciones, {}
+        try:
+            await aio.guardar_persistencia(usuarios, conversaciones)
+        except Exception as e:
+            # La tanda vuelve a quedar pendiente para la siguiente escritura; lo
+            # que cambió mientras tanto es más nuevo y no se pisa
+            for user_id, texto in usuarios.items():
+                self._usuarios.setdefault(user_id, texto)
+            for clave, estado in conversaciones.items():
+                self._conversaciones.setdefault(clave, estado)
+            print(
+                f"Persistencia: no se pudieron guardar {len(usuarios)} usuarios y "
+                f"{len(conversaciones)} conversaciones, se reintentará: {e}"
+            )
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        try:
+            self._usuarios[user_id] = json.dumps(data, ensure_ascii=False)
+        except (TypeError, ValueError):
+            # Un valor no serializable no debe tumbar el bot: ese usuario no se guarda
+            return
+        self._programar_escritura()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._usuarios[user_id] = None
+        self._programar_escritura()
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Any) -> None:
+        clave = json.dumps(list(key))
+        self._conversaciones[(name, clave)] = None if new_state is None else json.dumps(new_state)
+        self._programar_escritura()
+
+    async def flush(self) -> None:
+        if self._escritura is not None:
+            await self._escritura
+        await self._escribir()
+
+    # Sin efecto: no se guardan o no cambian fuera del bot
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
@@ -0,0 +1,151 @@
+"""
+Procesamiento concurrente de updates, en orden para cada usuario.
+
+Con el procesador por defecto de PTB las updates se atienden de una en una:
+un usuario con una importación grande o un resumen lento hace esperar a
+todos los demás. Activar `concurrent_updates` sin más permitiría que dos
+mensajes seguidos del mismo usuario corrieran a la vez y se pisaran en la
+conversación (el segundo paso leería el estado antes de que el primero lo
+guarde).
+
+ProcesadorPorUsuario ejecuta hasta UPDATES_TRABAJADORES updates a la vez,
+pero solo una por usuario: las siguientes de ese usuario esperan su turno
+en orden de llegada, sin ocupar un trabajador mientras esperan.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from src.utils import entero_env
+
+
+def clave_usuario(update: object) -> int | None:
+    """Usuario (o, si no hay, chat) cuyas updates deben ir en orden."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+@dataclass(frozen=True)
+class EstadoProcesador:
+    """Foto de la carga del procesador."""
+
+    trabajadores: int
+    en_proceso: int  # updates ejecutándose ahora
+    en_espera: int  # updates esperando a que termine otra del mismo usuario o un trabajador libre
+    usuarios_en_espera: int  # usuarios con al menos una update esperando
+    max_en_espera: int  # máximo de en_espera desde el último informe
+
+    def __str__(self) -> str:
+        return (
+            f"{self.en_proceso}/{self.trabajadores} trabajadores ocupados, "
+            f"{self.en_espera} updates en espera de {self.usuarios_en_espera} usuarios "
+            f"(máx. {self.max_en_espera})"
+        )
+
+
+class ProcesadorPorUsuario(BaseUpdateProcessor):
+    """Updates de usuarios distintos en paralelo; las de un mismo usuario, en orden.
+
+    `trabajadores` limita las updates que se ejecutan a la vez. `admitidas`
+    (el max_concurrent_updates de PTB) limita las que se aceptan de la cola de
+    la aplicación, ejecutándose o esperando turno; el resto se queda en esa
+    cola, acotada por UPDATE_QUEUE_MAX.
+    """
+
+    def __init__(self, trabajadores: int | None = None, admitidas: int | None = None):
+        if trabajadores is None:
+            trabajadores = entero_env("UPDATES_TRABAJADORES", 8)
+        if admitidas is None:
+            admitidas = entero_env("UPDATES_ADMITIDAS", 256)
+        if trabajadores < 1:
+            raise ValueError("UPDATES_TRABAJADORES debe ser al menos 1.")
+        super().__init__(max_concurrent_updates=max(admitidas, trabajadores))
+        self._trabajadores = trabajadores
+        self._libres = asyncio.Semaphore(trabajadores)
+        # Última update admitida de cada usuario: la siguiente espera a que termine
+        self._ultima: dict[int, asyncio.Future] = {}
+        self._esperando: dict[int, int] = {}
+        self._en_proceso = 0
+        self._en_espera = 0
+        self._max_en_espera = 0
+
+    @property
+    def trabajadores(self) -> int:
+        return self._trabajadores
+
+    def estado(self, reiniciar_maximo: bool = False) -> EstadoProcesador:
+        estado = EstadoProcesador(
+            trabajadores=self._trabajadores,
+            en_proceso=self._en_proceso,
+            en_espera=self._en_espera,
+            usuarios_en_espera=len(self._esperando),
+            max_en_espera=self._max_en_espera,
+        )
+        if reiniciar_maximo:
+            self._max_en_espera = self._en_espera
+        return estado
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        clave = clave_usuario(update)
+        if clave is None:
+            await self._ejecutar(coroutine)
+            return
+
+        # Hasta el primer await no hay cambio de tarea: el turno se toma en el
+        # orden en que PTB entrega las updates
+        anterior = self._ultima.get(clave)
+        turno = asyncio.get_running_loop().create_future()
+        self._ultima[clave] = turno
+        try:
+            if anterior is not None:
+                self._esperando[clave] = self._esperando.get(clave, 0) + 1
+                self._sumar_espera(1)
+                try:
+                    await asyncio.wait([anterior])
+                finally:
+                    self._sumar_espera(-1)
+                    if self._esperando[clave] == 1:
+                        del self._esperando[clave]
+                    else:
+                        self._esperando[clave] -= 1
+            await self._ejecutar(coroutine)
+        finally:
+            turno.set_result(None)
+            if self._ultima.get(clave) is turno:
+                del self._ultima[clave]
+
+    async def _ejecutar(self, coroutine: Awaitable[Any]) -> None:
+        if self._libres.locked():
+            self._sumar_espera(1)
+            try:
+                await self._libres.acquire()
+            finally:
+                self._sumar_espera(-1)
+        else:
+            await self._libres.acquire()
+        self._en_proceso += 1
+        try:
+            await coroutine
+        finally:
+            self._en_proceso -= 1
+            self._libres.release()
+
+    def _sumar_espera(self, n: int) -> None:
+        self._en_espera += n
+        if self._en_espera > self._max_en_espera:
+            self._max_en_espera = self._en_espera
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        # Application.stop ya esperó a las updates en curso
+        pass
@@ -0,0 +1,158 @@
+"""
+Modo multiproceso: N procesos trabajadores, cada uno con los usuarios de su shard.
+
+Un solo proceso de Python usa un solo núcleo. Con BOT_SHARDS=N el proceso
+principal queda como frente: recibe las updates (webhook o polling) y pasa
+cada una, sin procesarla, al trabajador `user_id % N` por una cola entre
+procesos. Cada trabajador es una Application completa sin updater: sus
+handlers, su caché de usuarios, su persistencia y su job del resumen diario,
+que solo reclama a los usuarios de su shard. Todos comparten la base SQLite
+en modo WAL.
+
+Como un usuario siempre cae en el mismo trabajador, sus updates siguen en
+orden y la caché de cuentas de cada proceso no ve escrituras de otro.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+
+from src.procesador import clave_usuario
+from src.utils import entero_env
+from src.webhook import crear_cola_updates
+
+
+def shards_desde_entorno() -> int:
+    """Número de procesos trabajadores (BOT_SHARDS, por defecto 1 = sin shards)."""
+    total = entero_env("BOT_SHARDS", 1)
+    if total < 1:
+        raise ValueError("BOT_SHARDS debe ser al menos 1.")
+    return total
+
+
+def shard_de(update: object, total: int) -> int:
+    """Shard de una update: user_id % total (sin usuario ni chat, el 0)."""
+    clave = clave_usuario(update)
+    return 0 if clave is None else clave % total
+
+
+def _recibir(cola: multiprocessing.Queue, padre: int) -> dict | None:
+    """Siguiente update para este trabajador; None al parar o si el frente ya no existe."""
+    while True:
+        try:
+            return cola.get(timeout=1)
+        except queue.Empty:
+            if os.getppid() != padre:
+                return None
+
+
+async def _servir(indice: int, total: int, cola: multiprocessing.Queue, token: str, base_url: str | None) -> None:
+    # Import aquí: src.main importa este módulo
+    from src.main import crear_aplicacion
+
+    app = crear_aplicacion(token, base_url=base_url, shard=(indice, total))
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    loop = asyncio.get_running_loop()
+    padre = os.getppid()
+    try:
+        while (datos := await loop.run_in_executor(None, _recibir, cola, padre)) is not None:
+            # La cola de la aplicación está acotada: si se llena, deja de leer y
+            # la cola entre procesos frena al frente
+            await app.update_queue.put(Update.de_json(datos, app.bot))
+    finally:
+        await app.stop()
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+
+def _trabajador(indice: int, total: int, cola: multiprocessing.Queue, token: str, base_url: str | None) -> None:
+    # Ctrl+C y systemd envían la señal a todo el grupo: el trabajador espera a
+    # que el frente le diga que pare, para terminar las updates que ya tiene
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_servir(indice, total, cola, token, base_url))
+
+
+class Trabajadores:
+    """Procesos trabajadores y sus colas; el frente los arranca y los detiene."""
+
+    def __init__(self, total: int, token: str, base_url: str | None = None):
+        contexto = multiprocessing.get_context("spawn")
+        tam = max(0, entero_env("UPDATE_QUEUE_MAX", 1000))
+        self.colas = [contexto.Queue(maxsize=tam) for _ in range(total)]
+        self.procesos = [
+            contexto.Process(
+                target=_trabajador,
+                args=(i, total, self.colas[i], token, base_url),
+                name=f"finance-guy-shard-{i}",
+            )
+            for i in range(total)
+        ]
+
+    def iniciar(self) -> None:
+        for proceso in self.procesos:
+            proceso.start()
+
+    async def enrutar(self, update: Update, context) -> None:
+        """Handler del frente: pasa la update al trabajador de su usuario."""
+        cola = self.colas[shard_de(update, len(self.colas))]
+        # put bloquea si la cola del trabajador está llena: se hace fuera del event loop
+        await asyncio.get_running_loop().run_in_executor(None, cola.put, update.to_dict())
+
+    def detener(self, espera_s: float = 30) -> None:
+        """Pide a cada trabajador que pare y espera hasta espera_s; luego lo termina.
+
+        El aviso va detrás de las updates que ya están en su cola. Si la cola
+        sigue llena pasado ese tiempo (trabajador colgado o muerto), se termina
+        sin aviso.
+        """
+        for indice, (cola, proceso) in enumerate(zip(self.colas, self.procesos)):
+            if not proceso.is_alive():
+                continue
+            try:
+                cola.put(None, timeout=espera_s)
+            except queue.Full:
+                print(f"Trabajador {indice}: cola llena al parar, se termina sin esperar")
+                proceso.terminate()
+        for cola, proceso in zip(self.colas, self.procesos):
+            proceso.join(espera_s)
+            if proceso.is_alive():
+                proceso.terminate()
+                proceso.join()
+            # Lo que quede en la cola ya no lo leerá nadie: no esperar a enviarlo al salir
+            cola.cancel_join_thread()
+
+
+def crear_frente(token: str, trabajadores: Trabajadores, *, base_url: str | None = None) -> Application:
+    """Application del frente: solo recibe updates y las reparte entre los trabajadores.
+
+    Procesa las updates de una en una (sin concurrent_updates), así cada
+    trabajador las recibe en el orden en que llegaron.
+    """
+
+    async def post_init(application: Application) -> None:
+        trabajadores.iniciar()
+
+    async def post_shutdown(application: Application) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, trabajadores.detener)
+
+    builder = (
+        Application.builder()
+        .token(token)
+        .update_queue(crear_cola_updates())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    app = builder.build()
+    app.add_handler(TypeHandler(Update, trabajadores.enrutar))
+    return app
@@ -1,12 +1,40 @@
 """Utilidades compartidas."""
+import math
+import os
 import re
 
 
+def entero_env(nombre: str, defecto: int) -> int:
+    """Variable de entorno entera; `defecto` si no está, está vacía o no es un entero."""
+    valor = os.getenv(nombre)
+    if valor is None or not valor.strip():
+        return defecto
+    try:
+        return int(valor)
+    except ValueError:
+        return defecto
+
+
+def numero_env(nombre: str, defecto: float) -> float:
+    """Como entero_env, para números con decimales."""
+    valor = os.getenv(nombre)
+    if valor is None or not valor.strip():
+        return defecto
+    try:
+        return float(valor)
+    except ValueError:
+        return defecto
+
+
 def is_null(text: str) -> bool:
     """True si el texto representa null (vacío/opcional)."""
     return text.strip().lower() == "null"
 
 
+# Mayor importe aceptado: en centavos, con margen para sumar saldos, cabe en un INTEGER de SQLite
+MONTO_MAXIMO = 1e13
+
+
 def parse_cantidad(texto: str) -> float | None:
     """Parsea una cantidad, aceptando formatos como 1000, 1.000,50, 1,000.50"""
     if not texto or not texto.strip():
@@ -14,9 +42,13 @@ def parse_cantidad(texto: str) -> float | None:
     limpio = texto.strip().replace(",", ".")
     limpio = re.sub(r"\.(?=\d{3}\b)", "", limpio)
     try:
-        return float(limpio)
+        valor = float(limpio)
     except ValueError:
         return None
+    # float() acepta "nan", "inf" y exponentes: no son montos y rompen la conversión a centavos
+    if not math.isfinite(valor) or abs(valor) >= MONTO_MAXIMO:
+        return None
+    return valor
 
 
 def formato_tipo(tipo: str) -> str:
@@ -0,0 +1,90 @@
+"""
+Modo webhook: configuración del servidor HTTP embebido de PTB (run_webhook).
+
+En modo webhook Telegram entrega cada update con un POST al bot en lugar de
+que el bot los pida con long polling: menos latencia y el bot puede estar
+detrás de un proxy o balanceador. Las updates recibidas esperan en una cola
+acotada (UPDATE_QUEUE_MAX); si se llena, el servidor tarda en responder y
+Telegram reduce el ritmo de entrega en lugar de que la memoria crezca.
+"""
+import asyncio
+import os
+import re
+import secrets
+from dataclasses import dataclass
+
+from src.utils import entero_env
+
+_SECRETO_VALIDO = re.compile(r"^[A-Za-z0-9_-]{1,256}$")
+
+
+def _texto_env(nombre: str) -> str | None:
+    valor = os.getenv(nombre)
+    return valor.strip() if valor and valor.strip() else None
+
+
+def crear_cola_updates() -> asyncio.Queue:
+    """Cola de updates de la aplicación, acotada a UPDATE_QUEUE_MAX (1000; 0 = sin límite)."""
+    return asyncio.Queue(maxsize=max(0, entero_env("UPDATE_QUEUE_MAX", 1000)))
+
+
+@dataclass(frozen=True)
+class ConfigWebhook:
+    """Argumentos de Application.run_webhook / Updater.start_webhook."""
+
+    url: str
+    listen: str = "0.0.0.0"
+    port: int = 8443
+    url_path: str = "telegram"
+    secret_token: str | None = None
+    max_connections: int = 40
+    cert: str | None = None
+    key: str | None = None
+    ip_address: str | None = None
+
+    @classmethod
+    def desde_entorno(cls) -> "ConfigWebhook":
+        """Lee las variables WEBHOOK_* (ver README). Lanza ValueError si falta o sobra algo.
+
+        Sin WEBHOOK_SECRET se genera un secreto aleatorio en cada arranque; se
+        registra en Telegram junto con la URL, así que sigue siendo válido.
+        """
+        url = _texto_env("WEBHOOK_URL")
+        if not url:
+            raise ValueError("WEBHOOK_URL es obligatoria en modo webhook (URL pública https del bot).")
+        secreto = _texto_env("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+        if not _SECRETO_VALIDO.match(secreto):
+            raise ValueError("WEBHOOK_SECRET solo admite letras, números, _ y - (hasta 256 caracteres).")
+        cert, key = _texto_env("WEBHOOK_CERT"), _texto_env("WEBHOOK_KEY")
+        if key and not cert:
+            raise ValueError("WEBHOOK_KEY requiere WEBHOOK_CERT.")
+        return cls(
+            url=url,
+            listen=_texto_env("WEBHOOK_LISTEN") or cls.listen,
+            port=entero_env("WEBHOOK_PORT", cls.port),
+            url_path=(_texto_env("WEBHOOK_PATH") or cls.url_path).strip("/"),
+            secret_token=secreto,
+            # Telegram admite de 1 a 100 conexiones simultáneas por bot
+            max_connections=min(100, max(1, entero_env("WEBHOOK_MAX_CONNECTIONS", cls.max_connections))),
+            cert=cert,
+            key=key,
+            ip_address=_texto_env("WEBHOOK_IP"),
+        )
+
+    @property
+    def webhook_url(self) -> str:
+        """URL completa que se registra en Telegram: WEBHOOK_URL + WEBHOOK_PATH."""
+        return f"{self.url.rstrip('/')}/{self.url_path}"
+
+    def argumentos(self) -> dict:
+        return {
+            "listen": self.listen,
+            "port": self.port,
+            "url_path": self.url_path,
+            "webhook_url": self.webhook_url,
+            "secret_token": self.secret_token,
+            "max_connections": self.max_connections,
+            "cert": self.cert,
+            "key": self.key,
+            "ip_address": self.ip_address,
+        }